@@ -0,0 +1,371 @@
+"""
+Benchmarks for CloudPilot hot paths, with JSON output and baseline checks.
+
+    python -m benchmarks.run                         # run all, print a table
+    python -m benchmarks.run --output bench.json     # machine-readable results
+    python -m benchmarks.run --compare benchmarks/baseline.json --threshold 0.3
+    python -m benchmarks.run --update-baseline       # rewrite the stored baseline
+
+``--compare`` exits with status 1 when any benchmark's median time per call is
+more than ``threshold`` (a fraction) slower than the baseline's. Baselines are
+machine-specific: regenerate them on the machine that runs the comparison.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import metadata
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+BASELINE = Path(__file__).resolve().with_name("baseline.json")
+SCHEMA_VERSION = 1
+
+Setup = Callable[[], Iterator[Callable[[], object]]]
+
+
+@dataclass
+class Result:
+    """Seconds per call over ``rounds`` rounds of ``number`` calls each."""
+
+    median_s: float
+    min_s: float
+    max_s: float
+    rounds: int
+    number: int
+
+
+_REGISTRY: dict[str, tuple[Setup, int]] = {}
+
+
+def benchmark(name: str, rounds: int = 7) -> Callable[[Setup], Setup]:
+    """
+    Register a generator that yields the callable to time.
+
+    Code before the ``yield`` is setup and code after it teardown; neither
+    is timed.
+    """
+
+    def register(setup: Setup) -> Setup:
+        _REGISTRY[name] = (setup, rounds)
+        return setup
+
+    return register
+
+
+def _calibrate(fn: Callable[[], object], min_time: float) -> int:
+    """Smallest power-of-ten call count whose run takes at least ``min_time``."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time or number >= 10**6:
+            return number
+        number *= 10
+
+
+def measure(fn: Callable[[], object], rounds: int, min_time: float) -> Result:
+    fn()  # warm caches, lazy imports and models
+    number = _calibrate(fn, min_time)
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number)
+    return Result(
+        median_s=statistics.median(per_call),
+        min_s=min(per_call),
+        max_s=max(per_call),
+        rounds=rounds,
+        number=number,
+    )
+
+
+# -- benchmarks ---------------------------------------------------------------
+
+
+def _workload(intensity: float) -> Setup:
+    def setup() -> Iterator[Callable[[], object]]:
+        from cloudpilot.load_tester import simulate_workload
+
+        yield lambda: simulate_workload(3600, intensity)
+
+    return setup
+
+
+for _intensity in (10, 100, 1000):
+    benchmark(f"simulate_workload[3600s,{_intensity}rps]")(_workload(_intensity))
+
+
+@benchmark("sample_arrivals[diurnal,1d,100rps]", rounds=5)
+def _diurnal_day() -> Iterator[Callable[[], object]]:
+    from cloudpilot.traffic_patterns import Diurnal, sample_arrivals
+
+    yield lambda: sample_arrivals(Diurnal(100.0), 86400, seed=0)
+
+
+_NORMAL = [50.0, 50.0, 70.0, 100.0]
+
+
+@benchmark("detect_anomaly[single]")
+def _detect_single() -> Iterator[Callable[[], object]]:
+    from cloudpilot.anomaly_detector import detect_anomaly, train_dummy_isolation_forest
+
+    model = train_dummy_isolation_forest()
+    yield lambda: detect_anomaly(_NORMAL, model=model)
+
+
+@benchmark("detect_anomalies[batch=1000]")
+def _detect_batch() -> Iterator[Callable[[], object]]:
+    import numpy as np
+    from cloudpilot.anomaly_detector import (
+        detect_anomalies,
+        train_dummy_isolation_forest,
+    )
+
+    model = train_dummy_isolation_forest()
+    rows = np.random.default_rng(0).random((1000, 4)) * 100
+    yield lambda: detect_anomalies(rows, model=model)
+
+
+@benchmark("streaming_detector[series=1000]")
+def _streaming() -> Iterator[Callable[[], object]]:
+    import numpy as np
+    from cloudpilot.streaming_detector import StreamingDetector
+
+    detector = StreamingDetector()
+    ids = [f"ns-{i}" for i in range(1000)]
+    rows = np.random.default_rng(0).normal(50.0, 2.0, (1000, 4))
+    yield lambda: detector.update(rows, ids)
+
+
+def _scaler() -> Any:
+    from cloudpilot.scaling import RLScaler
+
+    scaler = RLScaler()
+    if scaler.model is None:
+        raise RuntimeError("torch or rl_scaling_model.pt is unavailable")
+    return scaler
+
+
+@benchmark("rl_inference[single]")
+def _rl_single() -> Iterator[Callable[[], object]]:
+    scaler = _scaler()
+    yield lambda: scaler.get_action([80.0, 70.0, 0.8, 100.0, 0.9])
+
+
+@benchmark("rl_inference[batch=1024]")
+def _rl_batch() -> Iterator[Callable[[], object]]:
+    import numpy as np
+
+    scaler = _scaler()
+    states = np.random.default_rng(0).random((1024, 5)).astype(np.float32)
+    yield lambda: scaler.get_actions(states)
+
+
+class _StubPrometheus(BaseHTTPRequestHandler):
+    """Answers every instant query with one sample per namespace."""
+
+    protocol_version = "HTTP/1.1"
+    namespaces: list[str] = []
+
+    def do_GET(self) -> None:  # noqa: N802
+        result = [
+            {"metric": {"namespace": ns}, "value": [0, "42"]}
+            for ns in type(self).namespaces
+        ]
+        body = json.dumps(
+            {"status": "success", "data": {"resultType": "vector", "result": result}}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@contextmanager
+def stub_prometheus(namespaces: list[str]) -> Iterator[str]:
+    _StubPrometheus.namespaces = namespaces
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPrometheus)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@benchmark("metrics_fetch[stub,namespaces=50]")
+def _metrics_fetch() -> Iterator[Callable[[], object]]:
+    from cloudpilot.metrics import PrometheusCollector
+
+    namespaces = [f"ns-{i}" for i in range(50)]
+    with (
+        stub_prometheus(namespaces) as url,
+        PrometheusCollector(url) as collector,
+    ):
+        yield lambda: collector.collect_namespaces(namespaces)
+
+
+def _cli(*args: str) -> Setup:
+    def setup() -> Iterator[Callable[[], object]]:
+        command = [sys.executable, str(ROOT / "cli.py"), *args]
+        env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+
+        def run() -> object:
+            return subprocess.run(command, capture_output=True, env=env, check=True)
+
+        yield run
+
+    return setup
+
+
+benchmark("cli_cold_start[--version]", rounds=5)(_cli("--version"))
+benchmark("cli_cold_start[cost --help]", rounds=5)(_cli("cost", "--help"))
+
+
+# -- runner -------------------------------------------------------------------
+
+
+def run(
+    names: list[str] | None = None, min_time: float = 0.2
+) -> tuple[dict[str, Result], dict[str, str]]:
+    """Run the selected benchmarks; return results and skip reasons."""
+    results: dict[str, Result] = {}
+    skipped: dict[str, str] = {}
+    for name, (setup, rounds) in _REGISTRY.items():
+        if names and not any(pattern in name for pattern in names):
+            continue
+        try:
+            gen = setup()
+            fn = next(gen)
+        except Exception as e:
+            skipped[name] = str(e)
+            continue
+        try:
+            results[name] = measure(fn, rounds, min_time)
+        finally:
+            gen.close()
+    return results, skipped
+
+
+def _package_versions() -> dict[str, str]:
+    versions = {}
+    for package in ("numpy", "scikit-learn", "torch", "prometheus-api-client"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            continue
+    return versions
+
+
+def to_json(results: dict[str, Result], skipped: dict[str, str]) -> dict[str, Any]:
+    return {
+        "schema": SCHEMA_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": _package_versions(),
+        "results": {name: asdict(r) for name, r in results.items()},
+        "skipped": skipped,
+    }
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> list[tuple[str, float, float, float, bool]]:
+    """
+    Rows of ``(name, baseline median, current median, ratio, regressed)``
+    for benchmarks present in both reports.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = result["median_s"] / base["median_s"]
+        rows.append(
+            (name, base["median_s"], result["median_s"], ratio, ratio > 1 + threshold)
+        )
+    return rows
+
+
+def _fmt(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark CloudPilot hot paths.")
+    parser.add_argument("-k", "--filter", action="append", help="Substring filter.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--compare", help="Baseline JSON to check against.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.3,
+        help="Allowed slowdown as a fraction of the baseline (default: 0.3).",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help=f"Write results to {BASELINE.relative_to(ROOT)}.",
+    )
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--list", action="store_true", help="List benchmark names.")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(_REGISTRY))
+        return 0
+    logging.basicConfig(level=logging.WARNING)
+    warnings.simplefilter("ignore")
+    results, skipped = run(args.filter, args.min_time)
+    report = to_json(results, skipped)
+    for name, r in results.items():
+        print(f"{name:42} {_fmt(r.median_s):>10} (x{r.number}, {r.rounds} rounds)")
+    for name, reason in skipped.items():
+        print(f"{name:42} skipped: {reason}")
+    for path in filter(None, (args.output, BASELINE if args.update_baseline else None)):
+        Path(path).write_text(json.dumps(report, indent=2) + "\n")
+
+    if not args.compare:
+        return 0
+    baseline = json.loads(Path(args.compare).read_text())
+    regressed = False
+    print(f"\nComparison with {args.compare} (threshold +{args.threshold:.0%}):")
+    for name, base, cur, ratio, bad in compare(report, baseline, args.threshold):
+        regressed |= bad
+        flag = "REGRESSION" if bad else "ok"
+        print(f"{name:42} {_fmt(base):>10} -> {_fmt(cur):>10} x{ratio:.2f} {flag}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
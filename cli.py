@@ -1,18 +1,31 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
 import logging
 import sys
-from importlib.metadata import PackageNotFoundError, version
 
-from cloudpilot.cost_optimizer import get_aws_cost_optimization
-from cloudpilot.k8s_autotuner import tune_deployment
-from cloudpilot.scaling import recommend_scaling
+# Subcommand modules are imported inside their branches so each command pays
+# only for its own dependencies; --version and --help import none of them.
 
-try:
-    _VERSION = version("cloudpilot")
-except PackageNotFoundError:
-    _VERSION = "0.0.0-dev"
+
+class _VersionAction(argparse.Action):
+    """Like argparse's version action, but resolves the version only when used."""
+
+    def __init__(self, option_strings: list[str], dest: str, **kwargs: object) -> None:
+        super().__init__(
+            option_strings, dest, nargs=0, help="show program's version and exit"
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None) -> None:
+        from importlib.metadata import PackageNotFoundError, version
+
+        try:
+            _version = version("cloudpilot")
+        except PackageNotFoundError:
+            _version = "0.0.0-dev"
+        print(f"CloudPilot {_version}")
+        parser.exit()
 
 
 def main() -> None:
@@ -23,7 +36,7 @@ def main() -> None:
     parser = argparse.ArgumentParser(
         description="CloudPilot CLI Utility - AI-Driven Infrastructure Optimization"
     )
-    parser.add_argument("--version", action="version", version=f"CloudPilot {_VERSION}")
+    parser.add_argument("--version", action=_VersionAction)
 
     subparsers = parser.add_subparsers(dest="command", help="Sub-commands")
 
@@ -70,16 +83,45 @@ def main() -> None:
         default="m5.large",
         help="Current AWS instance type (default: m5.large).",
     )
+    parser_cost.add_argument(
+        "--cpu-util",
+        type=float,
+        default=None,
+        help="Observed CPU utilization percentage of the instance (e.g., 35).",
+    )
+    parser_cost.add_argument(
+        "--mem-util",
+        type=float,
+        default=None,
+        help="Observed memory utilization percentage of the instance (e.g., 40).",
+    )
 
     parser_tune = subparsers.add_parser(
         "tune", help="Auto-tune a Kubernetes deployment and check for anomalies."
     )
-    parser_tune.add_argument(
+    tune_target = parser_tune.add_mutually_exclusive_group(required=True)
+    tune_target.add_argument(
         "--deployment",
         type=str,
-        required=True,
         help="Name of the Kubernetes deployment.",
     )
+    tune_target.add_argument(
+        "--all",
+        action="store_true",
+        help="Tune every deployment in the namespace (see --selector).",
+    )
+    parser_tune.add_argument(
+        "--selector",
+        type=str,
+        default=None,
+        help="Label selector limiting --all (e.g., 'tier=web').",
+    )
+    parser_tune.add_argument(
+        "--max-parallel",
+        type=int,
+        default=None,
+        help="Concurrent patches for --all (default: CLOUDPILOT_TUNE_MAX_PARALLEL).",
+    )
     parser_tune.add_argument(
         "--namespace",
         type=str,
@@ -87,21 +129,103 @@ def main() -> None:
         help="Kubernetes namespace (default: 'default').",
     )
 
+    parser_monitor = subparsers.add_parser(
+        "monitor", help="Watch namespaces for anomalies and self-heal concurrently."
+    )
+    parser_monitor.add_argument(
+        "--namespace",
+        dest="namespaces",
+        action="append",
+        required=True,
+        help="Namespace to watch; repeat for several namespaces.",
+    )
+    parser_monitor.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="Seconds between cycles (default: CLOUDPILOT_MONITOR_INTERVAL).",
+    )
+    parser_monitor.add_argument(
+        "--max-workers",
+        type=int,
+        default=None,
+        help="Thread pool size cap (default: CLOUDPILOT_MONITOR_MAX_WORKERS).",
+    )
+
+    parser_serve = subparsers.add_parser(
+        "serve", help="Answer scaling and anomaly queries over a local HTTP API."
+    )
+    parser_serve.add_argument("--host", default="127.0.0.1")
+    parser_serve.add_argument("--port", type=int, default=8080)
+    parser_serve.add_argument(
+        "--max-batch",
+        type=int,
+        default=None,
+        help="Largest micro-batch (default: CLOUDPILOT_SERVE_MAX_BATCH).",
+    )
+    parser_serve.add_argument(
+        "--batch-window-ms",
+        type=float,
+        default=None,
+        help="How long a micro-batch waits for more requests "
+        "(default: CLOUDPILOT_SERVE_BATCH_WINDOW_MS).",
+    )
+
     args = parser.parse_args()
 
     if args.command == "scale":
         if not 0 <= args.demand <= 1:
             sys.exit("Error: --demand must be between 0 and 1.")
+        from cloudpilot.scaling import recommend_scaling
+
         recommendation = recommend_scaling(
             args.cpu, args.mem, args.req, args.latency, args.demand
         )
         print("Scaling Recommendation:", recommendation)
     elif args.command == "cost":
-        recommendation = get_aws_cost_optimization(args.instance_type)
+        from cloudpilot.cost_optimizer import get_aws_cost_optimization
+
+        recommendation = get_aws_cost_optimization(
+            args.instance_type, args.cpu_util, args.mem_util
+        )
         print("Cost Optimization Recommendation:", recommendation)
     elif args.command == "tune":
-        result = tune_deployment(args.deployment, args.namespace)
-        print("Kubernetes Auto-Tuning Result:", result)
+        if args.all:
+            from cloudpilot.k8s_autotuner import format_tune_report, tune_namespace
+
+            try:
+                results = tune_namespace(
+                    args.namespace, args.selector, args.max_parallel
+                )
+            except Exception as e:
+                sys.exit(f"Error tuning namespace: {e}")
+            print("Kubernetes Auto-Tuning Report:")
+            print(format_tune_report(results))
+        else:
+            from cloudpilot.k8s_autotuner import tune_deployment
+
+            result = tune_deployment(args.deployment, args.namespace)
+            print("Kubernetes Auto-Tuning Result:", result)
+    elif args.command == "monitor":
+        from cloudpilot.config import install_reload_signal
+        from cloudpilot.monitor import monitor_namespaces
+
+        install_reload_signal()
+        with contextlib.suppress(KeyboardInterrupt):
+            monitor_namespaces(args.namespaces, args.interval, args.max_workers)
+    elif args.command == "serve":
+        from cloudpilot.config import install_reload_signal
+        from cloudpilot.server import serve
+
+        install_reload_signal()
+        window = args.batch_window_ms
+        with contextlib.suppress(KeyboardInterrupt):
+            serve(
+                args.host,
+                args.port,
+                args.max_batch,
+                None if window is None else window / 1000,
+            )
     else:
         parser.print_help()
         sys.exit(1)
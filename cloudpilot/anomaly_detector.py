@@ -3,13 +3,28 @@ from __future__ import annotations
 import logging
 import threading
 import time
+from collections.abc import Hashable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
-from kubernetes import client, config
-from prometheus_api_client import PrometheusConnect
-from sklearn.ensemble import IsolationForest
 
-from cloudpilot.config import load_settings
+from cloudpilot.config import get_settings
+from cloudpilot.decision_cache import get_decision_cache
+from cloudpilot.instrumentation import (
+    record_api_error,
+    record_cycle,
+    start_metrics_server_from_settings,
+    timed,
+)
+from cloudpilot.k8s_client import get_kube_clients, note_api_error
+from cloudpilot.pod_cache import PodPhaseCache, get_pod_cache, start_pod_cache
+from cloudpilot.streaming_detector import StreamingDetector, get_streaming_detector
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import IsolationForest
+
+    from cloudpilot.compiled_forest import CompiledForest
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +34,8 @@ _isolation_forest_model: IsolationForest | None = None
 
 def train_dummy_isolation_forest(random_state: int = 42) -> IsolationForest:
     """Train a dummy IsolationForest on synthetic data (for demos and tests)."""
+    from sklearn.ensemble import IsolationForest
+
     rng = np.random.default_rng(random_state)
     x_train = rng.random((100, 4)) * 100
     model = IsolationForest(contamination=0.1, random_state=random_state)
@@ -26,96 +43,239 @@ def train_dummy_isolation_forest(random_state: int = 42) -> IsolationForest:
     return model
 
 
-def get_isolation_forest_model() -> IsolationForest:
-    """Lazily construct the default IsolationForest (not at import time)."""
+def get_isolation_forest_model() -> IsolationForest | CompiledForest:
+    """
+    The latest model from the model store (``CLOUDPILOT_MODEL_STORE``), picked
+    up without a restart when a new version is saved, as a memory-mapped
+    :class:`~cloudpilot.compiled_forest.CompiledForest`. Without a stored
+    model a dummy forest is trained lazily (not at import time).
+    """
+    from cloudpilot.model_store import get_latest_model
+
     global _isolation_forest_model
+    stored = get_latest_model()
+    if stored is not None:
+        return stored
     if _isolation_forest_model is None:
         with _model_lock:
             if _isolation_forest_model is None:
+                logger.info("No stored anomaly model; training a dummy forest")
                 _isolation_forest_model = train_dummy_isolation_forest()
     return _isolation_forest_model
 
 
 def reset_isolation_forest_model_for_testing() -> None:
-    """Clear cached model (tests only)."""
+    """Clear cached models (tests only)."""
+    from cloudpilot.model_store import reset_model_cache_for_testing
+
     global _isolation_forest_model
     with _model_lock:
         _isolation_forest_model = None
+    reset_model_cache_for_testing()
 
 
-def get_prometheus_metrics() -> list[float]:
+def get_prometheus_metrics(namespace: str | None = None) -> list[float]:
     """
     Fetch metrics from Prometheus into
     [cpu_util, mem_util, request_rate, network_latency].
+
+    With ``namespace`` set, container series are restricted to that namespace.
+    Uses the shared pooled collector from ``cloudpilot.metrics``.
     """
-    settings = load_settings()
+    from cloudpilot.metrics import DEFAULT_FEATURES, lease_metrics_collector
+
     try:
-        prom = PrometheusConnect(
-            url=settings.prometheus_url,
-            disable_ssl=settings.prometheus_disable_ssl,
-        )
-        cpu_query = "avg(rate(container_cpu_usage_seconds_total[1m])) * 100"
-        mem_query = "avg(container_memory_usage_bytes) / 1e6"
-        cpu_data = prom.custom_query(query=cpu_query)
-        mem_data = prom.custom_query(query=mem_query)
-        cpu_util = float(cpu_data[0]["value"][1]) if cpu_data else 50.0
-        mem_util = float(mem_data[0]["value"][1]) if mem_data else 50.0
-        request_rate = 70.0
-        network_latency = 100.0
-        return [cpu_util, mem_util, request_rate, network_latency]
+        with lease_metrics_collector() as collector:
+            if namespace:
+                return collector.collect_namespaces([namespace])[namespace]
+            return collector.collect(group_by=()).get((), list(DEFAULT_FEATURES))
     except Exception as e:
+        record_api_error("prometheus")
         logger.error("Error fetching Prometheus metrics: %s", e)
-        return [50.0, 50.0, 70.0, 100.0]
+        return list(DEFAULT_FEATURES)
+
+
+def get_anomaly_model() -> IsolationForest | CompiledForest | StreamingDetector:
+    """Default model for the detector chosen by ``CLOUDPILOT_ANOMALY_DETECTOR``."""
+    if get_settings().anomaly_detector == "streaming":
+        return get_streaming_detector()
+    return get_isolation_forest_model()
+
+
+def detect_anomalies(
+    features: Sequence[Sequence[float] | np.ndarray] | np.ndarray,
+    model: IsolationForest | CompiledForest | StreamingDetector | None = None,
+    series: Sequence[Hashable] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Score many feature vectors (rows) with a single model call.
+
+    Returns ``(mask, scores)``: a boolean anomaly mask and the raw
+    ``decision_function`` scores, where negative scores are anomalies.
+    ``series`` names the monitored series of each row; a
+    :class:`StreamingDetector` scores rows against, and then updates, those
+    series (all rows share ``"default"`` when omitted). Batch models ignore it,
+    but it must still name every row when given.
+    """
+    if model is None:
+        model = get_anomaly_model()
+    x = np.asarray(features, dtype=np.float64)
+    if x.ndim != 2:
+        raise ValueError(f"Expected a 2-D feature array, got shape {x.shape}")
+    if x.shape[0] == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float64)
+    if series is None:
+        series = ["default"] * x.shape[0]
+    elif len(series) != x.shape[0]:
+        raise ValueError(f"Expected {x.shape[0]} series names, got {len(series)}")
+    with timed("anomaly_inference"):
+        if isinstance(model, StreamingDetector):
+            scores = model.update(x, series)
+        else:
+            scores = np.asarray(model.decision_function(x), dtype=np.float64)
+    mask = scores < 0
+    return mask, scores
 
 
 def detect_anomaly(
     feature_vector: list[float] | np.ndarray,
-    model: IsolationForest | None = None,
+    model: IsolationForest | CompiledForest | StreamingDetector | None = None,
+    series: Hashable = "default",
 ) -> bool:
     if model is None:
-        model = get_isolation_forest_model()
-    prediction = model.predict([feature_vector])
-    is_anomaly = prediction[0] == -1
+        model = get_anomaly_model()
+    cache = get_decision_cache("anomaly")
+    if cache is None or isinstance(model, StreamingDetector):
+        # Streaming verdicts depend on (and update) each series' history.
+        mask, _ = detect_anomalies([feature_vector], model=model, series=[series])
+        is_anomaly = bool(mask[0])
+    else:
+        is_anomaly = cache.get(
+            feature_vector,
+            model,
+            lambda: bool(detect_anomalies([feature_vector], model=model)[0][0]),
+        )
     if is_anomaly:
         logger.warning("Anomaly detected for metrics: %s", feature_vector)
-    return bool(is_anomaly)
+    return is_anomaly
+
 
+class _RateLimiter:
+    """Spaces calls at least ``1 / rate`` seconds apart across threads."""
 
-def self_heal(namespace: str = "default") -> str:
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _failing_pods(
+    core_api: Any, namespace: str, cache: PodPhaseCache | None
+) -> list[str]:
+    if cache is not None and cache.synced:
+        return cache.failing_pods()
+    pods = core_api.list_namespaced_pod(namespace)
+    return [p.metadata.name for p in pods.items if p.status.phase != "Running"]
+
+
+def self_heal(
+    namespace: str = "default", pod_cache: PodPhaseCache | None = None
+) -> str:
     """
     Restarts pods not in Running phase by deleting them (controllers recreate).
 
+    Failing pods come from the namespace's watch-fed :class:`PodPhaseCache`
+    when one is running (see ``cloudpilot.pod_cache.start_pod_cache``), and
+    from a list call otherwise. At most ``CLOUDPILOT_HEAL_MAX_PODS`` pods are
+    deleted per call, concurrently, at ``CLOUDPILOT_HEAL_DELETE_RATE`` per
+    second.
+
     Requires CLOUDPILOT_SELF_HEAL_CONFIRM=1 (or true/yes) to perform deletes.
+    All three settings honor the namespace's overrides in the config file.
     """
-    settings = load_settings()
+    settings = get_settings().for_namespace(namespace)
     if not settings.self_heal_confirm:
         return (
             "Self-heal skipped: set CLOUDPILOT_SELF_HEAL_CONFIRM=1 to allow "
             "deleting non-Running pods."
         )
+    if pod_cache is None:
+        pod_cache = get_pod_cache(namespace)
     try:
-        config.load_kube_config()
-        core_api = client.CoreV1Api()
-        pods = core_api.list_namespaced_pod(namespace)
-        healed_pods: list[str] = []
-        for pod in pods.items:
-            if pod.status.phase != "Running":
-                pod_name = pod.metadata.name
-                core_api.delete_namespaced_pod(name=pod_name, namespace=namespace)
-                healed_pods.append(pod_name)
-                logger.info("Restarted pod: %s", pod_name)
-        if healed_pods:
-            return f"Restarted pods: {', '.join(healed_pods)}"
-        logger.info("No failing pods found for self-healing.")
-        return "No failing pods found. Consider auto-scaling if anomaly persists."
+        core_api = get_kube_clients().core_v1()
+        with timed("pod_list"):
+            failing = _failing_pods(core_api, namespace, pod_cache)
     except Exception as e:
+        note_api_error(e)
         logger.error("Error during self-healing: %s", e)
         return f"Error during self-healing: {e}"
+    if not failing:
+        logger.info("No failing pods found for self-healing.")
+        return "No failing pods found. Consider auto-scaling if anomaly persists."
+
+    targets = failing[: settings.heal_max_pods]
+    limiter = _RateLimiter(settings.heal_delete_rate)
+
+    def delete(pod_name: str) -> None:
+        limiter.acquire()
+        with timed("pod_delete"):
+            core_api.delete_namespaced_pod(name=pod_name, namespace=namespace)
+        if pod_cache is not None:
+            pod_cache.forget(pod_name)
+        logger.info("Restarted pod: %s", pod_name)
+
+    healed_pods: list[str] = []
+    errors: list[str] = []
+    workers = min(len(targets), settings.heal_delete_rate, 8)
+    with timed("heal"), ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(delete, name): name for name in targets}
+        for future, pod_name in futures.items():
+            try:
+                future.result()
+                healed_pods.append(pod_name)
+            except Exception as e:
+                note_api_error(e)
+                logger.error("Error deleting pod %s: %s", pod_name, e)
+                errors.append(f"{pod_name} ({e})")
+
+    parts = []
+    if healed_pods:
+        parts.append(f"Restarted pods: {', '.join(healed_pods)}")
+    if errors:
+        parts.append(f"Error during self-healing: {', '.join(errors)}")
+    skipped = len(failing) - len(targets)
+    if skipped:
+        parts.append(
+            f"{skipped} more failing pods left for the next heal "
+            f"(CLOUDPILOT_HEAL_MAX_PODS={settings.heal_max_pods})"
+        )
+    return "; ".join(parts)
 
 
-def monitor_and_heal(check_interval: int = 60, namespace: str = "default") -> None:
+def monitor_and_heal(
+    check_interval: int | None = None, namespace: str = "default"
+) -> None:
+    """
+    Check ``namespace`` every ``check_interval`` seconds and heal anomalies.
+
+    Without ``check_interval`` the interval is ``monitor_interval`` from the
+    current settings, reread every pass.
+    """
+    start_metrics_server_from_settings()
+    if get_settings().for_namespace(namespace).self_heal_confirm:
+        start_pod_cache(namespace)
+    get_anomaly_model()  # load once up front, not on the first cycle
     while True:
-        features = get_prometheus_metrics()
+        started = time.monotonic()
+        features = get_prometheus_metrics(namespace=namespace)
         logger.info(
             (
                 "Current metrics: CPU: %.2f, Memory: %.2f, "
@@ -126,13 +286,21 @@ def monitor_and_heal(check_interval: int = 60, namespace: str = "default") -> No
             features[2],
             features[3],
         )
-        if detect_anomaly(features):
-            logger.warning("Initiating self-healing procedures...")
-            result = self_heal(namespace)
-            logger.info("Self-healing result: %s", result)
+        try:
+            mask, _ = detect_anomalies([features], series=[namespace])
+        except Exception as e:
+            logger.error("Anomaly detection failed; skipping this check: %s", e)
         else:
-            logger.info("No anomalies detected.")
-        time.sleep(check_interval)
+            if mask[0]:
+                logger.warning("Anomaly detected for metrics: %s", features)
+                logger.warning("Initiating self-healing procedures...")
+                result = self_heal(namespace)
+                logger.info("Self-healing result: %s", result)
+            else:
+                logger.info("No anomalies detected.")
+        interval = check_interval or get_settings().monitor_interval
+        record_cycle("monitor_and_heal", time.monotonic() - started, interval)
+        time.sleep(interval)
 
 
 if __name__ == "__main__":
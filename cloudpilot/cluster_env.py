@@ -0,0 +1,178 @@
+"""Vectorized simulated cluster for training and evaluating scaling policies."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import numpy as np
+
+from cloudpilot.scaling import MAINTAIN
+from cloudpilot.traffic_patterns import RatePattern, pattern_from_name
+
+# Typical magnitude of each state feature, used to normalize network inputs.
+STATE_SCALE = (100.0, 100.0, 1.0, 100.0, 1.0)
+# Requests per second in one unit of the ``request_rate`` state feature.
+REQUEST_RATE_UNIT = 1000.0
+# Simulated memory use: an idle floor plus a share that grows with load.
+MEM_IDLE_PCT = 20.0
+MEM_LOAD_PCT = 60.0
+
+
+class ClusterEnv:
+    """
+    ``n_envs`` simulated deployments stepped together as NumPy arrays.
+
+    Each environment serves a request rate of ``mean_rate * pattern(t)``,
+    where ``pattern`` is a :mod:`cloudpilot.traffic_patterns` pattern with
+    mean rate 1 (a name or an instance) and ``mean_rate`` and the start time
+    are drawn per episode. Replicas serve ``capacity`` req/s each. The state
+    matches :func:`~cloudpilot.scaling.recommend_scaling`:
+
+    * ``cpu_util`` and ``mem_util``: percent, from load per replica;
+    * ``request_rate``: observed (Poisson) requests, in thousands per second;
+    * ``network_latency``: ms, an M/M/1-style ``base_latency / (1 - load)``;
+    * ``user_demand``: the next step's rate as a fraction of the capacity
+      of ``max_replicas``.
+
+    Actions are ``scaling.ACTIONS`` indices and move the replica count by one.
+    Rewards charge for replicas, for steps over ``slo_ms`` latency, and a
+    little for each scale action. Episodes end after ``episode_steps`` steps
+    and reset automatically.
+    """
+
+    def __init__(
+        self,
+        n_envs: int = 1024,
+        pattern: str | RatePattern = "diurnal",
+        capacity: float = 100.0,
+        min_replicas: int = 1,
+        max_replicas: int = 20,
+        step_seconds: float = 60.0,
+        episode_steps: int = 1440,
+        slo_ms: float = 200.0,
+        base_latency_ms: float = 20.0,
+        cost_weight: float = 0.5,
+        slo_weight: float = 1.0,
+        action_cost: float = 0.01,
+        seed: int | np.random.Generator | None = None,
+    ) -> None:
+        if n_envs < 1 or not 1 <= min_replicas <= max_replicas:
+            raise ValueError("Need n_envs >= 1 and 1 <= min_replicas <= max_replicas")
+        self.n_envs = n_envs
+        self.capacity = capacity
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas
+        self.step_seconds = step_seconds
+        self.episode_steps = episode_steps
+        self.slo_ms = slo_ms
+        self.base_latency_ms = base_latency_ms
+        self.cost_weight = cost_weight
+        self.slo_weight = slo_weight
+        self.action_cost = action_cost
+        self.rng = np.random.default_rng(seed)
+        # Start times are drawn from one day past the episode's own length.
+        self._horizon = episode_steps * step_seconds + 86400.0
+        if isinstance(pattern, str):
+            pattern = pattern_from_name(pattern, 1.0, self._horizon)
+        self.pattern = pattern.realize(2 * self._horizon, self.rng)
+
+        self.replicas = np.zeros(n_envs, dtype=np.int64)
+        self.steps = np.zeros(n_envs, dtype=np.int64)
+        self.mean_rate = np.zeros(n_envs)
+        self.offset = np.zeros(n_envs)
+        self.obs = np.zeros((n_envs, len(STATE_SCALE)), dtype=np.float32)
+        self.reset()
+
+    def _rate(self, idx: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        t = self.offset[idx] + steps * self.step_seconds
+        return self.mean_rate[idx] * np.maximum(self.pattern(t), 0.0)
+
+    def _observe(self, idx: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """States and latencies of environments ``idx`` at their current step."""
+        n = idx.size
+        rate = self._rate(idx, self.steps[idx])
+        observed = self.rng.poisson(rate * self.step_seconds) / self.step_seconds
+        load = observed / (self.replicas[idx] * self.capacity)
+        noise = self.rng.normal(1.0, 0.05, (2, n))
+        latency = self.base_latency_ms / np.maximum(1.0 - load, 0.05) * noise[0]
+        next_rate = self._rate(idx, self.steps[idx] + 1)
+        obs = np.empty((n, len(STATE_SCALE)), dtype=np.float32)
+        obs[:, 0] = np.clip(100.0 * load * noise[1], 0.0, 100.0)
+        mem = MEM_IDLE_PCT + MEM_LOAD_PCT * np.minimum(load, 1.0) * noise[1]
+        obs[:, 1] = np.clip(mem, 0.0, 100.0)
+        obs[:, 2] = observed / REQUEST_RATE_UNIT
+        obs[:, 3] = latency
+        obs[:, 4] = np.clip(next_rate / (self.max_replicas * self.capacity), 0.0, 1.0)
+        return obs, latency
+
+    def reset(self, idx: np.ndarray | None = None) -> np.ndarray:
+        """Start new episodes for environments ``idx`` (default: all)."""
+        idx = np.arange(self.n_envs) if idx is None else idx
+        n = idx.size
+        full = self.max_replicas * self.capacity
+        self.mean_rate[idx] = self.rng.uniform(0.1, 0.6, n) * full
+        self.offset[idx] = self.rng.uniform(0.0, self._horizon, n)
+        self.replicas[idx] = self.rng.integers(
+            self.min_replicas, self.max_replicas + 1, n
+        )
+        self.steps[idx] = 0
+        self.obs[idx], _ = self._observe(idx)
+        return self.obs
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Apply one action per environment.
+
+        Returns ``(next_obs, rewards, reset)``: the states the actions led to,
+        their rewards, and which environments then started a new episode
+        (their fresh state is in :attr:`obs`).
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        self.replicas = np.clip(
+            self.replicas + actions - MAINTAIN, self.min_replicas, self.max_replicas
+        )
+        self.steps += 1
+        every = np.arange(self.n_envs)
+        next_obs, latency = self._observe(every)
+        rewards = (
+            -self.cost_weight * self.replicas / self.max_replicas
+            - self.slo_weight * (latency > self.slo_ms)
+            - self.action_cost * (actions != MAINTAIN)
+        ).astype(np.float32)
+        self.obs = next_obs.copy()
+        done = self.steps >= self.episode_steps
+        if done.any():
+            self.reset(np.flatnonzero(done))
+        return next_obs, rewards, done
+
+
+def threshold_policy(
+    obs: np.ndarray, low: float = 30.0, high: float = 70.0
+) -> np.ndarray:
+    """Scale up above ``high`` percent CPU and down below ``low``."""
+    actions = np.full(obs.shape[0], MAINTAIN, dtype=np.int64)
+    actions[obs[:, 0] > high] = MAINTAIN + 1
+    actions[obs[:, 0] < low] = MAINTAIN - 1
+    return actions
+
+
+def evaluate(
+    policy: Callable[[np.ndarray], np.ndarray],
+    env: ClusterEnv,
+    steps: int = 1440,
+) -> dict[str, float]:
+    """Mean reward per step, SLO violation rate and replica use of ``policy``."""
+    total = 0.0
+    violations = 0
+    replicas = 0.0
+    for _ in range(steps):
+        next_obs, rewards, _ = env.step(policy(env.obs))
+        total += float(rewards.sum())
+        violations += int((next_obs[:, 3] > env.slo_ms).sum())
+        replicas += float(env.replicas.sum())
+    n = steps * env.n_envs
+    return {
+        "reward": total / n,
+        "slo_violation_rate": violations / n,
+        "mean_replicas": replicas / n,
+    }
@@ -0,0 +1,140 @@
+"""IsolationForest scoring from flat node arrays that can be memory-mapped."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+_ARRAYS = ("left", "right", "feature", "threshold", "value", "roots")
+_SCALARS_FILE = "forest.json"
+
+
+def _average_path_length(n: np.ndarray) -> np.ndarray:
+    """Mean unsuccessful-search path length in a BST of ``n`` samples."""
+    n = np.asarray(n, dtype=np.float64)
+    safe = np.maximum(n, 3.0)
+    c = 2.0 * (np.log(safe - 1.0) + np.euler_gamma) - 2.0 * (safe - 1.0) / safe
+    return np.where(n <= 1, 0.0, np.where(n == 2, 1.0, c))
+
+
+class CompiledForest:
+    """
+    An ``IsolationForest``'s trees packed into flat arrays and walked level
+    by level for every (row, tree) pair at once.
+
+    :meth:`decision_function` advances every (row, tree) cursor one level
+    per step through the concatenated node arrays, so a call costs ``depth``
+    vectorized lookups however many trees and rows there are. Leaves loop to
+    themselves and carry their full path-length contribution, so scores
+    match sklearn's to rounding.
+
+    The arrays are plain ``.npy`` files once :meth:`save`\\ d, so :meth:`load`
+    can memory-map them read-only: processes scoring with the same saved
+    forest share its pages through the page cache.
+    """
+
+    def __init__(
+        self,
+        left: np.ndarray,
+        right: np.ndarray,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        depth: int,
+        norm: float,
+        offset: float,
+        n_features: int,
+    ) -> None:
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.norm = norm
+        self.offset = offset
+        self.n_features = n_features
+
+    @classmethod
+    def from_isolation_forest(cls, model: Any) -> CompiledForest:
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree, features in zip(
+            model.estimators_, model.estimators_features_, strict=True
+        ):
+            t = tree.tree_
+            nodes = np.arange(t.node_count)
+            leaf = t.children_left == -1
+            depth = np.zeros(t.node_count)
+            for node in nodes[~leaf]:  # Parents precede children.
+                depth[t.children_left[node]] = depth[t.children_right[node]] = (
+                    depth[node] + 1
+                )
+            roots.append(offset)
+            left.append(np.where(leaf, nodes, t.children_left) + offset)
+            right.append(np.where(leaf, nodes, t.children_right) + offset)
+            feature.append(np.asarray(features)[np.where(leaf, 0, t.feature)])
+            threshold.append(np.where(leaf, np.inf, t.threshold))
+            value.append(depth + _average_path_length(t.n_node_samples))
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+        return cls(
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            value=np.concatenate(value),
+            roots=np.asarray(roots),
+            depth=max_depth,
+            norm=len(roots) * float(_average_path_length(model.max_samples_)),
+            offset=float(model.offset_),
+            n_features=int(model.n_features_in_),
+        )
+
+    def save(self, path: str | Path) -> None:
+        """Write the arrays as ``.npy`` files and the scalars as JSON."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        scalars = {
+            "depth": self.depth,
+            "norm": self.norm,
+            "offset": self.offset,
+            "n_features": self.n_features,
+        }
+        (path / _SCALARS_FILE).write_text(json.dumps(scalars))
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> CompiledForest:
+        """Read a saved forest, memory-mapping its arrays read-only."""
+        path = Path(path)
+        scalars = json.loads((path / _SCALARS_FILE).read_text())
+        arrays = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None)
+            for name in _ARRAYS
+        }
+        return cls(**arrays, **scalars)
+
+    def decision_function(self, x: np.ndarray) -> np.ndarray:
+        # sklearn's trees compare float32 inputs against float64 thresholds.
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != self.n_features:
+            width = x.shape[1] if x.ndim == 2 else x.shape
+            raise ValueError(
+                f"X has {width} features, but CompiledForest is expecting "
+                f"{self.n_features} features as input."
+            )
+        nodes = np.broadcast_to(self.roots, (x.shape[0], self.roots.size))
+        rows = np.arange(x.shape[0])[:, None]
+        for _ in range(self.depth):
+            go_left = x[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        depths = self.value[nodes].sum(axis=1)
+        return -(2.0 ** (-depths / self.norm)) - self.offset
@@ -1,13 +1,95 @@
-"""Runtime configuration from environment variables."""
+"""
+Runtime configuration from environment variables and an optional file.
+
+``CLOUDPILOT_CONFIG`` may name a YAML (or JSON) file whose top-level keys
+are :class:`CloudPilotSettings` field names, plus a ``namespaces`` mapping
+of per-namespace overrides::
+
+    monitor_max_workers: 32
+    heal_max_pods: 10
+    namespaces:
+      payments:
+        self_heal_confirm: false
+        heal_max_pods: 2
+
+Environment variables win over the file's top level; namespace overrides
+win over both. Hot paths read :func:`get_settings`, a snapshot parsed once
+and swapped atomically when the file changes or on ``SIGHUP``.
+
+Everything read per call follows a reload, and so do the shared Prometheus
+collector (URL, SSL), the Kubernetes client pool (size, TTL), the monitor's
+interval and pool size, and the decision caches. ``metrics_port``/``_addr``,
+``metrics_history_path``/``_size``, the ``serve_*`` settings and
+``CLOUDPILOT_CONFIG`` itself apply at startup only.
+"""
 
 from __future__ import annotations
 
+import logging
 import os
-from dataclasses import dataclass
+import signal
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields, replace
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def _truthy(env: Mapping[str, str], name: str, default: str = "") -> bool:
+    return env.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _positive_int(env: Mapping[str, str], name: str, default: int) -> int:
+    raw = env.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {raw!r}") from None
+    if value < 1:
+        raise ValueError(f"{name} must be at least 1, got {value}")
+    return value
+
+
+def _port(env: Mapping[str, str], name: str) -> int:
+    """A TCP port, or ``0`` (the default) for disabled."""
+    raw = env.get(name, "").strip()
+    if not raw:
+        return 0
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {raw!r}") from None
+    if not 0 <= value <= 65535:
+        raise ValueError(f"{name} must be 0 (disabled) to 65535, got {value}")
+    return value
 
 
-def _truthy(name: str, default: str = "") -> bool:
-    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+def _floats(
+    env: Mapping[str, str], name: str, default: tuple[float, ...]
+) -> tuple[float, ...]:
+    """Comma-separated non-negative floats, e.g. ``1,1,0.01``."""
+    raw = env.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        values = tuple(float(part) for part in raw.split(","))
+    except ValueError:
+        raise ValueError(f"{name} must be numbers like 1,0.5; got {raw!r}") from None
+    if any(value < 0 for value in values):
+        raise ValueError(f"{name} must not be negative, got {raw!r}")
+    return values
+
+
+def _choice(env: Mapping[str, str], name: str, choices: tuple[str, ...]) -> str:
+    """Value of ``name`` from ``choices``, defaulting to the first one."""
+    value = env.get(name, "").strip().lower() or choices[0]
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}; got {value!r}")
+    return value
 
 
 @dataclass(frozen=True)
@@ -18,18 +100,234 @@ class CloudPilotSettings:
     prometheus_disable_ssl: bool
     self_heal_confirm: bool
     aws_pricing_region: str
+    aws_region: str
+    price_catalog_path: str
+    price_catalog_ttl: int
     k8s_dry_run: bool
+    k8s_pool_size: int
+    k8s_client_ttl: int
+    tune_max_parallel: int
+    monitor_max_workers: int
+    monitor_interval: int
+    heal_max_pods: int
+    heal_delete_rate: int
+    anomaly_detector: str
+    model_store_path: str
+    model_check_interval: int
+    metrics_history_path: str
+    metrics_history_size: int
+    metrics_port: int
+    metrics_addr: str
+    serve_max_batch: int
+    serve_batch_window_ms: int
+    serve_timeout_ms: int
+    decision_cache: bool
+    decision_cache_size: int
+    decision_cache_ttl: int
+    scale_cache_quantum: tuple[float, ...]
+    anomaly_cache_quantum: tuple[float, ...]
+    config_path: str
+    config_check_interval: int
+    namespaces: Mapping[str, CloudPilotSettings] = field(default_factory=dict)
 
+    def for_namespace(self, namespace: str | None) -> CloudPilotSettings:
+        """These settings with ``namespace``'s overrides from the config file."""
+        if namespace is None:
+            return self
+        return self.namespaces.get(namespace, self)
 
-def load_settings() -> CloudPilotSettings:
+
+def _parse(env: Mapping[str, str]) -> CloudPilotSettings:
     return CloudPilotSettings(
-        prometheus_url=os.environ.get(
+        prometheus_url=env.get(
             "CLOUDPILOT_PROMETHEUS_URL", "http://localhost:9090"
         ).strip(),
-        prometheus_disable_ssl=_truthy("CLOUDPILOT_PROMETHEUS_DISABLE_SSL", "1"),
-        self_heal_confirm=_truthy("CLOUDPILOT_SELF_HEAL_CONFIRM"),
-        aws_pricing_region=os.environ.get(
+        prometheus_disable_ssl=_truthy(env, "CLOUDPILOT_PROMETHEUS_DISABLE_SSL", "1"),
+        self_heal_confirm=_truthy(env, "CLOUDPILOT_SELF_HEAL_CONFIRM"),
+        aws_pricing_region=env.get(
             "CLOUDPILOT_AWS_PRICING_REGION", "us-east-1"
         ).strip(),
-        k8s_dry_run=_truthy("CLOUDPILOT_K8S_DRY_RUN"),
+        aws_region=env.get("CLOUDPILOT_AWS_REGION", "us-east-1").strip(),
+        price_catalog_path=os.path.expanduser(
+            env.get(
+                "CLOUDPILOT_PRICE_CATALOG", "~/.cache/cloudpilot/ec2-prices.npz"
+            ).strip()
+        ),
+        price_catalog_ttl=_positive_int(env, "CLOUDPILOT_PRICE_CATALOG_TTL", 7 * 86400),
+        k8s_dry_run=_truthy(env, "CLOUDPILOT_K8S_DRY_RUN"),
+        k8s_pool_size=_positive_int(env, "CLOUDPILOT_K8S_POOL_SIZE", 16),
+        k8s_client_ttl=_positive_int(env, "CLOUDPILOT_K8S_CLIENT_TTL", 3600),
+        tune_max_parallel=_positive_int(env, "CLOUDPILOT_TUNE_MAX_PARALLEL", 8),
+        monitor_max_workers=_positive_int(env, "CLOUDPILOT_MONITOR_MAX_WORKERS", 16),
+        monitor_interval=_positive_int(env, "CLOUDPILOT_MONITOR_INTERVAL", 60),
+        heal_max_pods=_positive_int(env, "CLOUDPILOT_HEAL_MAX_PODS", 20),
+        heal_delete_rate=_positive_int(env, "CLOUDPILOT_HEAL_DELETE_RATE", 5),
+        anomaly_detector=_choice(
+            env, "CLOUDPILOT_ANOMALY_DETECTOR", ("isolation_forest", "streaming")
+        ),
+        model_store_path=os.path.expanduser(
+            env.get("CLOUDPILOT_MODEL_STORE", "~/.cache/cloudpilot/models").strip()
+        ),
+        model_check_interval=_positive_int(env, "CLOUDPILOT_MODEL_CHECK_INTERVAL", 30),
+        metrics_history_path=os.path.expanduser(
+            env.get("CLOUDPILOT_METRICS_HISTORY", "").strip()
+        ),
+        metrics_history_size=_positive_int(
+            env, "CLOUDPILOT_METRICS_HISTORY_SIZE", 1440
+        ),
+        metrics_port=_port(env, "CLOUDPILOT_METRICS_PORT"),
+        metrics_addr=env.get("CLOUDPILOT_METRICS_ADDR", "127.0.0.1").strip(),
+        serve_max_batch=_positive_int(env, "CLOUDPILOT_SERVE_MAX_BATCH", 256),
+        serve_batch_window_ms=_positive_int(env, "CLOUDPILOT_SERVE_BATCH_WINDOW_MS", 2),
+        serve_timeout_ms=_positive_int(env, "CLOUDPILOT_SERVE_TIMEOUT_MS", 5000),
+        decision_cache=_truthy(env, "CLOUDPILOT_DECISION_CACHE"),
+        decision_cache_size=_positive_int(env, "CLOUDPILOT_DECISION_CACHE_SIZE", 4096),
+        decision_cache_ttl=_positive_int(env, "CLOUDPILOT_DECISION_CACHE_TTL", 30),
+        scale_cache_quantum=_floats(
+            env, "CLOUDPILOT_SCALE_CACHE_QUANTUM", (1.0, 1.0, 0.01, 1.0, 0.01)
+        ),
+        anomaly_cache_quantum=_floats(
+            env, "CLOUDPILOT_ANOMALY_CACHE_QUANTUM", (1.0, 1.0, 1.0, 1.0)
+        ),
+        config_path=os.path.expanduser(env.get("CLOUDPILOT_CONFIG", "").strip()),
+        config_check_interval=_positive_int(env, "CLOUDPILOT_CONFIG_CHECK_INTERVAL", 5),
     )
+
+
+# Variable names of the fields whose name is not simply upper-cased.
+_ENV_NAMES = {
+    "price_catalog_path": "CLOUDPILOT_PRICE_CATALOG",
+    "model_store_path": "CLOUDPILOT_MODEL_STORE",
+    "metrics_history_path": "CLOUDPILOT_METRICS_HISTORY",
+    "config_path": "CLOUDPILOT_CONFIG",
+}
+
+
+def _as_env(values: Mapping[str, Any], where: str) -> dict[str, str]:
+    """Config-file ``values`` as the environment variables they stand for."""
+    names = {
+        f.name: _ENV_NAMES.get(f.name, f"CLOUDPILOT_{f.name.upper()}")
+        for f in fields(CloudPilotSettings)
+        if f.name not in ("namespaces", "config_path")
+    }
+    unknown = sorted(set(values) - set(names))
+    if unknown:
+        raise ValueError(f"Unknown settings in {where}: {', '.join(unknown)}")
+    env = {}
+    for key, value in values.items():
+        if isinstance(value, bool):
+            value = "1" if value else "0"
+        elif isinstance(value, list | tuple):
+            value = ",".join(str(v) for v in value)
+        env[names[key]] = str(value)
+    return env
+
+
+def _read_config(path: str) -> dict[str, Any]:
+    import yaml
+
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must contain a mapping of settings")
+    return data
+
+
+def load_settings() -> CloudPilotSettings:
+    """Parse the environment and ``CLOUDPILOT_CONFIG`` now (no caching)."""
+    path = os.path.expanduser(os.environ.get("CLOUDPILOT_CONFIG", "").strip())
+    if not path:
+        return _parse(os.environ)
+    data = _read_config(path)
+    overrides = data.pop("namespaces", None) or {}
+    if not isinstance(overrides, dict):
+        raise ValueError(f"'namespaces' in {path} must map namespaces to settings")
+    env = {**_as_env(data, path), **os.environ}
+    namespaces = {
+        str(ns): _parse({**env, **_as_env(values or {}, f"{path} ({ns})")})
+        for ns, values in overrides.items()
+    }
+    return replace(_parse(env), namespaces=namespaces)
+
+
+_settings_lock = threading.Lock()
+_settings: CloudPilotSettings | None = None
+_config_mtime: float | None = None
+_next_check = 0.0
+_reload_requested = False
+
+
+def _mtime(path: str) -> float | None:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def reload_settings() -> CloudPilotSettings:
+    """Parse the settings again and swap them in; raises if they are invalid."""
+    global _settings, _config_mtime, _next_check, _reload_requested
+    with _settings_lock:
+        _reload_requested = False
+        settings = load_settings()
+        _config_mtime = _mtime(settings.config_path) if settings.config_path else None
+        _next_check = time.monotonic() + settings.config_check_interval
+        _settings = settings
+        return settings
+
+
+def get_settings() -> CloudPilotSettings:
+    """
+    The process-wide settings snapshot, parsed on first use.
+
+    At most every ``config_check_interval`` seconds, or after ``SIGHUP``
+    (see :func:`install_reload_signal`), the config file's mtime is checked
+    and a changed file is reloaded. Invalid new settings are logged and the
+    previous snapshot kept. The environment is only read on (re)load.
+    """
+    global _next_check
+    settings = _settings
+    if settings is None:
+        return reload_settings()
+    if not _reload_requested and time.monotonic() < _next_check:
+        return settings
+    if _reload_requested or (
+        settings.config_path and _mtime(settings.config_path) != _config_mtime
+    ):
+        try:
+            return reload_settings()
+        except Exception as e:
+            logger.error("Keeping previous settings; reload failed: %s", e)
+    _next_check = time.monotonic() + settings.config_check_interval
+    return settings
+
+
+def install_reload_signal() -> bool:
+    """
+    Make ``SIGHUP`` reload the settings on the next :func:`get_settings`.
+
+    Only possible from the main thread on platforms with ``SIGHUP``;
+    returns whether the handler was installed.
+    """
+
+    def request_reload(signum: int, frame: object) -> None:
+        global _reload_requested
+        _reload_requested = True
+
+    if not hasattr(signal, "SIGHUP"):
+        return False
+    try:
+        signal.signal(signal.SIGHUP, request_reload)
+    except ValueError:  # not the main thread
+        return False
+    return True
+
+
+def reset_settings_for_testing() -> None:
+    """Drop the snapshot so the next read parses the environment again."""
+    global _settings, _config_mtime, _next_check, _reload_requested
+    with _settings_lock:
+        _settings = None
+        _config_mtime = None
+        _next_check = 0.0
+        _reload_requested = False
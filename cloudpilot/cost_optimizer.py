@@ -1,45 +1,212 @@
 from __future__ import annotations
 
+import functools
 import logging
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
 
 import boto3
+import numpy as np
 
-from cloudpilot.config import load_settings
+from cloudpilot.config import get_settings
+from cloudpilot.instrumentation import record_api_error, timed
+from cloudpilot.pricing_catalog import PriceCatalog, get_price_catalog
 
 logger = logging.getLogger(__name__)
 
 
-def get_aws_cost_optimization(current_instance_type: str) -> str:
+@functools.lru_cache(maxsize=8)
+def _pricing_client(region: str) -> Any:
+    """One Pricing API client per endpoint region, reused across calls."""
+    return boto3.client("pricing", region_name=region)
+
+
+@functools.lru_cache(maxsize=1024)
+def _api_price(instance_type: str, region: str, api_region: str) -> float | None:
+    """On-demand Linux/shared price from the Pricing API, memoized per process."""
+    response = _pricing_client(api_region).get_products(
+        ServiceCode="AmazonEC2",
+        Filters=[
+            {"Type": "TERM_MATCH", "Field": "instanceType", "Value": instance_type},
+            {"Type": "TERM_MATCH", "Field": "regionCode", "Value": region},
+            {"Type": "TERM_MATCH", "Field": "operatingSystem", "Value": "Linux"},
+            {"Type": "TERM_MATCH", "Field": "preInstalledSw", "Value": "NA"},
+            {"Type": "TERM_MATCH", "Field": "tenancy", "Value": "Shared"},
+            {"Type": "TERM_MATCH", "Field": "capacitystatus", "Value": "Used"},
+        ],
+        MaxResults=10,
+    )
+    catalog = PriceCatalog.from_price_list(response.get("PriceList", []))
+    return catalog.price(instance_type, region)
+
+
+def reset_pricing_cache_for_testing() -> None:
+    """Forget cached Pricing API clients and prices (tests only)."""
+    _pricing_client.cache_clear()
+    _api_price.cache_clear()
+
+
+def get_instance_price(instance_type: str, region: str | None = None) -> float | None:
     """
-    Query AWS Pricing API for the instance type and return a short recommendation.
+    Hourly on-demand Linux price, from the local catalog when it is fresh and
+    from the Pricing API (memoized) otherwise.
     """
-    region = load_settings().aws_pricing_region
-    try:
-        pricing = boto3.client("pricing", region_name=region)
-        pricing.get_products(
-            ServiceCode="AmazonEC2",
-            Filters=[
-                {
-                    "Type": "TERM_MATCH",
-                    "Field": "instanceType",
-                    "Value": current_instance_type,
-                },
-                {
-                    "Type": "TERM_MATCH",
-                    "Field": "location",
-                    "Value": "US East (N. Virginia)",
-                },
-                {"Type": "TERM_MATCH", "Field": "operatingSystem", "Value": "Linux"},
-                {"Type": "TERM_MATCH", "Field": "preInstalledSw", "Value": "NA"},
-                {"Type": "TERM_MATCH", "Field": "tenancy", "Value": "Shared"},
-                {"Type": "TERM_MATCH", "Field": "capacitystatus", "Value": "Used"},
-            ],
-            MaxResults=1,
-        )
-        return (
-            f"Retrieved pricing data for {current_instance_type}. "
-            f"Consider comparing with alternatives (e.g., m5.large) for cost savings."
+    settings = get_settings()
+    region = region or settings.aws_region
+    catalog = get_price_catalog()
+    if catalog is not None:
+        price = catalog.price(instance_type, region)
+        if price is not None:
+            return price
+    with timed("aws_pricing"):
+        return _api_price(instance_type, region, settings.aws_pricing_region)
+
+
+@dataclass(frozen=True)
+class InstanceRecommendation:
+    """A cheaper instance type that still fits the observed load."""
+
+    instance_type: str
+    price_per_hour: float
+    hourly_savings: float
+    savings_pct: float
+    vcpu: float
+    memory_gib: float
+
+
+def recommend_fleet(
+    instances: Sequence[tuple[str, float | None, float | None]],
+    catalog: PriceCatalog | None = None,
+    region: str | None = None,
+    operating_system: str = "Linux",
+    tenancy: str = "Shared",
+    headroom: float = 0.2,
+    top_n: int = 3,
+    chunk_size: int = 2048,
+) -> list[list[InstanceRecommendation]]:
+    """
+    Cheapest fitting alternatives for many ``(instance_type, cpu_util, mem_util)``.
+
+    Utilizations are percentages of the current instance's vCPUs and memory.
+    A candidate fits when it offers at least the used vCPUs and memory plus
+    ``headroom`` (an unknown, ``None`` utilization needs the current amount,
+    without headroom), has the same architecture, and at least the same network
+    bandwidth. Candidates come from the catalog's price-sorted partition, so
+    the first ``top_n`` fits per instance are the cheapest; only types cheaper
+    than the current one are returned. Instances missing from the catalog get
+    an empty list.
+    """
+    catalog = catalog or get_price_catalog()
+    if catalog is None:
+        raise LookupError("No price catalog available; import one first.")
+    region = region or get_settings().aws_region
+    candidates = catalog.partition(region, operating_system, tenancy)
+    num = catalog.numeric
+    cand_price = num["price"][candidates]
+    cand_vcpu = num["vcpu"][candidates]
+    cand_mem = num["memory_gib"][candidates]
+    cand_net = num["network_gbps"][candidates]
+    cand_arch = catalog.codes["arch"][candidates]
+
+    current = catalog.rows([i[0] for i in instances], region, operating_system, tenancy)
+    util = np.array([[i[1], i[2]] for i in instances], dtype=np.float64).reshape(-1, 2)
+    util = np.where(
+        np.isnan(util), 1.0, np.clip(util, 0.0, 100.0) / 100.0 * (1.0 + headroom)
+    )
+    known = current >= 0
+    rows = np.where(known, current, 0)
+    need_vcpu = num["vcpu"][rows] * util[:, 0]
+    need_mem = num["memory_gib"][rows] * util[:, 1]
+    cur_price = num["price"][rows]
+    cur_net = num["network_gbps"][rows]
+    cur_arch = catalog.codes["arch"][rows]
+
+    results: list[list[InstanceRecommendation]] = []
+    for start in range(0, len(instances), chunk_size):
+        sl = slice(start, start + chunk_size)
+        fits = (
+            (cand_vcpu >= need_vcpu[sl, None])
+            & (cand_mem >= need_mem[sl, None])
+            & (cand_net >= cur_net[sl, None])
+            & (cand_arch == cur_arch[sl, None])
+            & (cand_price < cur_price[sl, None])
+            & (candidates != current[sl, None])
+            & known[sl, None]
         )
+        ranks = np.cumsum(fits, axis=1)
+        chosen = fits & (ranks <= top_n)
+        for offset, cols in enumerate(chosen):
+            base = cur_price[start + offset]
+            picks = []
+            for col in np.flatnonzero(cols):
+                price = float(cand_price[col])
+                picks.append(
+                    InstanceRecommendation(
+                        instance_type=catalog.instance_type_at(int(candidates[col])),
+                        price_per_hour=price,
+                        hourly_savings=float(base) - price,
+                        savings_pct=100.0 * (float(base) - price) / float(base),
+                        vcpu=float(cand_vcpu[col]),
+                        memory_gib=float(cand_mem[col]),
+                    )
+                )
+            results.append(picks)
+    return results
+
+
+def recommend_instances(
+    current_instance_type: str,
+    cpu_util: float | None = None,
+    mem_util: float | None = None,
+    **kwargs: Any,
+) -> list[InstanceRecommendation]:
+    """Single-instance form of :func:`recommend_fleet`."""
+    return recommend_fleet([(current_instance_type, cpu_util, mem_util)], **kwargs)[0]
+
+
+def get_aws_cost_optimization(
+    current_instance_type: str,
+    cpu_util: float | None = None,
+    mem_util: float | None = None,
+) -> str:
+    """
+    Price the instance type and recommend cheaper types that fit the load.
+
+    A utilization that was not observed is not shrunk: the search only
+    accepts types with at least the current vCPUs (or memory). Ranked
+    alternatives need a local price catalog.
+    """
+    region = get_settings().aws_region
+    try:
+        price = get_instance_price(current_instance_type, region)
     except Exception as e:
+        record_api_error("aws")
         logger.debug("AWS pricing error: %s", e)
         return f"Error retrieving pricing data: {str(e)}"
+    if price is None:
+        return (
+            "Error retrieving pricing data: no on-demand Linux price for "
+            f"{current_instance_type} in {region}."
+        )
+    summary = (
+        f"Retrieved pricing data for {current_instance_type}: "
+        f"${price:.4f}/hour on-demand in {region}."
+    )
+    catalog = get_price_catalog()
+    if catalog is None:
+        return (
+            f"{summary} Import a price catalog "
+            "(python -m cloudpilot.pricing_catalog) to rank cheaper alternatives."
+        )
+    picks = recommend_instances(
+        current_instance_type, cpu_util, mem_util, catalog=catalog, region=region
+    )
+    if not picks:
+        return f"{summary} No cheaper instance type fits the observed load."
+    ranked = "; ".join(
+        f"{p.instance_type} at ${p.price_per_hour:.4f}/hour "
+        f"(saves {p.savings_pct:.1f}%)"
+        for p in picks
+    )
+    return f"{summary} Cheaper fits: {ranked}."
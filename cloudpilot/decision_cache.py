@@ -0,0 +1,175 @@
+"""Bounded LRU + TTL memo of model decisions keyed on quantized states."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from typing import Any, TypeVar
+
+import numpy as np
+
+from cloudpilot.config import get_settings
+from cloudpilot.instrumentation import record_cache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# State width of each shared cache's decisions.
+_WIDTHS = {"scale": 5, "anomaly": 4}
+
+_caches_lock = threading.Lock()
+# Name -> (the settings the cache was built from, the cache or None).
+_caches: dict[str, tuple[tuple[Any, ...], DecisionCache | None]] = {}
+
+
+class DecisionCache:
+    """
+    Memoize ``compute()`` per quantized state for one model at a time.
+
+    States are divided by ``quantum`` (a scalar or one step per feature) and
+    rounded, so states within half a step of each other share a decision; a
+    zero step keys that feature on its exact value. At most ``max_size``
+    entries are kept, least recently used first out, and each expires
+    ``ttl`` seconds after it was computed. Passing a different ``model``
+    (compared by identity) than the entries were computed with clears the
+    cache, so reloaded or replaced models never serve stale answers. A state
+    whose width does not match ``quantum`` is computed without the cache.
+    """
+
+    def __init__(
+        self,
+        name: str = "decisions",
+        max_size: int = 4096,
+        ttl: float = 30.0,
+        quantum: float | Sequence[float] = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        steps = np.asarray(quantum, dtype=np.float64)
+        self._exact = steps <= 0
+        self._step = np.where(self._exact, 1.0, steps)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[float, ...], tuple[float, Any]] = OrderedDict()
+        self._model: Any = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, state: Sequence[float] | np.ndarray) -> tuple[float, ...]:
+        x = np.asarray(state, dtype=np.float64)
+        return tuple(np.where(self._exact, x, np.round(x / self._step)).tolist())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _check_model(self, model: Any) -> None:
+        """Drop every entry if ``model`` replaced the one they came from."""
+        if model is not self._model:
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+                record_cache(self.name, "invalidation")
+            self._model = model
+
+    def get(
+        self, state: Sequence[float] | np.ndarray, model: Any, compute: Callable[[], T]
+    ) -> T:
+        """The cached decision for ``state`` under ``model``, else ``compute()``."""
+        try:
+            key = self.key(state)
+        except ValueError:
+            return compute()
+        now = self._clock()
+        with self._lock:
+            self._check_model(model)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache(self.name, "hit")
+                return entry[1]
+            self.misses += 1
+        record_cache(self.name, "miss")
+        # Computed outside the lock: concurrent misses on one key may both
+        # run the model, but lookups never wait on inference.
+        value = compute()
+        with self._lock:
+            if model is not self._model:
+                # Replaced while computing; a newer model owns the cache now.
+                return value
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                record_cache(self.name, "eviction")
+        return value
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def _build(name: str, config: tuple[Any, ...]) -> DecisionCache | None:
+    enabled, max_size, ttl, quantum = config
+    if not enabled:
+        return None
+    width = _WIDTHS[name]
+    if len(quantum) not in (1, width):
+        logger.warning(
+            "Decision cache %r disabled: its quantum has %s steps, states have %s",
+            name,
+            len(quantum),
+            width,
+        )
+        return None
+    return DecisionCache(name, max_size=max_size, ttl=ttl, quantum=quantum)
+
+
+def get_decision_cache(name: str) -> DecisionCache | None:
+    """
+    Shared cache for ``"scale"`` or ``"anomaly"`` decisions, or ``None``
+    unless ``CLOUDPILOT_DECISION_CACHE`` is set. The cache is rebuilt (and
+    emptied) when a settings reload changes its size, TTL or quantum, and
+    disabled with a warning when its quantum does not fit the state width.
+    """
+    settings = get_settings()
+    config = (
+        settings.decision_cache,
+        settings.decision_cache_size,
+        settings.decision_cache_ttl,
+        getattr(settings, f"{name}_cache_quantum"),
+    )
+    entry = _caches.get(name)
+    if entry is not None and entry[0] == config:
+        return entry[1]
+    with _caches_lock:
+        entry = _caches.get(name)
+        if entry is None or entry[0] != config:
+            entry = (config, _build(name, config))
+            _caches[name] = entry
+        return entry[1]
+
+
+def reset_decision_caches_for_testing() -> None:
+    with _caches_lock:
+        _caches.clear()
@@ -0,0 +1,271 @@
+"""CloudPilot's own latency histograms and counters, served on ``/metrics``."""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cloudpilot.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Per labels: [per-bucket counts (+Inf last), sum].
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][slot] += 1
+            series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip((*self.buckets, "+Inf"), counts, strict=True):
+                    cumulative += n
+                    le = _labels(names, labels, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(names, labels)} {total[0]}")
+                lines.append(f"{self.name}_count{_labels(names, labels)} {cumulative}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+STAGE_SECONDS = Histogram(
+    "cloudpilot_stage_duration_seconds",
+    "Duration of one CloudPilot stage (queries, inference, pod listing, heals).",
+    ("stage",),
+)
+CYCLE_SECONDS = Histogram(
+    "cloudpilot_cycle_duration_seconds",
+    "Duration of one monitoring or tuning cycle.",
+    ("loop",),
+)
+CYCLE_OVERRUNS = Counter(
+    "cloudpilot_cycle_overruns_total",
+    "Cycles that took longer than their check_interval.",
+    ("loop",),
+)
+API_ERRORS = Counter(
+    "cloudpilot_api_errors_total",
+    "Failed calls to external APIs.",
+    ("api",),
+)
+DECISION_CACHE = Counter(
+    "cloudpilot_decision_cache_total",
+    "Decision cache lookups by outcome (hit, miss, eviction, invalidation).",
+    ("cache", "result"),
+)
+METRICS: tuple[Histogram | Counter, ...] = (
+    STAGE_SECONDS,
+    CYCLE_SECONDS,
+    CYCLE_OVERRUNS,
+    API_ERRORS,
+    DECISION_CACHE,
+)
+
+_enabled = False
+_NOOP = nullcontext()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    """Start recording; until then every helper below is a no-op."""
+    global _enabled
+    _enabled = True
+
+
+@contextmanager
+def _timed(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+def timed(stage: str) -> AbstractContextManager[None]:
+    """Context manager recording the block's duration under ``stage``."""
+    if not _enabled:
+        return _NOOP
+    return _timed(stage)
+
+
+def record_cycle(loop: str, seconds: float, interval: float) -> None:
+    """Record one cycle's duration and whether it overran ``interval``."""
+    if not _enabled:
+        return
+    CYCLE_SECONDS.observe(seconds, loop)
+    if seconds > interval:
+        CYCLE_OVERRUNS.inc(loop)
+
+
+def record_api_error(api: str) -> None:
+    if _enabled:
+        API_ERRORS.inc(api)
+
+
+def record_cache(cache: str, result: str) -> None:
+    if _enabled:
+        DECISION_CACHE.inc(cache, result)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+_server_lock = threading.Lock()
+_server: ThreadingHTTPServer | None = None
+
+
+def start_metrics_server(port: int, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Enable recording and serve ``/metrics`` on a daemon thread (once)."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(
+                target=_server.serve_forever, name="cloudpilot-metrics", daemon=True
+            ).start()
+            logger.info("Serving CloudPilot metrics on %s:%s/metrics", addr, port)
+        enable()
+        return _server
+
+
+def start_metrics_server_from_settings() -> ThreadingHTTPServer | None:
+    """
+    Serve ``/metrics`` when ``CLOUDPILOT_METRICS_PORT`` is set, on
+    ``CLOUDPILOT_METRICS_ADDR`` (loopback unless an operator widens it).
+    """
+    settings = get_settings()
+    if not settings.metrics_port:
+        return None
+    return start_metrics_server(settings.metrics_port, settings.metrics_addr)
+
+
+def reset_instrumentation_for_testing() -> None:
+    """Disable recording, clear values and stop the server (tests only)."""
+    global _enabled, _server
+    _enabled = False
+    for metric in METRICS:
+        metric.clear()
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+        _server = None
@@ -1,57 +1,90 @@
 from __future__ import annotations
 
 import logging
-
-from kubernetes import client, config
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
 
 from cloudpilot.anomaly_detector import (
-    detect_anomaly,
+    detect_anomalies,
     get_prometheus_metrics,
     self_heal,
 )
-from cloudpilot.config import load_settings
+from cloudpilot.config import get_settings
+from cloudpilot.instrumentation import timed
+from cloudpilot.k8s_client import get_kube_clients, note_api_error
 
 logger = logging.getLogger(__name__)
 
+# A dict body otherwise goes out as a JSON Patch, which expects an op list.
+STRATEGIC_MERGE_PATCH = "application/strategic-merge-patch+json"
+
+
+@dataclass
+class TuneResult:
+    """Per-deployment outcome of a tuning pass."""
+
+    deployment: str
+    status: str  # "patched", "dry_run", "unchanged" or "error"
+    changes: list[str] = field(default_factory=list)
+    error: str | None = None
+
+
+def tuned_cpu(current_cpu: object) -> str | None:
+    """Heuristic: reduce a millicore CPU value by 10% if above 500m."""
+    if isinstance(current_cpu, str) and current_cpu.endswith("m"):
+        current_cpu_val = int(current_cpu.rstrip("m"))
+        if current_cpu_val > 500:
+            return f"{int(current_cpu_val * 0.9)}m"
+    return None
+
+
+def build_cpu_patch(deployment: Any) -> tuple[dict[str, Any] | None, list[str]]:
+    """
+    Compute a strategic-merge patch that only touches container CPU resources.
+
+    Containers are matched by name, so the patch carries just the changed
+    ``resources.limits.cpu`` (and ``requests.cpu`` when set) fields. Returns
+    ``(None, [])`` when nothing needs adjusting.
+    """
+    containers: list[dict[str, Any]] = []
+    changes: list[str] = []
+    for container in deployment.spec.template.spec.containers:
+        resources = container.resources
+        if not (resources and resources.limits and "cpu" in resources.limits):
+            continue
+        current_cpu = resources.limits["cpu"]
+        new_cpu = tuned_cpu(current_cpu)
+        if new_cpu is None:
+            continue
+        patch_resources: dict[str, Any] = {"limits": {"cpu": new_cpu}}
+        if resources.requests and "cpu" in resources.requests:
+            patch_resources["requests"] = {"cpu": new_cpu}
+        containers.append({"name": container.name, "resources": patch_resources})
+        changes.append(f"{container.name}: {current_cpu} -> {new_cpu}")
+        logger.info(
+            "Adjusted container '%s' CPU limit from %s to %s",
+            container.name,
+            current_cpu,
+            new_cpu,
+        )
+    if not containers:
+        return None, []
+    return {"spec": {"template": {"spec": {"containers": containers}}}}, changes
+
 
 def tune_deployment(deployment_name: str, namespace: str = "default") -> str:
     """
     Auto-tune deployment CPU limits (heuristic): reduce limit by 10% if above 500m.
     Respects CLOUDPILOT_K8S_DRY_RUN=1 to log changes without patching.
     """
-    settings = load_settings()
+    settings = get_settings().for_namespace(namespace)
     try:
-        config.load_kube_config()
-        apps_v1 = client.AppsV1Api()
-        deployment = apps_v1.read_namespaced_deployment(deployment_name, namespace)
-
-        modified = False
-        for container in deployment.spec.template.spec.containers:
-            if (
-                container.resources
-                and container.resources.limits
-                and "cpu" in container.resources.limits
-            ):
-                current_cpu = container.resources.limits["cpu"]
-                if isinstance(current_cpu, str) and current_cpu.endswith("m"):
-                    current_cpu_val = int(current_cpu.rstrip("m"))
-                    if current_cpu_val > 500:
-                        new_cpu_val = int(current_cpu_val * 0.9)
-                        container.resources.limits["cpu"] = f"{new_cpu_val}m"
-                        if (
-                            container.resources.requests
-                            and "cpu" in container.resources.requests
-                        ):
-                            container.resources.requests["cpu"] = f"{new_cpu_val}m"
-                        modified = True
-                        logger.info(
-                            "Adjusted container '%s' CPU limit from %s to %sm",
-                            container.name,
-                            current_cpu,
-                            new_cpu_val,
-                        )
-
-        if not modified:
+        apps_v1 = get_kube_clients().apps_v1()
+        with timed("deployment_read"):
+            deployment = apps_v1.read_namespaced_deployment(deployment_name, namespace)
+        patch, _ = build_cpu_patch(deployment)
+        if patch is None:
             return (
                 "No adjustments made. Deployment resources are within "
                 "desired thresholds."
@@ -61,17 +94,103 @@ def tune_deployment(deployment_name: str, namespace: str = "default") -> str:
                 "Dry run: would patch deployment with updated CPU limits "
                 "(CLOUDPILOT_K8S_DRY_RUN=1)."
             )
-        apps_v1.patch_namespaced_deployment(deployment_name, namespace, deployment)
+        with timed("deployment_patch"):
+            apps_v1.patch_namespaced_deployment(
+                deployment_name,
+                namespace,
+                patch,
+                _content_type=STRATEGIC_MERGE_PATCH,
+            )
         return "Deployment tuned successfully."
     except Exception as e:
+        note_api_error(e)
         return f"Error tuning deployment: {str(e)}"
 
 
+def tune_namespace(
+    namespace: str = "default",
+    label_selector: str | None = None,
+    max_parallel: int | None = None,
+) -> list[TuneResult]:
+    """
+    Tune every deployment in ``namespace`` (optionally filtered by label).
+
+    Deployments are listed with one API call, patches are computed locally,
+    and only the changed CPU fields are sent, at most ``max_parallel`` at a
+    time (default ``CLOUDPILOT_TUNE_MAX_PARALLEL``). Respects
+    CLOUDPILOT_K8S_DRY_RUN=1. Raises if the list call itself fails.
+    """
+    settings = get_settings().for_namespace(namespace)
+    max_parallel = max_parallel or settings.tune_max_parallel
+    apps_v1 = get_kube_clients().apps_v1()
+    with timed("deployment_list"):
+        listing = apps_v1.list_namespaced_deployment(
+            namespace, label_selector=label_selector or ""
+        )
+
+    results: list[TuneResult] = []
+    pending: list[tuple[TuneResult, dict[str, Any]]] = []
+    for deployment in listing.items:
+        name = str(deployment.metadata.name)
+        try:
+            patch, changes = build_cpu_patch(deployment)
+        except Exception as e:
+            results.append(TuneResult(name, "error", error=str(e)))
+            continue
+        if patch is None:
+            results.append(TuneResult(name, "unchanged"))
+        elif settings.k8s_dry_run:
+            results.append(TuneResult(name, "dry_run", changes))
+        else:
+            result = TuneResult(name, "patched", changes)
+            results.append(result)
+            pending.append((result, patch))
+
+    def send(result: TuneResult, patch: dict[str, Any]) -> None:
+        try:
+            with timed("deployment_patch"):
+                apps_v1.patch_namespaced_deployment(
+                    result.deployment,
+                    namespace,
+                    patch,
+                    _content_type=STRATEGIC_MERGE_PATCH,
+                )
+        except Exception as e:
+            note_api_error(e)
+            result.status = "error"
+            result.error = str(e)
+            logger.error("Patching deployment %s failed: %s", result.deployment, e)
+
+    if pending:
+        with ThreadPoolExecutor(min(max_parallel, len(pending))) as pool:
+            list(pool.map(lambda item: send(*item), pending))
+    return results
+
+
+def format_tune_report(results: list[TuneResult]) -> str:
+    """One line per deployment plus a status summary."""
+    lines = []
+    for r in results:
+        detail = r.error if r.error else ", ".join(r.changes)
+        lines.append(f"{r.deployment}: {r.status}" + (f" ({detail})" if detail else ""))
+    counts: dict[str, int] = {}
+    for r in results:
+        counts[r.status] = counts.get(r.status, 0) + 1
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    lines.append(f"{len(results)} deployments: {summary or 'none found'}")
+    return "\n".join(lines)
+
+
 def tune_and_monitor(deployment_name: str, namespace: str = "default") -> str:
+    with timed("tune_and_monitor"):
+        return _tune_and_monitor(deployment_name, namespace)
+
+
+def _tune_and_monitor(deployment_name: str, namespace: str) -> str:
     tune_result = tune_deployment(deployment_name, namespace)
     logger.info("Tuning result: %s", tune_result)
 
-    metrics = get_prometheus_metrics()
+    metrics = get_prometheus_metrics(namespace=namespace)
     logger.info(
         "Current metrics: CPU: %s, Memory: %s, Request Rate: %s, Latency: %s",
         metrics[0],
@@ -80,7 +199,8 @@ def tune_and_monitor(deployment_name: str, namespace: str = "default") -> str:
         metrics[3],
     )
 
-    if detect_anomaly(metrics):
+    mask, _ = detect_anomalies([metrics], series=[namespace])
+    if mask[0]:
         logger.warning("Anomaly detected. Initiating self-healing procedures...")
         heal_result = self_heal(namespace)
         return f"Tuning complete. Anomaly detected and healed: {heal_result}"
@@ -0,0 +1,133 @@
+"""Process-wide, pooled Kubernetes API clients."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Protocol
+
+from kubernetes import client, config
+
+from cloudpilot.config import get_settings
+from cloudpilot.instrumentation import record_api_error
+
+logger = logging.getLogger(__name__)
+
+
+class KubeClients(Protocol):
+    def core_v1(self) -> Any: ...
+
+    def apps_v1(self) -> Any: ...
+
+    def invalidate(self) -> None: ...
+
+
+class KubeClientProvider:
+    """
+    Loads cluster configuration once and hands out API objects that share one
+    pooled ``ApiClient``.
+
+    In-cluster service account config is used when running in a pod, the
+    kubeconfig otherwise. Token-based credentials refresh through the client's
+    ``refresh_api_key_hook``; on top of that the configuration is reloaded
+    after ``ttl`` seconds, or on the next call after :meth:`invalidate` (for
+    example when the API server answers 401). Without explicit values, the
+    pool size and TTL follow the current settings, and a reloaded pool size
+    takes effect on the next call.
+    """
+
+    def __init__(self, pool_size: int | None = None, ttl: float | None = None) -> None:
+        self._pool_size = pool_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._api_client: client.ApiClient | None = None
+        self._apis: dict[type, Any] = {}
+        self._loaded_at = 0.0
+        self._loaded_pool_size = 0
+
+    @property
+    def pool_size(self) -> int:
+        """The explicit pool size, else ``k8s_pool_size`` from current settings."""
+        return self._pool_size or get_settings().k8s_pool_size
+
+    @property
+    def ttl(self) -> float:
+        return get_settings().k8s_client_ttl if self._ttl is None else self._ttl
+
+    def _load_configuration(self, pool_size: int) -> client.Configuration:
+        configuration = client.Configuration()
+        if os.environ.get("KUBERNETES_SERVICE_HOST"):
+            config.load_incluster_config(client_configuration=configuration)
+        else:
+            config.load_kube_config(client_configuration=configuration)
+        configuration.connection_pool_maxsize = pool_size
+        return configuration
+
+    def api_client(self) -> client.ApiClient:
+        pool_size = self.pool_size
+        ttl = self.ttl
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at > ttl
+            resized = pool_size != self._loaded_pool_size
+            if self._api_client is None or expired or resized:
+                # The previous client is left for in-flight callers and GC.
+                self._api_client = client.ApiClient(self._load_configuration(pool_size))
+                self._loaded_pool_size = pool_size
+                self._apis = {}
+                self._loaded_at = time.monotonic()
+                logger.debug("Loaded Kubernetes client configuration")
+            return self._api_client
+
+    def _api(self, api_cls: type) -> Any:
+        api_client = self.api_client()
+        with self._lock:
+            api = self._apis.get(api_cls)
+            if api is None or api.api_client is not api_client:
+                api = api_cls(api_client)
+                self._apis[api_cls] = api
+            return api
+
+    def core_v1(self) -> client.CoreV1Api:
+        return self._api(client.CoreV1Api)
+
+    def apps_v1(self) -> client.AppsV1Api:
+        return self._api(client.AppsV1Api)
+
+    def invalidate(self) -> None:
+        """Force a configuration reload on the next call."""
+        with self._lock:
+            self._api_client = None
+            self._apis = {}
+
+
+_provider_lock = threading.Lock()
+_provider: KubeClients | None = None
+
+
+def get_kube_clients() -> KubeClients:
+    """Shared client provider, created on first use."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = KubeClientProvider()
+        return _provider
+
+
+def set_kube_clients_for_testing(provider: KubeClients | None) -> None:
+    """Install a fake provider (or ``None`` to reset) for tests."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def note_api_error(error: BaseException) -> None:
+    """
+    Count a failed Kubernetes call and invalidate cached credentials when the
+    API server rejected them.
+    """
+    record_api_error("kubernetes")
+    if isinstance(error, client.ApiException) and error.status == 401:
+        logger.info("Kubernetes API returned 401; reloading credentials")
+        get_kube_clients().invalidate()
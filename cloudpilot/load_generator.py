@@ -0,0 +1,337 @@
+"""Open-loop HTTP load generation with an HDR-style latency histogram."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import ssl
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from cloudpilot.load_tester import iter_arrivals
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latencies with ``significant_figures`` precision.
+
+    Like HdrHistogram: values are recorded in whole ``resolution`` units and
+    each power-of-two range is split into ``2**sub_bits`` linear buckets, so
+    any recorded value is reported within ``10**-significant_figures`` of its
+    true value. Values above ``highest`` seconds are clamped to it.
+    """
+
+    def __init__(
+        self,
+        highest: float = 3600.0,
+        significant_figures: int = 3,
+        resolution: float = 1e-6,
+    ) -> None:
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.resolution = resolution
+        self._sub_bits = math.ceil(math.log2(2 * 10**significant_figures))
+        self._highest = int(highest / resolution)
+        self._counts = np.zeros(self._index(self._highest) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, units: int) -> int:
+        shift = max(0, units.bit_length() - self._sub_bits)
+        return (shift << (self._sub_bits - 1)) + (units >> shift)
+
+    def _upper(self, index: int) -> float:
+        """Highest value (seconds) that lands in bucket ``index``."""
+        shift = max(0, (index >> (self._sub_bits - 1)) - 1)
+        sub = index - (shift << (self._sub_bits - 1))
+        return (((sub + 1) << shift) - 1) * self.resolution
+
+    def record(self, seconds: float) -> None:
+        units = min(max(int(seconds / self.resolution), 0), self._highest)
+        self._counts[self._index(units)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: LatencyHistogram) -> None:
+        if other._counts.shape != self._counts.shape:
+            raise ValueError("Histograms have different ranges or precision")
+        self._counts += other._counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Latency (seconds) at or below which ``q`` percent of values fall."""
+        if not 0 <= q <= 100:
+            raise ValueError("Percentile must be between 0 and 100")
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        index = int(np.searchsorted(np.cumsum(self._counts), rank))
+        return min(self._upper(index), self.max)
+
+
+@dataclass
+class LoadReport:
+    """
+    Outcome of one load run.
+
+    ``scheduled`` requests were due within ``duration_s`` seconds. Latency is
+    measured from each request's scheduled time, so queueing behind a slow
+    target or a full connection pool is included (no coordinated omission).
+    Timed-out requests are recorded at their time to the timeout, a lower
+    bound, so the tail percentiles never leave out the slowest requests.
+    ``completed`` counts responses of any status; ``errors`` maps ``"HTTP
+    <status>"`` for 4xx/5xx responses and exception names for failed requests
+    to their counts. ``max_lag_s`` is how far behind schedule the generator
+    itself fell.
+    """
+
+    url: str
+    duration_s: float
+    scheduled: int = 0
+    completed: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+    max_lag_s: float = 0.0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def offered_rate(self) -> float:
+        return self.scheduled / self.duration_s if self.duration_s else 0.0
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def error_rate(self) -> float:
+        return self.error_count / self.scheduled if self.scheduled else 0.0
+
+    def percentiles(self) -> dict[str, float]:
+        return {
+            "p50": self.latency.percentile(50),
+            "p90": self.latency.percentile(90),
+            "p99": self.latency.percentile(99),
+            "p99.9": self.latency.percentile(99.9),
+        }
+
+    def summary(self) -> str:
+        pct = ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in self.percentiles().items())
+        return (
+            f"{self.scheduled} requests at {self.offered_rate:.1f} req/s, "
+            f"{self.completed} responses, {self.error_rate:.2%} errors; {pct}"
+        )
+
+
+class _ConnectionPool:
+    """At most ``size`` keep-alive HTTP/1.1 connections to one host."""
+
+    def __init__(self, url: str, size: int) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Expected an http(s) URL, got {url!r}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.netloc = parts.netloc
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def request(self, head: bytes, timeout: float) -> int:
+        """Send ``head`` and return the response status."""
+        async with self._slots:
+            reused = bool(self._idle)
+            while True:
+                if reused:
+                    conn = self._idle.pop()
+                else:
+                    conn = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port, ssl=self.ssl),
+                        timeout,
+                    )
+                try:
+                    status, keep_alive = await asyncio.wait_for(
+                        _exchange(*conn, head), timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conn[1].close()
+                    # The server may have closed an idle connection; retry once.
+                    if not reused:
+                        raise
+                    reused = False
+                    continue
+                except BaseException:
+                    conn[1].close()
+                    raise
+                if keep_alive:
+                    self._idle.append(conn)
+                else:
+                    conn[1].close()
+                return status
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+async def _exchange(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, head: bytes
+) -> tuple[int, bool]:
+    """
+    One request/response; returns ``(status, connection reusable)``.
+
+    Interim 1xx responses are skipped. 204, 304 and responses to ``HEAD``
+    have no body; other responses without a length are read to EOF only
+    when the server closes the connection.
+    """
+    writer.write(head)
+    await writer.drain()
+    status = 100
+    while 100 <= status < 200 and status != 101:
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b"", None)
+        version, code, *_ = status_line.decode("latin-1").split(None, 2)
+        status = int(code)
+        headers: dict[str, str] = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+    keep_alive = headers.get("connection") != "close" and version != "HTTP/1.0"
+    if status in (101, 204, 304) or head.startswith(b"HEAD "):
+        return status, keep_alive and status != 101
+    if headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        while await reader.readline() not in (b"\r\n", b""):
+            pass
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif not keep_alive:
+        await reader.read()
+    return status, keep_alive
+
+
+async def run_load(
+    url: str,
+    arrivals: np.ndarray | Iterable[np.ndarray],
+    duration: float | None = None,
+    method: str = "GET",
+    body: bytes = b"",
+    connections: int = 100,
+    timeout: float = 10.0,
+    max_in_flight: int = 10_000,
+) -> LoadReport:
+    """
+    Send one request to ``url`` at each arrival time (seconds from start).
+
+    ``arrivals`` is a sorted array or an iterable of sorted chunks, such as
+    :func:`~cloudpilot.load_tester.iter_arrivals`. The generator is open-loop:
+    each request starts at its scheduled time whether or not earlier ones have
+    finished, sharing up to ``connections`` keep-alive connections. Requests
+    due while ``max_in_flight`` are outstanding are counted as ``dropped``
+    errors instead of being delayed.
+    """
+    if connections < 1 or max_in_flight < 1:
+        raise ValueError("connections and max_in_flight must be positive")
+    pool = _ConnectionPool(url, connections)
+    head = (
+        f"{method} {pool.path} HTTP/1.1\r\nHost: {pool.netloc}\r\n"
+        f"User-Agent: cloudpilot-load\r\nAccept: */*\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("latin-1") + body
+    chunks = [arrivals] if isinstance(arrivals, np.ndarray) else arrivals
+    loop = asyncio.get_running_loop()
+    report = LoadReport(url, duration_s=duration or 0.0)
+    in_flight: set[asyncio.Task[None]] = set()
+
+    def error(kind: str) -> None:
+        report.errors[kind] = report.errors.get(kind, 0) + 1
+
+    async def fire(due: float) -> None:
+        try:
+            status = await pool.request(head, timeout)
+        except asyncio.TimeoutError:
+            report.latency.record(max(loop.time() - due, timeout))
+            error("timeout")
+            return
+        except Exception as e:
+            error(type(e).__name__)
+            return
+        report.latency.record(loop.time() - due)
+        report.completed += 1
+        if status >= 400:
+            error(f"HTTP {status}")
+
+    start = loop.time()
+    last = 0.0
+    try:
+        for chunk in chunks:
+            for offset in np.asarray(chunk, dtype=np.float64).tolist():
+                due = start + offset
+                now = loop.time()
+                if due > now:
+                    await asyncio.sleep(due - now)
+                else:
+                    report.max_lag_s = max(report.max_lag_s, now - due)
+                report.scheduled += 1
+                last = offset
+                if len(in_flight) >= max_in_flight:
+                    error("dropped")
+                    continue
+                task = loop.create_task(fire(due))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    finally:
+        for task in in_flight:
+            task.cancel()
+        pool.close()
+    if duration is None:
+        report.duration_s = last
+    return report
+
+
+def generate_load(
+    url: str,
+    duration: int,
+    intensity: float,
+    pattern: str = "normal",
+    connections: int = 100,
+    timeout: float = 10.0,
+    seed: int | None = None,
+) -> LoadReport:
+    """
+    Drive ``url`` for ``duration`` seconds on the Poisson schedule of
+    :func:`~cloudpilot.load_tester.simulate_workload`.
+    """
+    arrivals = iter_arrivals(duration, intensity, pattern, seed=seed)
+    report = asyncio.run(
+        run_load(
+            url,
+            arrivals,
+            duration=duration,
+            connections=connections,
+            timeout=timeout,
+        )
+    )
+    logger.info("Load on %s: %s", url, report.summary())
+    return report
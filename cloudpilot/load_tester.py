@@ -1,10 +1,19 @@
 from __future__ import annotations
 
 import logging
-import time
+from collections.abc import Iterator
+from typing import Any
 
 import numpy as np
 
+from cloudpilot.traffic_patterns import (
+    Constant,
+    RatePattern,
+    iter_pattern_arrivals,
+    pattern_from_name,
+    sample_arrivals,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,53 +26,172 @@ def get_intensity_from_pattern(pattern: str, base_intensity: float) -> float:
     return base_intensity
 
 
-def simulate_workload(
-    duration: int, intensity: float, pattern: str = "normal"
-) -> list[float]:
+def _validate(duration: int, intensity: float) -> None:
     if duration < 0:
         raise ValueError("Duration must be non-negative")
     if intensity < 0:
         raise ValueError("Intensity must be non-negative")
 
-    adjusted_intensity = get_intensity_from_pattern(pattern, intensity)
+
+def _rate_pattern(
+    pattern: str | RatePattern, intensity: float, duration: int
+) -> RatePattern | None:
+    """The time-varying rate for ``pattern``, or None for a constant rate."""
+    if isinstance(pattern, RatePattern):
+        return pattern
+    resolved = pattern_from_name(pattern, intensity, duration)
+    return None if isinstance(resolved, Constant) else resolved
+
+
+def _arrivals_in_window(
+    start: int, stop: int, rate: float, rng: np.random.Generator
+) -> np.ndarray:
+    """Sorted arrival times for whole seconds ``[start, stop)`` in three NumPy calls."""
+    counts = rng.poisson(rate, size=stop - start)
+    seconds = np.repeat(np.arange(start, stop, dtype=np.float64), counts)
+    seconds += rng.random(seconds.size)
+    seconds.sort()
+    return seconds
+
+
+def simulate_arrivals(
+    duration: int,
+    intensity: float,
+    pattern: str | RatePattern = "normal",
+    seed: int | np.random.Generator | None = None,
+) -> np.ndarray:
+    """
+    Poisson arrival times over ``duration`` seconds as a sorted float64 array.
+
+    Per-second counts and in-second offsets are drawn in bulk, so cost is
+    dominated by a single sort rather than per-event Python work. ``pattern``
+    is a name understood by
+    :func:`~cloudpilot.traffic_patterns.pattern_from_name` (scaled by
+    ``intensity``) or a :class:`~cloudpilot.traffic_patterns.RatePattern`;
+    time-varying rates are sampled by thinning.
+    """
+    _validate(duration, intensity)
+    varying = _rate_pattern(pattern, intensity, duration)
+    if varying is not None:
+        return sample_arrivals(varying, duration, seed)
+    rate = get_intensity_from_pattern(str(pattern), intensity)
+    logger.debug(
+        "Simulating %s seconds at %s req/sec (pattern: %s).", duration, rate, pattern
+    )
+    return _arrivals_in_window(0, duration, rate, np.random.default_rng(seed))
+
+
+def iter_arrivals(
+    duration: int,
+    intensity: float,
+    pattern: str | RatePattern = "normal",
+    window: int = 60,
+    seed: int | np.random.Generator | None = None,
+) -> Iterator[np.ndarray]:
+    """
+    Yield sorted arrival times one ``window``-second slice at a time.
+
+    Memory is bounded by one window of events regardless of ``duration``;
+    concatenating the chunks gives the same distribution as
+    :func:`simulate_arrivals`.
+    """
+    _validate(duration, intensity)
+    if window <= 0:
+        raise ValueError("Window must be positive")
+    varying = _rate_pattern(pattern, intensity, duration)
+    if varying is not None:
+        yield from iter_pattern_arrivals(varying, duration, window, seed)
+        return
+    rate = get_intensity_from_pattern(str(pattern), intensity)
+    rng = np.random.default_rng(seed)
+    for start in range(0, duration, window):
+        yield _arrivals_in_window(start, min(start + window, duration), rate, rng)
+
+
+def partition_arrivals(arrivals: np.ndarray, index: int, count: int) -> np.ndarray:
+    """
+    Share ``index`` of ``count`` of a sorted schedule: every ``count``-th
+    arrival starting at ``index``.
+
+    Shares are disjoint, together cover the schedule, and each keeps its
+    shape at ``1 / count`` of the rate.
+    """
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid share {index} of {count}")
+    return arrivals[index::count]
+
+
+def scheduled_share(
+    options: Any, worker_index: int | None = None
+) -> tuple[np.ndarray, int]:
+    """
+    This process's arrivals and the full schedule's size, from locustfile's
+    ``--schedule-*`` options.
+
+    A standalone process (``worker_index`` None) sends the whole schedule;
+    worker ``i`` of a distributed run sends share ``i`` of
+    ``options.schedule_workers``.
+    """
+    arrivals = simulate_arrivals(
+        options.schedule_duration,
+        options.schedule_intensity,
+        options.schedule_pattern,
+        seed=options.schedule_seed,
+    )
+    if worker_index is None:
+        return arrivals, arrivals.size
+    count = options.schedule_workers
+    if worker_index >= count:
+        raise ValueError(
+            f"Worker {worker_index} joined but --schedule-workers is {count}; "
+            "pass the number of workers to every process"
+        )
+    return partition_arrivals(arrivals, worker_index, count), arrivals.size
+
+
+def simulate_workload(
+    duration: int, intensity: float, pattern: str | RatePattern = "normal"
+) -> list[float]:
+    """List form of :func:`simulate_arrivals`, kept for existing callers."""
+    events = simulate_arrivals(duration, intensity, pattern)
     logger.info(
-        "Simulating workload for %s seconds with intensity: %s req/sec (pattern: %s).",
+        "Simulated %s requests over %s seconds (pattern: %s).",
+        events.size,
         duration,
-        adjusted_intensity,
         pattern,
     )
-    events: list[float] = []
-
-    for second in range(duration):
-        num_events = np.random.poisson(adjusted_intensity)
-        for _ in range(num_events):
-            event_time = second + np.random.random()
-            events.append(float(event_time))
-
-    events.sort()
-    for event in events:
-        logger.info("Simulated request at t = %.2f sec", event)
-    return events
+    return events.tolist()
 
 
 def stress_test(
-    kubernetes_deployment: str, namespace: str = "default", duration: int = 30
+    kubernetes_deployment: str,
+    namespace: str = "default",
+    duration: int = 30,
+    url: str | None = None,
+    intensity: float = 10.0,
+    pattern: str = "normal",
+    connections: int = 100,
 ) -> str:
-    if duration < 0:
-        raise ValueError("Duration must be non-negative")
+    """
+    Send open-loop HTTP load at a deployment for ``duration`` seconds.
+
+    Requests follow the :func:`simulate_workload` schedule at ``intensity``
+    req/s and go to ``url``, by default the deployment's in-cluster service
+    ``http://<deployment>.<namespace>.svc.cluster.local/``.
+    """
+    from cloudpilot.load_generator import generate_load
 
+    _validate(duration, intensity)
+    target = url or f"http://{kubernetes_deployment}.{namespace}.svc.cluster.local/"
     logger.info(
         "Starting stress test on deployment '%s' in namespace '%s' for %s seconds.",
         kubernetes_deployment,
         namespace,
         duration,
     )
-    start_time = time.time()
-    while time.time() - start_time < duration:
-        logger.info("Simulating stress: applying CPU/memory load...")
-        time.sleep(5)
-
+    report = generate_load(target, duration, intensity, pattern, connections)
     logger.info("Stress test on deployment '%s' completed.", kubernetes_deployment)
     return (
-        f"Stress test on deployment '{kubernetes_deployment}' completed successfully."
+        f"Stress test on deployment '{kubernetes_deployment}' completed: "
+        f"{report.summary()}"
     )
@@ -0,0 +1,335 @@
+"""Pooled, grouped Prometheus feature collection for anomaly detection."""
+
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, TypeVar, cast
+
+import numpy as np
+import requests
+from prometheus_api_client import PrometheusConnect
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cloudpilot.config import get_settings
+from cloudpilot.instrumentation import record_api_error, timed
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ("cpu_util", "mem_util", "request_rate", "network_latency")
+DEFAULT_FEATURES = (50.0, 50.0, 70.0, 100.0)
+
+GroupKey = tuple[str, ...]
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass(frozen=True)
+class MetricQueries:
+    """
+    PromQL templates, one per feature, in ``FEATURES`` order.
+
+    ``{by}`` is replaced with the grouping labels (``{by_le}`` adds ``le`` for
+    histograms) and ``{selector}`` with a label matcher block or nothing, so a
+    single query covers every workload.
+    """
+
+    cpu_util: str = (
+        "avg by ({by}) (rate(container_cpu_usage_seconds_total{selector}[1m])) * 100"
+    )
+    mem_util: str = "avg by ({by}) (container_memory_usage_bytes{selector}) / 1e6"
+    request_rate: str = "sum by ({by}) (rate(http_requests_total{selector}[1m]))"
+    network_latency: str = (
+        "histogram_quantile(0.99, sum by ({by_le}) "
+        "(rate(http_request_duration_seconds_bucket{selector}[1m]))) * 1000"
+    )
+
+    def render(self, group_by: Sequence[str], selector: str) -> list[tuple[str, str]]:
+        subs = {
+            "by": ", ".join(group_by),
+            "by_le": ", ".join((*group_by, "le")),
+            "selector": selector,
+        }
+        return [(f.name, getattr(self, f.name).format(**subs)) for f in fields(self)]
+
+
+def _in_use(method: F) -> F:
+    """Count a collector call as in flight so :meth:`retire` can wait for it."""
+
+    @functools.wraps(method)
+    def wrapper(self: PrometheusCollector, *args: Any, **kwargs: Any) -> Any:
+        self._acquire()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._release()
+
+    return cast(F, wrapper)
+
+
+def _namespace_selector(namespaces: Sequence[str] | None) -> str:
+    if not namespaces:
+        return ""
+    # Namespace names are DNS labels, so they need no regex or string escaping.
+    pattern = "|".join(namespaces)
+    return f'{{namespace=~"{pattern}"}}'
+
+
+class PrometheusCollector:
+    """
+    Reusable Prometheus client that fetches all features in one round trip.
+
+    One ``requests.Session`` with a sized connection pool is kept for the
+    lifetime of the collector, and each call runs its per-feature queries
+    concurrently on threads of its own, so concurrent calls never queue
+    behind one another.
+    Results are grouped by ``group_by`` labels (``namespace`` by default), so a
+    single collection serves every monitored workload.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        disable_ssl: bool = False,
+        group_by: Sequence[str] = ("namespace",),
+        queries: MetricQueries | None = None,
+        timeout: float = 10.0,
+        pool_size: int = 10,
+    ) -> None:
+        self.url = url
+        self.disable_ssl = disable_ssl
+        self.group_by = tuple(group_by)
+        self.queries = queries or MetricQueries()
+        self.timeout = timeout
+        session = requests.Session()
+        session.verify = not disable_ssl
+        self._prom = PrometheusConnect(url=url, session=session)
+        # PrometheusConnect mounts its own default-sized adapter; replace it.
+        session.mount(
+            url,
+            HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=pool_size,
+                max_retries=Retry(total=2, backoff_factor=0.1),
+            ),
+        )
+        self._session = session
+        self._closed = False
+        self._users_lock = threading.Lock()
+        self._users = 0
+        self._retired = False
+
+    @property
+    def prom(self) -> PrometheusConnect:
+        return self._prom
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _query(self, query: str) -> list[dict[str, Any]]:
+        with timed("prometheus_query"):
+            return self._prom.custom_query(query=query, timeout=self.timeout)
+
+    @_in_use
+    def collect(
+        self,
+        namespaces: Sequence[str] | None = None,
+        group_by: Sequence[str] | None = None,
+    ) -> dict[GroupKey, list[float]]:
+        """
+        Return ``{label values: [cpu, mem, request_rate, latency]}``.
+
+        Features missing for a group (or whose query failed) take the values
+        from ``DEFAULT_FEATURES``.
+        """
+        labels = self.group_by if group_by is None else tuple(group_by)
+        rendered = self.queries.render(labels, _namespace_selector(namespaces))
+        # Threads per call, not per collector: a stalled grouped query must
+        # not hold up the per-namespace fallback queries behind it.
+        with ThreadPoolExecutor(len(rendered), "cloudpilot-prom") as pool:
+            futures = [pool.submit(self._query, query) for _, query in rendered]
+        result: dict[GroupKey, list[float]] = {}
+        for idx, ((name, _), future) in enumerate(zip(rendered, futures, strict=True)):
+            try:
+                series = future.result()
+            except Exception as e:
+                record_api_error("prometheus")
+                logger.error("Prometheus query for %s failed: %s", name, e)
+                continue
+            for item in series:
+                key = tuple(item.get("metric", {}).get(label, "") for label in labels)
+                try:
+                    value = float(item["value"][1])
+                except (KeyError, IndexError, TypeError, ValueError):
+                    continue
+                if value != value:  # NaN from empty histograms
+                    continue
+                result.setdefault(key, list(DEFAULT_FEATURES))[idx] = value
+        return result
+
+    @_in_use
+    def collect_range(
+        self,
+        start: datetime,
+        end: datetime,
+        step: int,
+        namespaces: Sequence[str] | None = None,
+        group_by: Sequence[str] | None = None,
+    ) -> dict[GroupKey, tuple[np.ndarray, np.ndarray]]:
+        """
+        Return ``{label values: (timestamps, features)}`` from ``query_range``.
+
+        Timestamps are the ``step``-second grid points (from ``start``) at which
+        a group has any feature; ``features`` has one row per timestamp, with
+        missing values taken from ``DEFAULT_FEATURES``.
+        """
+        labels = self.group_by if group_by is None else tuple(group_by)
+        rendered = self.queries.render(labels, _namespace_selector(namespaces))
+        with ThreadPoolExecutor(len(rendered), "cloudpilot-prom") as pool:
+            futures = [
+                pool.submit(
+                    self._prom.custom_query_range,
+                    query,
+                    start_time=start,
+                    end_time=end,
+                    step=str(step),
+                    timeout=self.timeout,
+                )
+                for _, query in rendered
+            ]
+        origin = round(start.timestamp())
+        points = (round(end.timestamp()) - origin) // step + 1
+        grids: dict[GroupKey, np.ndarray] = {}
+        for idx, ((name, _), future) in enumerate(zip(rendered, futures, strict=True)):
+            try:
+                matrix = future.result()
+            except Exception as e:
+                record_api_error("prometheus")
+                logger.error("Prometheus range query for %s failed: %s", name, e)
+                continue
+            for item in matrix:
+                key = tuple(item.get("metric", {}).get(label, "") for label in labels)
+                try:
+                    samples = np.asarray(item.get("values", []), dtype=np.float64)
+                except (TypeError, ValueError):
+                    continue
+                if samples.ndim != 2 or samples.size == 0:
+                    continue
+                slots = np.rint((samples[:, 0] - origin) / step).astype(np.int64)
+                keep = (slots >= 0) & (slots < points) & ~np.isnan(samples[:, 1])
+                grid = grids.get(key)
+                if grid is None:
+                    grid = grids[key] = np.full((points, len(FEATURES)), np.nan)
+                grid[slots[keep], idx] = samples[keep, 1]
+        result: dict[GroupKey, tuple[np.ndarray, np.ndarray]] = {}
+        times = origin + step * np.arange(points, dtype=np.float64)
+        for key, grid in grids.items():
+            present = ~np.isnan(grid).all(axis=1)
+            rows = grid[present]
+            rows = np.where(np.isnan(rows), np.asarray(DEFAULT_FEATURES), rows)
+            result[key] = (times[present], rows)
+        return result
+
+    def collect_namespaces(self, namespaces: Sequence[str]) -> dict[str, list[float]]:
+        """Per-namespace features; namespaces without data get the defaults."""
+        grouped = self.collect(namespaces, group_by=("namespace",))
+        return {ns: grouped.get((ns,), list(DEFAULT_FEATURES)) for ns in namespaces}
+
+    def _acquire(self) -> None:
+        with self._users_lock:
+            self._users += 1
+
+    def _release(self) -> None:
+        with self._users_lock:
+            self._users -= 1
+            idle = self._retired and not self._users
+        if idle:
+            self.close()
+
+    def close(self) -> None:
+        self._closed = True
+        self._session.close()
+
+    def retire(self) -> None:
+        """Close once the calls already in flight have finished."""
+        with self._users_lock:
+            self._retired = True
+            idle = not self._users
+        if idle:
+            self.close()
+
+    def __enter__(self) -> PrometheusCollector:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+_collector_lock = threading.Lock()
+_collector: PrometheusCollector | None = None
+
+
+def _current_collector() -> PrometheusCollector:
+    """Shared collector, rebuilt if settings changed; hold ``_collector_lock``."""
+    global _collector
+    settings = get_settings()
+    if (
+        _collector is None
+        or _collector.url != settings.prometheus_url
+        or _collector.disable_ssl != settings.prometheus_disable_ssl
+    ):
+        if _collector is not None:
+            # In-flight calls finish on the old pool and session first.
+            _collector.retire()
+        _collector = PrometheusCollector(
+            url=settings.prometheus_url,
+            disable_ssl=settings.prometheus_disable_ssl,
+        )
+    return _collector
+
+
+def get_metrics_collector() -> PrometheusCollector:
+    """
+    Process-wide collector built from settings on first use, and rebuilt
+    when a settings reload changes the Prometheus URL or SSL setting.
+
+    A reload may retire the returned collector before it is used; callers
+    that make requests should hold a :func:`lease_metrics_collector` instead.
+    """
+    with _collector_lock:
+        return _current_collector()
+
+
+@contextmanager
+def lease_metrics_collector() -> Iterator[PrometheusCollector]:
+    """
+    Borrow the shared collector for the duration of the ``with`` block.
+
+    The lease is taken under the same lock that a reload uses to retire the
+    collector, so the block always counts as a user. A reload does not wait
+    for it: it swaps in a new collector and only marks this one retired, and
+    the session is closed when the last lease or call on it ends.
+    """
+    with _collector_lock:
+        collector = _current_collector()
+        collector._acquire()
+    try:
+        yield collector
+    finally:
+        collector._release()
+
+
+def reset_metrics_collector_for_testing() -> None:
+    """Close and drop the shared collector (tests only)."""
+    global _collector
+    with _collector_lock:
+        if _collector is not None:
+            _collector.close()
+        _collector = None
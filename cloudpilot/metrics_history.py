@@ -0,0 +1,261 @@
+"""Fixed-size, memory-mapped ring buffer of per-series feature history."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from cloudpilot.config import get_settings
+from cloudpilot.metrics import FEATURES
+
+if TYPE_CHECKING:
+    from cloudpilot.metrics import PrometheusCollector
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsHistory:
+    """
+    The last ``capacity`` samples of every series, in ``.npy`` memmaps under
+    ``path``.
+
+    ``values.npy`` holds one float32 column per feature per series, shaped
+    ``(max_series, n_features, 2 * capacity)``. Every sample is written twice,
+    at ``pos`` and ``pos + capacity``, so the newest ``k`` samples are always
+    one contiguous slice and :meth:`window` returns views, never copies.
+    Timestamps live in ``times.npy`` the same way; write positions and counts
+    in ``state.npy``; series names in ``meta.json``.
+
+    Existing files are reopened with their stored shape (``capacity`` and
+    ``max_series`` only apply when the store is created). Intended for one
+    writer process; readers in other processes may open the same path, with
+    ``read_only=True`` to map it without write access.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        capacity: int = 1440,
+        max_series: int = 256,
+        features: Sequence[str] = FEATURES,
+        read_only: bool = False,
+    ) -> None:
+        self.path = Path(path)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        meta_path = self.path / "meta.json"
+        if read_only and not meta_path.is_file():
+            raise FileNotFoundError(f"No metrics history at {self.path}")
+        if meta_path.is_file():
+            meta = json.loads(meta_path.read_text())
+            if tuple(meta["features"]) != tuple(features):
+                raise ValueError(
+                    f"History at {self.path} stores {meta['features']}, "
+                    f"not {list(features)}"
+                )
+            self.capacity = int(meta["capacity"])
+            self.max_series = int(meta["max_series"])
+            self._series: dict[str, int] = {s: i for i, s in enumerate(meta["series"])}
+            mode = "r" if read_only else "r+"
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.capacity = capacity
+            self.max_series = max_series
+            self._series = {}
+            mode = "w+"
+        self.features = tuple(features)
+        width = 2 * self.capacity
+        self._values = open_memmap(
+            self.path / "values.npy",
+            mode=mode,
+            dtype=np.float32,
+            shape=(self.max_series, len(self.features), width),
+        )
+        self._times = open_memmap(
+            self.path / "times.npy",
+            mode=mode,
+            dtype=np.float64,
+            shape=(self.max_series, width),
+        )
+        # Per series: [next write position, number of valid samples].
+        self._state = open_memmap(
+            self.path / "state.npy",
+            mode=mode,
+            dtype=np.int64,
+            shape=(self.max_series, 2),
+        )
+        if mode == "w+":
+            self._write_meta()
+
+    def _write_meta(self) -> None:
+        meta = {
+            "features": list(self.features),
+            "capacity": self.capacity,
+            "max_series": self.max_series,
+            "series": list(self._series),
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".meta-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.path / "meta.json")
+
+    def series(self) -> list[str]:
+        return list(self._series)
+
+    def _index(self, names: Sequence[str]) -> np.ndarray:
+        if self.read_only:
+            raise PermissionError(f"History at {self.path} was opened read-only")
+        added = False
+        for name in names:
+            if name not in self._series:
+                if len(self._series) >= self.max_series:
+                    raise ValueError(
+                        f"History at {self.path} is full ({self.max_series} series)"
+                    )
+                self._series[name] = len(self._series)
+                added = True
+        if added:
+            self._write_meta()
+        return np.fromiter((self._series[n] for n in names), np.int64, len(names))
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def count(self, name: str) -> int:
+        idx = self._series.get(name)
+        return 0 if idx is None else int(self._state[idx, 1])
+
+    def append(
+        self,
+        rows: Mapping[str, Sequence[float]],
+        timestamp: float | None = None,
+    ) -> None:
+        """Append one sample per series (``{series: features}``) at ``timestamp``."""
+        if not rows:
+            return
+        ts = time.time() if timestamp is None else timestamp
+        values = np.asarray(list(rows.values()), dtype=np.float32)
+        if values.shape[1:] != (len(self.features),):
+            raise ValueError(f"Expected {len(self.features)} features per series")
+        with self._lock:
+            idx = self._index(list(rows))
+            pos = self._state[idx, 0]
+            for offset in (0, self.capacity):
+                self._values[idx, :, pos + offset] = values
+                self._times[idx, pos + offset] = ts
+            self._state[idx, 0] = (pos + 1) % self.capacity
+            self._state[idx, 1] = np.minimum(self._state[idx, 1] + 1, self.capacity)
+
+    def extend(self, name: str, times: np.ndarray, values: np.ndarray) -> None:
+        """Append ``values`` (one row per timestamp, oldest first) to a series."""
+        values = np.asarray(values, dtype=np.float32)
+        times = np.asarray(times, dtype=np.float64)
+        if values.shape != (times.size, len(self.features)):
+            raise ValueError(f"Expected shape ({times.size}, {len(self.features)})")
+        cap = self.capacity
+        # Older samples would be overwritten anyway.
+        values, times = values[-cap:], times[-cap:]
+        k = times.size
+        if k == 0:
+            return
+        with self._lock:
+            idx = int(self._index([name])[0])
+            pos, count = (int(v) for v in self._state[idx])
+            slots = (pos + np.arange(k)) % cap
+            for offset in (0, cap):
+                self._values[idx][:, slots + offset] = values.T
+                self._times[idx, slots + offset] = times
+            self._state[idx] = ((pos + k) % cap, min(count + k, cap))
+
+    def window(self, name: str, n: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Newest ``n`` samples (default: all) of ``name``, oldest first.
+
+        Returns ``(times, values)`` as views into the memmap: ``times`` has
+        shape ``(k,)`` and ``values`` ``(n_features, k)``, each feature row
+        contiguous. Use ``values.T`` for one row per sample. Views see later
+        appends once the buffer wraps past them; copy to keep a snapshot.
+        """
+        idx = self._series.get(name)
+        if idx is None:
+            raise KeyError(name)
+        pos, count = (int(v) for v in self._state[idx])
+        k = count if n is None else max(0, min(n, count))
+        end = pos + self.capacity
+        return self._times[idx, end - k : end], self._values[idx, :, end - k : end]
+
+    def backfill(
+        self,
+        collector: PrometheusCollector,
+        namespaces: Sequence[str],
+        step: int = 60,
+        end: datetime | None = None,
+    ) -> int:
+        """
+        Fill empty namespace series from Prometheus ``query_range``.
+
+        Covers the ``capacity * step`` seconds before ``end`` (default: now)
+        and returns the number of samples written. Series that already hold
+        data are left alone, so restarts do not duplicate history.
+        """
+        empty = [ns for ns in namespaces if self.count(ns) == 0]
+        if not empty:
+            return 0
+        end = end or datetime.now(timezone.utc)
+        start = end - timedelta(seconds=step * (self.capacity - 1))
+        ranges = collector.collect_range(
+            start, end, step, namespaces=empty, group_by=("namespace",)
+        )
+        written = 0
+        for ns in empty:
+            if (ns,) not in ranges:
+                continue
+            times, values = ranges[(ns,)]
+            if times.size:
+                self.extend(ns, times, values)
+                written += min(times.size, self.capacity)
+        logger.info("Backfilled %s samples for %s namespaces", written, len(empty))
+        return written
+
+    def flush(self) -> None:
+        for array in (self._values, self._times, self._state):
+            array.flush()
+
+
+_history_lock = threading.Lock()
+_history: MetricsHistory | None = None
+
+
+def get_metrics_history() -> MetricsHistory | None:
+    """Shared history at ``CLOUDPILOT_METRICS_HISTORY``, or None if unset."""
+    global _history
+    settings = get_settings()
+    if not settings.metrics_history_path:
+        return None
+    with _history_lock:
+        if _history is None:
+            _history = MetricsHistory(
+                settings.metrics_history_path,
+                capacity=settings.metrics_history_size,
+            )
+        return _history
+
+
+def reset_metrics_history_for_testing() -> None:
+    """Flush and drop the shared history (tests only)."""
+    global _history
+    with _history_lock:
+        if _history is not None:
+            _history.flush()
+        _history = None
@@ -0,0 +1,228 @@
+"""Versioned on-disk store for trained models."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+
+from cloudpilot.compiled_forest import CompiledForest
+from cloudpilot.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+ISOLATION_FOREST = "isolation_forest"
+_MODEL_FILE = "model.joblib"
+_META_FILE = "meta.json"
+_FOREST_DIR = "forest"
+_LATEST = "LATEST"
+
+
+class ModelStore:
+    """
+    Models under ``root/<name>/<version>/`` with a ``LATEST`` pointer per name.
+
+    Versions are zero-padded integers. A version directory is written in a
+    temporary directory and renamed into place, and ``LATEST`` is replaced
+    atomically, so readers never see a partial model. Models are pickled
+    uncompressed so :meth:`load` can memory-map plain numpy arrays inside
+    them, but sklearn copies tree nodes into process-owned memory when a
+    forest is unpickled. Isolation forests are therefore also saved as a
+    :class:`~cloudpilot.compiled_forest.CompiledForest`, whose ``.npy``
+    arrays :meth:`load_compiled` maps read-only, so every process scoring
+    the same version shares one copy of its pages.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def versions(self, name: str) -> list[str]:
+        base = self.root / name
+        if not base.is_dir():
+            return []
+        return sorted(p.name for p in base.iterdir() if p.name.isdigit())
+
+    def latest_version(self, name: str) -> str | None:
+        try:
+            version = (self.root / name / _LATEST).read_text().strip()
+        except OSError:
+            return None
+        return version or None
+
+    def save(self, name: str, model: Any, metadata: dict | None = None) -> str:
+        """Write ``model`` as a new version, point ``LATEST`` at it, return it."""
+        base = self.root / name
+        base.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=base, prefix=".staging-"))
+        try:
+            joblib.dump(model, staging / _MODEL_FILE)
+            if hasattr(model, "estimators_features_"):
+                CompiledForest.from_isolation_forest(model).save(staging / _FOREST_DIR)
+            meta = {"name": name, "created_at": time.time(), **(metadata or {})}
+            (staging / _META_FILE).write_text(json.dumps(meta, indent=2))
+            while True:
+                existing = self.versions(name)
+                version = f"{int(existing[-1]) + 1 if existing else 1:06d}"
+                try:
+                    # rename() fails if a concurrent writer took this version.
+                    os.rename(staging, base / version)
+                    break
+                except OSError:
+                    if not (base / version).exists():
+                        raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.promote(name, version)
+        logger.info("Saved %s model version %s", name, version)
+        return version
+
+    def promote(self, name: str, version: str) -> None:
+        """Point ``LATEST`` at ``version`` (also used to roll back)."""
+        if not (self.root / name / version / _MODEL_FILE).is_file():
+            raise LookupError(f"No {name} model version {version} in {self.root}")
+        fd, tmp = tempfile.mkstemp(dir=self.root / name, prefix=".latest-")
+        with os.fdopen(fd, "w") as f:
+            f.write(version)
+        os.replace(tmp, self.root / name / _LATEST)
+
+    def metadata(self, name: str, version: str) -> dict:
+        return json.loads((self.root / name / version / _META_FILE).read_text())
+
+    def load(self, name: str, version: str | None = None, mmap: bool = True) -> Any:
+        """Load ``version`` (default: ``LATEST``), memory-mapping plain arrays."""
+        version = version or self.latest_version(name)
+        if version is None:
+            raise LookupError(f"No {name} model in {self.root}")
+        path = self.root / name / version / _MODEL_FILE
+        return joblib.load(path, mmap_mode="r" if mmap else None)
+
+    def load_compiled(
+        self, name: str, version: str | None = None, mmap: bool = True
+    ) -> CompiledForest | None:
+        """The memory-mapped compiled form of ``version``, if it was saved."""
+        version = version or self.latest_version(name)
+        if version is None:
+            raise LookupError(f"No {name} model in {self.root}")
+        path = self.root / name / version / _FOREST_DIR
+        return CompiledForest.load(path, mmap=mmap) if path.is_dir() else None
+
+
+def train_isolation_forest(
+    features: np.ndarray,
+    contamination: float | str = "auto",
+    n_estimators: int = 100,
+    random_state: int | None = None,
+) -> Any:
+    """Fit an ``IsolationForest`` on historical feature rows."""
+    from sklearn.ensemble import IsolationForest
+
+    x = np.asarray(features, dtype=np.float64)
+    if x.ndim != 2 or x.shape[0] < 2:
+        raise ValueError(f"Need at least two feature rows, got shape {x.shape}")
+    model = IsolationForest(
+        n_estimators=n_estimators,
+        contamination=contamination,
+        random_state=random_state,
+    )
+    return model.fit(x)
+
+
+_cache_lock = threading.Lock()
+_cached: dict[str, tuple[str, Any]] = {}
+_checked_at: dict[str, float] = {}
+
+
+def get_latest_model(name: str = ISOLATION_FOREST) -> Any:
+    """
+    Shared model ``name`` from ``CLOUDPILOT_MODEL_STORE``, or None if absent.
+
+    ``LATEST`` is re-read at most every ``CLOUDPILOT_MODEL_CHECK_INTERVAL``
+    seconds; when it names a new version, that version is loaded and swapped
+    in without a restart. A version that fails to load keeps the previous one.
+    Versions saved with a compiled forest are served as that, memory-mapped.
+    """
+    settings = get_settings()
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cached.get(name)
+        last = _checked_at.get(name)
+        if last is not None and now - last < settings.model_check_interval:
+            return cached[1] if cached else None
+        _checked_at[name] = now
+        store = ModelStore(settings.model_store_path)
+        version = store.latest_version(name)
+        if version is None or (cached and cached[0] == version):
+            return cached[1] if cached else None
+        try:
+            model = store.load_compiled(name, version) or store.load(name, version)
+        except Exception as e:
+            logger.warning("Could not load %s model %s: %s", name, version, e)
+            return cached[1] if cached else None
+        _cached[name] = (version, model)
+        logger.info("Loaded %s model version %s", name, version)
+        return model
+
+
+def reset_model_cache_for_testing() -> None:
+    """Forget loaded models and check times (tests only)."""
+    with _cache_lock:
+        _cached.clear()
+        _checked_at.clear()
+
+
+def _load_features(path: str) -> np.ndarray:
+    if path.endswith(".npy"):
+        return np.load(path)
+    return np.loadtxt(path, delimiter=",", ndmin=2)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Train and manage stored models.")
+    parser.add_argument(
+        "--store",
+        default=None,
+        help="Store directory (default: CLOUDPILOT_MODEL_STORE).",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="Train an IsolationForest and save it.")
+    train.add_argument("features", help=".npy or CSV file of feature rows.")
+    train.add_argument("--n-estimators", type=int, default=100)
+    train.add_argument("--seed", type=int, default=None)
+    sub.add_parser("list", help="List stored isolation_forest versions.")
+    promote = sub.add_parser("promote", help="Point LATEST at a version.")
+    promote.add_argument("version")
+    args = parser.parse_args(argv)
+
+    store = ModelStore(args.store or get_settings().model_store_path)
+    if args.command == "train":
+        x = _load_features(args.features)
+        model = train_isolation_forest(
+            x, n_estimators=args.n_estimators, random_state=args.seed
+        )
+        store.save(
+            ISOLATION_FOREST,
+            model,
+            {"source": os.path.abspath(args.features), "n_samples": len(x)},
+        )
+    elif args.command == "promote":
+        store.promote(ISOLATION_FOREST, args.version)
+    else:
+        latest = store.latest_version(ISOLATION_FOREST)
+        for version in store.versions(ISOLATION_FOREST):
+            print(f"{version}{'  (latest)' if version == latest else ''}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
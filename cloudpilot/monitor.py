@@ -0,0 +1,320 @@
+"""Watch several namespaces from one process with bounded thread pools."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+from cloudpilot.anomaly_detector import detect_anomalies, get_anomaly_model, self_heal
+from cloudpilot.config import get_settings
+from cloudpilot.instrumentation import record_cycle, start_metrics_server_from_settings
+from cloudpilot.metrics import lease_metrics_collector
+from cloudpilot.metrics_history import MetricsHistory, get_metrics_history
+from cloudpilot.pod_cache import start_pod_cache
+
+logger = logging.getLogger(__name__)
+
+FetchFn = Callable[[str], Sequence[float]]
+BatchFetchFn = Callable[[Sequence[str]], Mapping[str, Sequence[float]]]
+HealFn = Callable[[str], str]
+
+
+@dataclass
+class NamespaceStatus:
+    """Outcome of one monitoring cycle for a single namespace."""
+
+    namespace: str
+    features: list[float] | None = None
+    anomaly: bool = False
+    score: float | None = None
+    heal_dispatched: bool = False
+    error: str | None = None
+
+
+class MultiNamespaceMonitor:
+    """
+    Fetch, score and heal N namespaces per cycle without serializing them.
+
+    By default all namespaces are fetched in one grouped round trip through the
+    shared ``PrometheusCollector``. If that batch misses half of
+    ``fetch_timeout`` or fails, the namespaces it did not return are fetched
+    one by one (``fetch``, by default a per-namespace query) for the rest of
+    the timeout, so one slow grouped query cannot stall every namespace.
+    Pass only ``fetch`` to always fetch namespaces separately, or only
+    ``fetch_batch`` to disable the fallback. Each namespace (and the batch)
+    has at most one fetch and one heal in flight. A fetch that misses its
+    timeout is left running and picked up by a later cycle; heals are
+    dispatched and never awaited by the cycle, so a slow Kubernetes call
+    only delays its own namespace.
+
+    Unless given explicitly, ``check_interval`` (and with it the default
+    ``fetch_timeout``) and the pool size follow the current settings
+    (``monitor_interval``, ``monitor_max_workers``) and are reread every
+    cycle, so a settings reload applies without a restart.
+    """
+
+    def __init__(
+        self,
+        namespaces: Sequence[str],
+        check_interval: float | None = None,
+        max_workers: int | None = None,
+        fetch_timeout: float | None = None,
+        fetch: FetchFn | None = None,
+        fetch_batch: BatchFetchFn | None = None,
+        heal: HealFn = self_heal,
+        model: Any = None,
+        history: MetricsHistory | None = None,
+    ) -> None:
+        if not namespaces:
+            raise ValueError("At least one namespace is required")
+        self.namespaces = list(dict.fromkeys(namespaces))
+        self._check_interval = check_interval
+        self._fetch_timeout = fetch_timeout
+        if fetch is None and fetch_batch is None:
+            fetch, fetch_batch = _collect_namespace, _collect_namespaces
+        self._fetch = fetch
+        self._fetch_batch = fetch_batch
+        self._heal = heal
+        self._model = model
+        self._history = history
+        self._max_workers = max_workers
+        self._workers = self._pool_size()
+        self._fetch_pool = ThreadPoolExecutor(self._workers, "cloudpilot-fetch")
+        self._heal_pool = ThreadPoolExecutor(self._workers, "cloudpilot-heal")
+        # The batch gets its own thread so a stuck one never blocks fallbacks.
+        self._batch_pool = ThreadPoolExecutor(1, "cloudpilot-fetch-batch")
+        self._fetches: dict[str, Future[Sequence[float]]] = {}
+        self._batch: Future[Mapping[str, Sequence[float]]] | None = None
+        self._heals: dict[str, Future[str]] = {}
+
+    @property
+    def check_interval(self) -> float:
+        if self._check_interval is not None:
+            return self._check_interval
+        return get_settings().monitor_interval
+
+    @property
+    def fetch_timeout(self) -> float:
+        if self._fetch_timeout is not None:
+            return self._fetch_timeout
+        return self.check_interval
+
+    def _pool_size(self) -> int:
+        max_workers = self._max_workers or get_settings().monitor_max_workers
+        return max(1, min(max_workers, len(self.namespaces)))
+
+    def _resize_pools(self) -> None:
+        """Swap in pools of the current size; in-flight work finishes on the old."""
+        workers = self._pool_size()
+        if workers == self._workers:
+            return
+        logger.info("Resizing monitor thread pools to %s workers", workers)
+        old = (self._fetch_pool, self._heal_pool)
+        self._fetch_pool = ThreadPoolExecutor(workers, "cloudpilot-fetch")
+        self._heal_pool = ThreadPoolExecutor(workers, "cloudpilot-heal")
+        self._workers = workers
+        for pool in old:
+            pool.shutdown(wait=False)
+
+    def run_cycle(self) -> dict[str, NamespaceStatus]:
+        """Run one fetch/score/heal pass and return per-namespace status."""
+        self._resize_pools()
+        statuses = {ns: NamespaceStatus(ns) for ns in self.namespaces}
+        results: Mapping[str, Sequence[float]]
+        if self._fetch_batch is None:
+            results = self._fetch_each(statuses, self.namespaces, self.fetch_timeout)
+        elif self._fetch is None:
+            results = self._fetch_all(statuses, self.fetch_timeout)
+        else:
+            half = self.fetch_timeout / 2
+            merged = dict(self._fetch_all(statuses, half))
+            missing = [ns for ns in self.namespaces if ns not in merged]
+            if missing:
+                logger.info("Fetching %s namespaces one by one", len(missing))
+                for ns in missing:
+                    statuses[ns].error = None
+                merged.update(self._fetch_each(statuses, missing, half))
+            results = merged
+
+        fetched: list[str] = []
+        rows: list[list[float]] = []
+        for ns in self.namespaces:
+            if ns not in results:
+                continue
+            try:
+                features = [float(v) for v in results[ns]]
+            except (TypeError, ValueError) as e:
+                statuses[ns].error = f"invalid metrics: {e}"
+                continue
+            statuses[ns].features = features
+            fetched.append(ns)
+            rows.append(features)
+
+        if rows and self._history is not None:
+            try:
+                self._history.append(dict(zip(fetched, rows, strict=True)))
+            except Exception as e:
+                logger.error("Could not record metrics history: %s", e)
+
+        if rows:
+            try:
+                mask, scores = detect_anomalies(rows, model=self._model, series=fetched)
+            except Exception as e:
+                logger.error("Anomaly detection failed; skipping this cycle: %s", e)
+                for ns in fetched:
+                    statuses[ns].error = f"anomaly detection failed: {e}"
+                return statuses
+            for ns, is_anomaly, score in zip(fetched, mask, scores, strict=True):
+                statuses[ns].anomaly = bool(is_anomaly)
+                statuses[ns].score = float(score)
+                if is_anomaly:
+                    logger.warning(
+                        "Anomaly detected in namespace %s for metrics: %s",
+                        ns,
+                        statuses[ns].features,
+                    )
+                    statuses[ns].heal_dispatched = self._dispatch_heal(ns)
+        return statuses
+
+    def _fetch_each(
+        self,
+        statuses: dict[str, NamespaceStatus],
+        namespaces: Sequence[str],
+        timeout: float,
+    ) -> dict[str, Sequence[float]]:
+        assert self._fetch is not None
+        for ns in namespaces:
+            if ns not in self._fetches:
+                self._fetches[ns] = self._fetch_pool.submit(self._fetch, ns)
+        wait([self._fetches[ns] for ns in namespaces], timeout=timeout)
+        results: dict[str, Sequence[float]] = {}
+        for ns in namespaces:
+            future = self._fetches[ns]
+            if not future.done():
+                statuses[ns].error = "metrics fetch still in flight"
+                logger.warning("Metrics fetch for namespace %s is slow; skipping", ns)
+                continue
+            del self._fetches[ns]
+            try:
+                results[ns] = future.result()
+            except Exception as e:
+                statuses[ns].error = f"metrics fetch failed: {e}"
+                logger.error("Metrics fetch for namespace %s failed: %s", ns, e)
+        return results
+
+    def _fetch_all(
+        self, statuses: dict[str, NamespaceStatus], timeout: float
+    ) -> Mapping[str, Sequence[float]]:
+        assert self._fetch_batch is not None
+        if self._batch is None:
+            self._batch = self._batch_pool.submit(self._fetch_batch, self.namespaces)
+        wait([self._batch], timeout=timeout)
+        error: str | None = None
+        results: Mapping[str, Sequence[float]] = {}
+        if not self._batch.done():
+            error = "metrics fetch still in flight"
+            logger.warning("Batched metrics fetch is slow")
+        else:
+            future, self._batch = self._batch, None
+            try:
+                results = future.result()
+            except Exception as e:
+                error = f"metrics fetch failed: {e}"
+                logger.error("Batched metrics fetch failed: %s", e)
+        for ns in self.namespaces:
+            if ns not in results:
+                statuses[ns].error = error or "no metrics returned"
+        return results
+
+    def _dispatch_heal(self, namespace: str) -> bool:
+        pending = self._heals.get(namespace)
+        if pending is not None and not pending.done():
+            logger.info("Heal for namespace %s still running; skipping", namespace)
+            return False
+        future = self._heal_pool.submit(self._heal, namespace)
+        self._heals[namespace] = future
+        future.add_done_callback(lambda f: _log_heal_result(namespace, f))
+        return True
+
+    def run(self, stop: threading.Event | None = None) -> None:
+        """Run a cycle every ``check_interval`` seconds until ``stop`` is set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            started = time.monotonic()
+            self.run_cycle()
+            elapsed = time.monotonic() - started
+            interval = self.check_interval
+            record_cycle("monitor", elapsed, interval)
+            stop.wait(max(0.0, interval - elapsed))
+
+    def close(self, wait_for_pending: bool = False) -> None:
+        self._fetch_pool.shutdown(wait=wait_for_pending, cancel_futures=True)
+        self._batch_pool.shutdown(wait=wait_for_pending, cancel_futures=True)
+        self._heal_pool.shutdown(wait=wait_for_pending, cancel_futures=True)
+
+    def __enter__(self) -> MultiNamespaceMonitor:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def _log_heal_result(namespace: str, future: Future[str]) -> None:
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error("Self-healing in namespace %s failed: %s", namespace, error)
+    else:
+        logger.info("Self-healing result for %s: %s", namespace, future.result())
+
+
+def _collect_namespaces(namespaces: Sequence[str]) -> dict[str, list[float]]:
+    with lease_metrics_collector() as collector:
+        return collector.collect_namespaces(namespaces)
+
+
+def _collect_namespace(namespace: str) -> list[float]:
+    with lease_metrics_collector() as collector:
+        return collector.collect_namespaces([namespace])[namespace]
+
+
+def monitor_namespaces(
+    namespaces: Sequence[str],
+    check_interval: float | None = None,
+    max_workers: int | None = None,
+) -> None:
+    """
+    Blocking multi-namespace counterpart of ``monitor_and_heal``.
+
+    When self-heal is enabled, a watch-fed pod cache is started per namespace
+    so heals find failing pods without listing the namespace. With
+    ``CLOUDPILOT_METRICS_HISTORY`` set, each cycle's features are recorded
+    there, after backfilling empty namespaces from Prometheus.
+    """
+    start_metrics_server_from_settings()
+    settings = get_settings()
+    for ns in namespaces:
+        if settings.for_namespace(ns).self_heal_confirm:
+            start_pod_cache(ns)
+    get_anomaly_model()  # load once up front, not on the first cycle
+    history = get_metrics_history()
+    if history is not None:
+        try:
+            with lease_metrics_collector() as collector:
+                history.backfill(
+                    collector,
+                    namespaces,
+                    step=max(1, int(check_interval or settings.monitor_interval)),
+                )
+        except Exception as e:
+            logger.error("Metrics history backfill failed: %s", e)
+    with MultiNamespaceMonitor(
+        namespaces, check_interval, max_workers, history=history
+    ) as monitor:
+        monitor.run()
@@ -0,0 +1,176 @@
+"""Informer-style, watch-fed cache of pod phases per namespace."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any
+
+from kubernetes import watch
+from kubernetes.client import ApiException
+
+from cloudpilot.k8s_client import get_kube_clients, note_api_error
+
+logger = logging.getLogger(__name__)
+
+
+class PodPhaseCache:
+    """
+    Local copy of ``{pod name: phase}`` for one namespace.
+
+    A background thread lists the namespace once, then follows a watch from
+    the returned ``resourceVersion`` (resuming from the last seen version or
+    bookmark after each watch timeout). A failed or expired (410 Gone) watch
+    marks the cache unsynced until a fresh list succeeds, so callers fall
+    back to listing rather than trust phases that may have drifted.
+    Finding failing pods is then an in-memory lookup instead of a full
+    ``list_namespaced_pod`` per heal.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        core_v1: Any = None,
+        watch_timeout: int = 300,
+    ) -> None:
+        self.namespace = namespace
+        self.watch_timeout = watch_timeout
+        self._core_v1 = core_v1
+        self._lock = threading.Lock()
+        self._phases: dict[str, str | None] = {}
+        self._resource_version: str | None = None
+        self._synced = threading.Event()
+        self._stop = threading.Event()
+        self._watch: watch.Watch | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def synced(self) -> bool:
+        return self._synced.is_set()
+
+    def wait_synced(self, timeout: float | None = None) -> bool:
+        return self._synced.wait(timeout)
+
+    def phases(self) -> dict[str, str | None]:
+        with self._lock:
+            return dict(self._phases)
+
+    def failing_pods(self) -> list[str]:
+        """Names of pods whose phase is not Running, sorted."""
+        with self._lock:
+            return sorted(n for n, p in self._phases.items() if p != "Running")
+
+    def forget(self, name: str) -> None:
+        """Drop a pod we just deleted so the next heal does not retry it."""
+        with self._lock:
+            self._phases.pop(name, None)
+
+    def start(self) -> PodPhaseCache:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"cloudpilot-pods-{self.namespace}",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def _core(self) -> Any:
+        return self._core_v1 or get_kube_clients().core_v1()
+
+    def _relist(self, core: Any) -> None:
+        pods = core.list_namespaced_pod(self.namespace)
+        with self._lock:
+            self._phases = {p.metadata.name: p.status.phase for p in pods.items}
+            self._resource_version = pods.metadata.resource_version
+        self._synced.set()
+
+    def _apply(self, event: dict[str, Any]) -> None:
+        kind = event["type"]
+        if kind == "ERROR":
+            raw = event.get("raw_object") or {}
+            raise ApiException(status=raw.get("code"), reason=raw.get("message"))
+        if kind == "BOOKMARK":
+            return
+        pod = event["object"]
+        with self._lock:
+            if kind == "DELETED":
+                self._phases.pop(pod.metadata.name, None)
+            else:
+                self._phases[pod.metadata.name] = pod.status.phase
+
+    def sync_once(self) -> None:
+        """List if needed, then follow one watch until it times out or stops."""
+        core = self._core()
+        try:
+            if self._resource_version is None:
+                self._relist(core)
+            w = watch.Watch()
+            self._watch = w
+            for event in w.stream(
+                core.list_namespaced_pod,
+                self.namespace,
+                resource_version=self._resource_version,
+                timeout_seconds=self.watch_timeout,
+                allow_watch_bookmarks=True,
+            ):
+                self._apply(event)
+                if w.resource_version:
+                    self._resource_version = w.resource_version
+                if self._stop.is_set():
+                    w.stop()
+        except Exception as e:
+            # Events may have been missed: stale until the next relist.
+            self._synced.clear()
+            self._resource_version = None
+            if not isinstance(e, ApiException) or e.status != 410:
+                raise
+            logger.info("Pod watch for %s expired; relisting", self.namespace)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+                backoff = 1.0
+            except Exception as e:
+                note_api_error(e)
+                logger.warning(
+                    "Pod watch for %s failed (%s); retrying in %.0fs",
+                    self.namespace,
+                    e,
+                    backoff,
+                )
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+
+_caches_lock = threading.Lock()
+_caches: dict[str, PodPhaseCache] = {}
+
+
+def start_pod_cache(namespace: str) -> PodPhaseCache:
+    """Start (once) and return the shared cache for ``namespace``."""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = PodPhaseCache(namespace).start()
+        return cache
+
+
+def get_pod_cache(namespace: str) -> PodPhaseCache | None:
+    """The shared cache for ``namespace`` if one has been started."""
+    with _caches_lock:
+        return _caches.get(namespace)
+
+
+def stop_pod_caches() -> None:
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.stop()
+        _caches.clear()
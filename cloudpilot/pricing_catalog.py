@@ -0,0 +1,435 @@
+"""
+Local, indexed EC2 on-demand price catalog.
+
+Bulk-loads an AWS EC2 offer file (``.../offers/v1.0/aws/AmazonEC2/current/
+<region>/index.json``) or a captured ``get_products`` ``PriceList`` dump into
+compact columnar arrays, persists them as a single ``.npz`` file, and answers
+price lookups from an in-memory dict without network calls.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from cloudpilot.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+_CATEGORICAL = ("instance_type", "region", "operating_system", "tenancy", "arch")
+_NUMERIC = {
+    "price": np.float64,
+    "vcpu": np.float32,
+    "memory_gib": np.float32,
+    "network_gbps": np.float32,
+}
+
+# Offer files before regionCode was added only carry the display name.
+_LOCATION_TO_REGION = {
+    "US East (N. Virginia)": "us-east-1",
+    "US East (Ohio)": "us-east-2",
+    "US West (N. California)": "us-west-1",
+    "US West (Oregon)": "us-west-2",
+    "Canada (Central)": "ca-central-1",
+    "EU (Frankfurt)": "eu-central-1",
+    "EU (Ireland)": "eu-west-1",
+    "EU (London)": "eu-west-2",
+    "EU (Paris)": "eu-west-3",
+    "EU (Stockholm)": "eu-north-1",
+    "Asia Pacific (Mumbai)": "ap-south-1",
+    "Asia Pacific (Tokyo)": "ap-northeast-1",
+    "Asia Pacific (Seoul)": "ap-northeast-2",
+    "Asia Pacific (Singapore)": "ap-southeast-1",
+    "Asia Pacific (Sydney)": "ap-southeast-2",
+    "South America (Sao Paulo)": "sa-east-1",
+}
+
+_NAMED_NETWORK_GBPS = {
+    "very low": 0.05,
+    "low": 0.1,
+    "low to moderate": 0.3,
+    "moderate": 0.5,
+    "high": 1.0,
+}
+
+CatalogKey = tuple[str, str, str, str]
+
+
+@dataclass(frozen=True)
+class InstancePrice:
+    """One catalog row: hourly on-demand USD price plus instance shape."""
+
+    instance_type: str
+    region: str
+    operating_system: str
+    tenancy: str
+    price_per_hour: float
+    vcpu: float
+    memory_gib: float
+    arch: str
+    network_gbps: float
+
+
+def _parse_memory_gib(raw: str) -> float:
+    return float(raw.replace(",", "").split()[0])
+
+
+def _parse_network_gbps(raw: str) -> float:
+    text = raw.strip().lower()
+    if text in _NAMED_NETWORK_GBPS:
+        return _NAMED_NETWORK_GBPS[text]
+    match = re.search(r"([\d.]+)\s*gigabit", text)
+    return float(match.group(1)) if match else 0.0
+
+
+def _arch(attributes: Mapping[str, str]) -> str:
+    processor = attributes.get("physicalProcessor", "")
+    if "Graviton" in processor or "Apple" in processor:
+        return "arm64"
+    return "x86_64"
+
+
+def _on_demand_usd(terms: Mapping[str, Any]) -> float | None:
+    for term in terms.values():
+        for dimension in term.get("priceDimensions", {}).values():
+            usd = dimension.get("pricePerUnit", {}).get("USD")
+            if usd is not None:
+                return float(usd)
+    return None
+
+
+def _row(product: Mapping[str, Any], on_demand: Mapping[str, Any]) -> dict | None:
+    """Normalize one product/terms pair, or None if it is not a priced instance."""
+    if not str(product.get("productFamily", "")).startswith("Compute Instance"):
+        return None
+    attrs = product.get("attributes", {})
+    if attrs.get("capacitystatus", "Used") != "Used":
+        return None
+    if attrs.get("preInstalledSw", "NA") != "NA":
+        return None
+    if attrs.get("licenseModel") == "Bring your own license":
+        return None
+    price = _on_demand_usd(on_demand)
+    if not price:
+        return None
+    location = attrs.get("location", "")
+    try:
+        return {
+            "instance_type": attrs["instanceType"],
+            "region": attrs.get("regionCode")
+            or _LOCATION_TO_REGION.get(location, location),
+            "operating_system": attrs.get("operatingSystem", "Linux"),
+            "tenancy": attrs.get("tenancy", "Shared"),
+            "arch": _arch(attrs),
+            "price": price,
+            "vcpu": float(attrs["vcpu"]),
+            "memory_gib": _parse_memory_gib(attrs["memory"]),
+            "network_gbps": _parse_network_gbps(attrs.get("networkPerformance", "")),
+        }
+    except (KeyError, ValueError, IndexError):
+        return None
+
+
+def _offer_rows(offer: Mapping[str, Any]) -> Iterator[dict]:
+    on_demand = offer.get("terms", {}).get("OnDemand", {})
+    for sku, product in offer.get("products", {}).items():
+        row = _row(product, on_demand.get(sku, {}))
+        if row is not None:
+            yield row
+
+
+def _price_list_rows(price_list: Iterable[str | Mapping[str, Any]]) -> Iterator[dict]:
+    for item in price_list:
+        entry = json.loads(item) if isinstance(item, str) else item
+        row = _row(entry.get("product", {}), entry.get("terms", {}).get("OnDemand", {}))
+        if row is not None:
+            yield row
+
+
+class PriceCatalog:
+    """
+    Columnar EC2 price index keyed by (instance type, region, OS, tenancy).
+
+    String columns are stored as int32 codes into small vocabularies and
+    numeric columns as fixed-width arrays, so a full regional offer file shrinks
+    to a few hundred kilobytes. Lookups are a single dict probe.
+    """
+
+    def __init__(
+        self,
+        codes: Mapping[str, np.ndarray],
+        vocab: Mapping[str, np.ndarray],
+        numeric: Mapping[str, np.ndarray],
+        created_at: float | None = None,
+    ) -> None:
+        self.codes = dict(codes)
+        self.vocab = dict(vocab)
+        self.numeric = dict(numeric)
+        self.created_at = time.time() if created_at is None else created_at
+        strings = {c: self.vocab[c][self.codes[c]].tolist() for c in _CATEGORICAL}
+        self._index: dict[CatalogKey, int] = {
+            key: i
+            for i, key in enumerate(
+                zip(
+                    strings["instance_type"],
+                    strings["region"],
+                    strings["operating_system"],
+                    strings["tenancy"],
+                    strict=True,
+                )
+            )
+        }
+        self._partitions: dict[tuple[str, str, str], np.ndarray] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> PriceCatalog:
+        best: dict[CatalogKey, dict] = {}
+        for row in rows:
+            key = (
+                row["instance_type"],
+                row["region"],
+                row["operating_system"],
+                row["tenancy"],
+            )
+            if key not in best or row["price"] < best[key]["price"]:
+                best[key] = row
+        ordered = list(best.values())
+        codes: dict[str, np.ndarray] = {}
+        vocab: dict[str, np.ndarray] = {}
+        for column in _CATEGORICAL:
+            values = np.array([r[column] for r in ordered], dtype=str)
+            uniques, inverse = np.unique(values, return_inverse=True)
+            vocab[column] = uniques
+            codes[column] = inverse.astype(np.int32).reshape(-1)
+        numeric = {
+            column: np.array([r[column] for r in ordered], dtype=dtype)
+            for column, dtype in _NUMERIC.items()
+        }
+        return cls(codes, vocab, numeric)
+
+    @classmethod
+    def from_offer(cls, offer: Mapping[str, Any]) -> PriceCatalog:
+        """Build from a parsed AWS bulk offer file."""
+        return cls.from_rows(_offer_rows(offer))
+
+    @classmethod
+    def from_price_list(
+        cls, price_list: Iterable[str | Mapping[str, Any]]
+    ) -> PriceCatalog:
+        """Build from ``get_products`` ``PriceList`` entries (JSON strings or dicts)."""
+        return cls.from_rows(_price_list_rows(price_list))
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> PriceCatalog:
+        """
+        Build from a JSON file holding an offer file, a ``get_products``
+        response, or a bare list of ``PriceList`` entries.
+        """
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        if isinstance(data, list):
+            return cls.from_price_list(data)
+        if "PriceList" in data:
+            return cls.from_price_list(data["PriceList"])
+        return cls.from_offer(data)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(
+        self,
+        instance_type: str,
+        region: str = "us-east-1",
+        operating_system: str = "Linux",
+        tenancy: str = "Shared",
+    ) -> InstancePrice | None:
+        row = self._index.get((instance_type, region, operating_system, tenancy))
+        if row is None:
+            return None
+        return InstancePrice(
+            instance_type=instance_type,
+            region=region,
+            operating_system=operating_system,
+            tenancy=tenancy,
+            price_per_hour=float(self.numeric["price"][row]),
+            vcpu=float(self.numeric["vcpu"][row]),
+            memory_gib=float(self.numeric["memory_gib"][row]),
+            arch=str(self.vocab["arch"][self.codes["arch"][row]]),
+            network_gbps=float(self.numeric["network_gbps"][row]),
+        )
+
+    def price(
+        self,
+        instance_type: str,
+        region: str = "us-east-1",
+        operating_system: str = "Linux",
+        tenancy: str = "Shared",
+    ) -> float | None:
+        row = self._index.get((instance_type, region, operating_system, tenancy))
+        return None if row is None else float(self.numeric["price"][row])
+
+    def rows(
+        self,
+        instance_types: Iterable[str],
+        region: str = "us-east-1",
+        operating_system: str = "Linux",
+        tenancy: str = "Shared",
+    ) -> np.ndarray:
+        """Row index for each instance type, or -1 where it is not in the catalog."""
+        return np.array(
+            [
+                self._index.get((t, region, operating_system, tenancy), -1)
+                for t in instance_types
+            ],
+            dtype=np.int64,
+        )
+
+    def partition(
+        self,
+        region: str = "us-east-1",
+        operating_system: str = "Linux",
+        tenancy: str = "Shared",
+    ) -> np.ndarray:
+        """Rows for one region/OS/tenancy sorted by ascending price (cached)."""
+        key = (region, operating_system, tenancy)
+        rows = self._partitions.get(key)
+        if rows is None:
+            mask = np.ones(len(self._index), dtype=bool)
+            for column, value in zip(
+                ("region", "operating_system", "tenancy"), key, strict=True
+            ):
+                code = np.searchsorted(self.vocab[column], value)
+                if code >= self.vocab[column].size or self.vocab[column][code] != value:
+                    mask[:] = False
+                    break
+                mask &= self.codes[column] == code
+            candidates = np.flatnonzero(mask)
+            order = np.argsort(self.numeric["price"][candidates], kind="stable")
+            rows = candidates[order]
+            self._partitions[key] = rows
+        return rows
+
+    def instance_type_at(self, row: int) -> str:
+        return str(self.vocab["instance_type"][self.codes["instance_type"][row]])
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def save(self, path: str | Path) -> None:
+        """Write the catalog atomically to ``path`` (``.npz`` format)."""
+        arrays: dict[str, np.ndarray] = {
+            "meta": np.array(
+                json.dumps({"version": FORMAT_VERSION, "created_at": self.created_at})
+            )
+        }
+        for column in _CATEGORICAL:
+            arrays[f"codes_{column}"] = self.codes[column]
+            arrays[f"vocab_{column}"] = self.vocab[column]
+        for column in _NUMERIC:
+            arrays[f"num_{column}"] = self.numeric[column]
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)  # type: ignore[arg-type]
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(buffer.getvalue())
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path: str | Path) -> PriceCatalog:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported price catalog version {meta.get('version')!r}"
+                )
+            return cls(
+                codes={c: data[f"codes_{c}"] for c in _CATEGORICAL},
+                vocab={c: data[f"vocab_{c}"] for c in _CATEGORICAL},
+                numeric={c: data[f"num_{c}"] for c in _NUMERIC},
+                created_at=float(meta["created_at"]),
+            )
+
+
+_catalog_lock = threading.Lock()
+_catalog: PriceCatalog | None = None
+_catalog_source: tuple[str, float] | None = None
+
+
+def get_price_catalog() -> PriceCatalog | None:
+    """
+    Shared catalog from ``CLOUDPILOT_PRICE_CATALOG``, or None when the file is
+    missing, unreadable, or older than ``CLOUDPILOT_PRICE_CATALOG_TTL``.
+
+    The file is re-read only when its modification time changes.
+    """
+    global _catalog, _catalog_source
+    settings = get_settings()
+    path = settings.price_catalog_path
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _catalog_lock:
+        if _catalog_source != (path, mtime):
+            try:
+                _catalog = PriceCatalog.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Could not load price catalog %s: %s", path, e)
+                _catalog = None
+            _catalog_source = (path, mtime)
+        catalog = _catalog
+    if catalog is not None and catalog.age() > settings.price_catalog_ttl:
+        logger.info("Price catalog %s is older than its TTL; ignoring it", path)
+        return None
+    return catalog
+
+
+def reset_price_catalog_for_testing() -> None:
+    """Drop the cached catalog (tests only)."""
+    global _catalog, _catalog_source
+    with _catalog_lock:
+        _catalog = None
+        _catalog_source = None
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Import an AWS EC2 offer file or PriceList dump into a catalog."
+    )
+    parser.add_argument("source", help="Offer file or get_products JSON dump.")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Catalog path (default: CLOUDPILOT_PRICE_CATALOG).",
+    )
+    args = parser.parse_args(argv)
+    output = args.output or get_settings().price_catalog_path
+    catalog = PriceCatalog.from_file(args.source)
+    catalog.save(output)
+    logger.info("Wrote %s price rows to %s", len(catalog), output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,357 @@
+"""Offline replay of recorded metrics through CloudPilot's live policies."""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from cloudpilot.anomaly_detector import detect_anomalies, get_anomaly_model
+from cloudpilot.cluster_env import REQUEST_RATE_UNIT
+from cloudpilot.config import get_settings
+from cloudpilot.k8s_autotuner import tuned_cpu
+from cloudpilot.metrics_history import MetricsHistory
+from cloudpilot.scaling import ACTIONS, MAINTAIN, RLScaler, get_rl_scaler
+from cloudpilot.streaming_detector import StreamingDetector
+
+logger = logging.getLogger(__name__)
+
+# Requests per second a deployment serves at full scale: ClusterEnv's
+# default max_replicas times its per-replica capacity.
+DEFAULT_FULL_CAPACITY = 20 * 100.0
+
+
+@dataclass(frozen=True)
+class ReplayEvent:
+    """An action the live policies would have taken."""
+
+    series: str
+    timestamp: float
+    kind: str  # "heal", "scale" or "tune"
+    detail: str
+
+
+@dataclass
+class ReplayResult:
+    """
+    Per-step policy outputs for ``(S, T)`` series and steps, plus events.
+
+    Steps past a series' recorded length are padding: not anomalous, scaled
+    with Maintain, and without a score (NaN).
+    """
+
+    series: list[str]
+    timestamps: np.ndarray
+    valid: np.ndarray
+    anomalies: np.ndarray
+    scores: np.ndarray
+    actions: np.ndarray
+    cpu_millicores: np.ndarray | None
+    events: list[ReplayEvent] = field(default_factory=list)
+
+    def counts(self) -> dict[str, int]:
+        out = {"heal": 0, "scale": 0, "tune": 0}
+        for event in self.events:
+            out[event.kind] += 1
+        return out
+
+
+def _parallel_rows(
+    fn: Callable[[np.ndarray], np.ndarray],
+    x: np.ndarray,
+    pool: ThreadPoolExecutor | None,
+    chunk_size: int,
+) -> np.ndarray:
+    """Apply a row-wise batch function to ``x`` in chunks, in parallel."""
+    if pool is None or x.shape[0] <= chunk_size:
+        return fn(x)
+    chunks = [x[i : i + chunk_size] for i in range(0, x.shape[0], chunk_size)]
+    return np.concatenate(list(pool.map(fn, chunks)))
+
+
+def _cooldown(mask: np.ndarray, steps: int) -> np.ndarray:
+    """Keep anomalous steps at least ``steps`` apart, per series."""
+    if steps <= 0:
+        return mask
+    out = np.zeros_like(mask)
+    for s, t_idx in enumerate(mask):
+        last = -steps - 1
+        for t in np.flatnonzero(t_idx).tolist():
+            if t - last > steps:
+                out[s, t] = True
+                last = t
+    return out
+
+
+def _cpu_schedule(limit: str, passes: int) -> list[tuple[int, str]]:
+    """``(pass, new limit)`` changes from applying the tuner ``passes`` times."""
+    changes: list[tuple[int, str]] = []
+    current = limit
+    for p in range(passes):
+        tuned = tuned_cpu(current)
+        if tuned is None:
+            break
+        changes.append((p, tuned))
+        current = tuned
+    return changes
+
+
+def replay(
+    features: np.ndarray,
+    timestamps: np.ndarray,
+    series: Sequence[str],
+    valid: np.ndarray | None = None,
+    model: Any = None,
+    scaler: RLScaler | None = None,
+    demand: np.ndarray | None = None,
+    full_capacity: float = DEFAULT_FULL_CAPACITY,
+    mem_limit_mb: float | Sequence[float] | None = None,
+    cpu_limits: Sequence[str] | None = None,
+    tune_every: int = 0,
+    heal_cooldown: int = 0,
+    max_workers: int | None = None,
+    chunk_size: int = 65536,
+) -> ReplayResult:
+    """
+    Replay ``(S, T, 4)`` recorded features through the live policies.
+
+    * Anomalies come from :func:`detect_anomalies` with ``model`` (default:
+      the configured model). Batch models score every recorded step at once;
+      a :class:`StreamingDetector` (a fresh one when the streaming detector is
+      configured) is fed one time step at a time across all series. Each
+      anomalous step is a heal, spaced by ``heal_cooldown`` steps.
+    * Scale actions come from ``RLScaler.get_actions`` on states
+      ``(cpu, mem, request_rate, latency, demand)`` in the units of
+      :class:`~cloudpilot.cluster_env.ClusterEnv`, which the scaler was
+      trained on. The recorded request rate (req/s) becomes thousands per
+      second. The recorded memory (MB) becomes a percentage of
+      ``mem_limit_mb`` (a scalar or one per series), which is required.
+      ``demand`` is an ``(S, T)`` array of fractions in ``[0, 1]`` and
+      defaults to the next recorded request rate over ``full_capacity``
+      req/s. Non-Maintain actions are events.
+    * With ``cpu_limits`` (one millicore string per series) and
+      ``tune_every``, the ``tune_deployment`` heuristic runs every
+      ``tune_every`` steps starting at step 0; each change is an event.
+
+    Batch scoring is split into ``chunk_size``-row chunks that run on up to
+    ``max_workers`` threads.
+    """
+    x = np.asarray(features, dtype=np.float64)
+    if x.ndim != 3:
+        raise ValueError(f"Expected (series, steps, features), got shape {x.shape}")
+    n_series, n_steps, _ = x.shape
+    if len(series) != n_series:
+        raise ValueError("series must name every series in features")
+    if full_capacity <= 0:
+        raise ValueError("full_capacity must be positive")
+    if mem_limit_mb is None:
+        raise ValueError(
+            "mem_limit_mb is required: recorded memory is in MB and the "
+            "scaler expects a percentage of the limit"
+        )
+    mem_limit = np.broadcast_to(np.asarray(mem_limit_mb, dtype=np.float64), (n_series,))
+    if not (mem_limit > 0).all():
+        raise ValueError("mem_limit_mb must be positive")
+    ts = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), (n_series, n_steps))
+    valid = (
+        np.ones((n_series, n_steps), dtype=bool)
+        if valid is None
+        else np.asarray(valid, dtype=bool)
+    )
+    rows = x[valid]
+
+    workers = max_workers or get_settings().monitor_max_workers
+    pool = ThreadPoolExecutor(workers, "cloudpilot-replay") if workers > 1 else None
+    try:
+        if model is None:
+            model = get_anomaly_model()
+            if isinstance(model, StreamingDetector):
+                model = StreamingDetector()
+        scores = np.full((n_series, n_steps), np.nan)
+        if isinstance(model, StreamingDetector):
+            names = list(series)
+            for t in range(n_steps):
+                live = np.flatnonzero(valid[:, t])
+                if live.size:
+                    _, step_scores = detect_anomalies(
+                        x[live, t], model=model, series=[names[i] for i in live]
+                    )
+                    scores[live, t] = step_scores
+        elif rows.size:
+            scores[valid] = _parallel_rows(
+                lambda chunk: detect_anomalies(chunk, model=model)[1],
+                rows,
+                pool,
+                chunk_size,
+            )
+        anomalies = np.zeros((n_series, n_steps), dtype=bool)
+        anomalies[valid] = scores[valid] < 0
+
+        scaler = scaler or get_rl_scaler()
+        if demand is None:
+            # The next step's rate; the last step has none and keeps its own.
+            rate = np.concatenate([x[:, 1:, 2], x[:, -1:, 2]], axis=1)
+            demand_col = np.clip(rate / full_capacity, 0.0, 1.0)
+        else:
+            demand_col = np.broadcast_to(demand, (n_series, n_steps))
+        states = np.concatenate([rows, demand_col[valid][:, None]], axis=1)
+        states[:, 2] /= REQUEST_RATE_UNIT
+        limits = np.broadcast_to(mem_limit[:, None], (n_series, n_steps))
+        states[:, 1] = np.clip(100.0 * states[:, 1] / limits[valid], 0.0, 100.0)
+        actions = np.full((n_series, n_steps), MAINTAIN, dtype=np.int64)
+        if states.shape[0]:
+            actions[valid] = _parallel_rows(
+                lambda chunk: scaler.get_actions(chunk)[0], states, pool, chunk_size
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    events: list[ReplayEvent] = []
+    heals = _cooldown(anomalies, heal_cooldown)
+    for s, t in zip(*np.nonzero(heals), strict=True):
+        events.append(ReplayEvent(series[s], float(ts[s, t]), "heal", "self_heal"))
+    for s, t in zip(*np.nonzero(valid & (actions != MAINTAIN)), strict=True):
+        label = ACTIONS.get(int(actions[s, t]), "Maintain")
+        events.append(ReplayEvent(series[s], float(ts[s, t]), "scale", label))
+
+    cpu: np.ndarray | None = None
+    if cpu_limits is not None and tune_every > 0:
+        if len(cpu_limits) != n_series:
+            raise ValueError("cpu_limits needs one limit per series")
+        cpu = np.zeros((n_series, n_steps), dtype=np.int64)
+        passes = -(-n_steps // tune_every)
+        for s, limit in enumerate(cpu_limits):
+            current = limit
+            cpu[s] = int(limit.rstrip("m")) if limit.endswith("m") else 0
+            for p, tuned in _cpu_schedule(limit, passes):
+                step = p * tune_every
+                cpu[s, step:] = int(tuned.rstrip("m"))
+                detail = f"{current} -> {tuned}"
+                events.append(
+                    ReplayEvent(series[s], float(ts[s, step]), "tune", detail)
+                )
+                current = tuned
+
+    events.sort(key=lambda e: (e.timestamp, e.series, e.kind))
+    return ReplayResult(
+        series=list(series),
+        timestamps=ts,
+        valid=valid,
+        anomalies=anomalies,
+        scores=scores,
+        actions=actions,
+        cpu_millicores=cpu,
+        events=events,
+    )
+
+
+def replay_history(
+    history: MetricsHistory,
+    series: Sequence[str] | None = None,
+    last: int | None = None,
+    **kwargs: Any,
+) -> ReplayResult:
+    """
+    Replay the newest ``last`` samples (default: all) of ``series`` (default:
+    every series) from a :class:`MetricsHistory`. Shorter series are padded.
+    """
+    names = list(series) if series is not None else history.series()
+    windows = [history.window(name, last) for name in names]
+    n_steps = max((t.size for t, _ in windows), default=0)
+    n_features = len(history.features)
+    features = np.zeros((len(names), n_steps, n_features))
+    timestamps = np.zeros((len(names), n_steps))
+    valid = np.zeros((len(names), n_steps), dtype=bool)
+    for i, (times, values) in enumerate(windows):
+        k = times.size
+        features[i, n_steps - k :] = values.T
+        timestamps[i, n_steps - k :] = times
+        valid[i, n_steps - k :] = True
+    return replay(features, timestamps, names, valid=valid, **kwargs)
+
+
+def format_replay_report(result: ReplayResult, limit: int = 50) -> str:
+    """Totals per series and kind, then the first ``limit`` events."""
+    lines = []
+    for s, name in enumerate(result.series):
+        steps = int(result.valid[s].sum())
+        kinds = {"heal": 0, "scale": 0, "tune": 0}
+        for event in result.events:
+            if event.series == name:
+                kinds[event.kind] += 1
+        lines.append(
+            f"{name}: {steps} steps, {kinds['heal']} heals, "
+            f"{kinds['scale']} scale actions, {kinds['tune']} limit changes"
+        )
+    for event in result.events[:limit]:
+        lines.append(
+            f"  t={event.timestamp:.0f} {event.series} {event.kind}: {event.detail}"
+        )
+    if len(result.events) > limit:
+        lines.append(f"  ... {len(result.events) - limit} more events")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay recorded metrics history through CloudPilot policies."
+    )
+    parser.add_argument(
+        "history",
+        nargs="?",
+        default=None,
+        help="History directory (default: CLOUDPILOT_METRICS_HISTORY).",
+    )
+    parser.add_argument("--series", action="append", default=None)
+    parser.add_argument("--last", type=int, default=None, help="Newest N samples.")
+    parser.add_argument(
+        "--cpu-limit", default=None, help="Starting CPU limit, e.g. 1000m."
+    )
+    parser.add_argument("--tune-every", type=int, default=0)
+    parser.add_argument("--heal-cooldown", type=int, default=0)
+    parser.add_argument(
+        "--full-capacity",
+        type=float,
+        default=DEFAULT_FULL_CAPACITY,
+        help="Req/s the deployment serves at full scale; demand is rate over this.",
+    )
+    parser.add_argument(
+        "--mem-limit-mb",
+        type=float,
+        required=True,
+        help="Memory limit in MB; recorded memory is scaled to a percentage of it.",
+    )
+    parser.add_argument("--events", type=int, default=50, help="Events to print.")
+    args = parser.parse_args(argv)
+    path = args.history or get_settings().metrics_history_path
+    if not path:
+        parser.error(
+            "no history directory given and CLOUDPILOT_METRICS_HISTORY is unset"
+        )
+    if not (Path(path) / "meta.json").is_file():
+        parser.error(f"no metrics history at {path}")
+    history = MetricsHistory(path, read_only=True)
+    names = args.series or history.series()
+    result = replay_history(
+        history,
+        names,
+        last=args.last,
+        cpu_limits=[args.cpu_limit] * len(names) if args.cpu_limit else None,
+        tune_every=args.tune_every,
+        heal_cooldown=args.heal_cooldown,
+        full_capacity=args.full_capacity,
+        mem_limit_mb=args.mem_limit_mb,
+    )
+    print(format_replay_report(result, limit=args.events))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,174 @@
+"""Array-backed experience replay, uniform and prioritized, for RL training."""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+class SumTree:
+    """
+    Binary sum tree over ``capacity`` non-negative priorities in one array.
+
+    Leaves sit at ``tree[size:size + capacity]`` (``size`` is ``capacity``
+    rounded up to a power of two) and every inner node holds the sum of its
+    children, so updates and prefix-sum lookups are ``O(log n)``. Both work
+    on whole batches: one vectorized pass per tree level.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("Capacity must be positive")
+        self.capacity = capacity
+        self._depth = (capacity - 1).bit_length()
+        self.size = 1 << self._depth
+        self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def __getitem__(self, idx: np.ndarray) -> np.ndarray:
+        return self.tree[self.size + np.asarray(idx)]
+
+    def update(self, idx: np.ndarray, priorities: np.ndarray) -> None:
+        """Set leaves ``idx`` to ``priorities`` and refresh their ancestors."""
+        nodes = self.size + np.asarray(idx, dtype=np.int64)
+        self.tree[nodes] = priorities
+        for _ in range(self._depth):
+            nodes = np.unique(nodes >> 1)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """Leaf index for each prefix sum in ``values`` (each in ``[0, total)``)."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(values.shape, dtype=np.int64)
+        for _ in range(self._depth):
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            # Never descend into an empty subtree, even on rounding error.
+            right = (values >= left_sum) & (self.tree[left + 1] > 0)
+            values -= np.where(right, left_sum, 0.0)
+            nodes = left + right
+        return nodes - self.size
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring of transitions in preallocated NumPy arrays.
+
+    Each transition costs ``2 * state_dim * 4 + 6`` bytes (float32 states,
+    uint8 action, float32 reward, bool done), so tens of millions fit in
+    memory; the oldest are overwritten once the buffer is full.
+    """
+
+    def __init__(self, capacity: int, state_dim: int = 5) -> None:
+        if capacity < 1:
+            raise ValueError("Capacity must be positive")
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.uint8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.pos = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(
+        self,
+        states: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        next_states: np.ndarray,
+        dones: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Store a batch of transitions; returns the slots they went to."""
+        n = len(actions)
+        if n > self.capacity:
+            raise ValueError(f"Batch of {n} exceeds capacity {self.capacity}")
+        idx = (self.pos + np.arange(n)) % self.capacity
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = next_states
+        self.dones[idx] = False if dones is None else dones
+        self.pos = (self.pos + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+        return idx
+
+    def batch(
+        self, idx: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """``(states, actions, rewards, next_states, dones)`` at ``idx``."""
+        return (
+            self.states[idx],
+            self.actions[idx].astype(np.int64),
+            self.rewards[idx],
+            self.next_states[idx],
+            self.dones[idx],
+        )
+
+    def sample(
+        self, batch_size: int, rng: np.random.Generator
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """A uniformly random batch, as from :meth:`batch`."""
+        return self.batch(rng.integers(0, self.size, batch_size))
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    Proportional prioritized replay (Schaul et al., 2016) over a :class:`SumTree`.
+
+    Transition ``i`` is sampled with probability ``p_i / sum(p)``, where
+    ``p_i = (|td_error_i| + eps) ** alpha``; new transitions get the largest
+    priority seen so far so each is replayed at least once soon.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        state_dim: int = 5,
+        alpha: float = 0.6,
+        eps: float = 1e-3,
+    ) -> None:
+        super().__init__(capacity, state_dim)
+        self.alpha = alpha
+        self.eps = eps
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0
+
+    def add(
+        self,
+        states: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        next_states: np.ndarray,
+        dones: np.ndarray | None = None,
+    ) -> np.ndarray:
+        idx = super().add(states, actions, rewards, next_states, dones)
+        self.tree.update(idx, np.full(idx.size, self.max_priority))
+        return idx
+
+    def sample_prioritized(
+        self, batch_size: int, rng: np.random.Generator, beta: float = 0.4
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Stratified prioritized sample: ``(indices, importance weights)``.
+
+        Weights are ``(size * P(i)) ** -beta`` scaled so the batch maximum
+        is 1. Fetch the transitions with :meth:`batch`.
+        """
+        total = self.tree.total
+        segment = total / batch_size
+        values = (np.arange(batch_size) + rng.random(batch_size)) * segment
+        idx = self.tree.find(np.minimum(values, np.nextafter(total, 0)))
+        probs = self.tree[idx] / total
+        weights = (self.size * probs) ** -beta
+        return idx, (weights / weights.max()).astype(np.float32)
+
+    def update_priorities(self, idx: np.ndarray, td_errors: np.ndarray) -> None:
+        priorities = (np.abs(td_errors) + self.eps) ** self.alpha
+        self.tree.update(idx, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
@@ -7,9 +7,17 @@ from importlib import resources
 from pathlib import Path
 from typing import Any
 
+import numpy as np
+
+from cloudpilot.decision_cache import get_decision_cache
+from cloudpilot.instrumentation import timed
+
 logger = logging.getLogger(__name__)
 
 ACTIONS = {0: "Scale Down", 1: "Maintain", 2: "Scale Up"}
+# (cpu_util, mem_util, request_rate, network_latency, user_demand)
+STATE_WIDTH = 5
+MAINTAIN = 1
 
 _scaler_lock = threading.Lock()
 _scaler: RLScaler | None = None
@@ -61,16 +69,43 @@ class RLScaler:
             self.model = None
 
     def get_action(self, state: Sequence[float]) -> str:
+        if len(state) != STATE_WIDTH:
+            raise ValueError(f"Expected {STATE_WIDTH} state values, got {len(state)}")
         if self.model is None:
             return "Maintain"
         import torch
 
         state_tensor = torch.tensor(state, dtype=torch.float32).unsqueeze(0)
-        with torch.no_grad():
+        with timed("rl_inference"), torch.no_grad():
             q_values = self.model(state_tensor)
         action_idx = int(torch.argmax(q_values, dim=1)[0].item())
         return ACTIONS.get(action_idx, "Maintain")
 
+    def get_actions(
+        self, states: Sequence[Sequence[float]] | np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Score an (N, 5) batch of states with one forward pass.
+
+        Returns ``(actions, q_values)`` as an int64 array of action indices and
+        an (N, 3) float32 array. Without a model every action is Maintain and
+        the Q-values are zero.
+        """
+        x = np.ascontiguousarray(states, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != STATE_WIDTH:
+            raise ValueError(
+                f"Expected an (N, {STATE_WIDTH}) state array, got shape {x.shape}"
+            )
+        if self.model is None or x.shape[0] == 0:
+            q = np.zeros((x.shape[0], len(ACTIONS)), dtype=np.float32)
+            return np.full(x.shape[0], MAINTAIN, dtype=np.int64), q
+        import torch
+
+        with timed("rl_inference"), torch.inference_mode():
+            q_values = self.model(torch.from_numpy(x))
+            actions = torch.argmax(q_values, dim=1)
+        return actions.numpy().astype(np.int64, copy=False), q_values.numpy()
+
 
 def get_rl_scaler(model_path: str | None = None) -> RLScaler:
     global _scaler
@@ -90,5 +125,22 @@ def recommend_scaling(
     user_demand: float,
 ) -> str:
     state = [cpu_util, mem_util, request_rate, network_latency, user_demand]
-    action = get_rl_scaler().get_action(state)
+    scaler = get_rl_scaler()
+    cache = get_decision_cache("scale")
+    if cache is None:
+        action = scaler.get_action(state)
+    else:
+        action = cache.get(state, scaler.model, lambda: scaler.get_action(state))
     return f"RL-based Recommendation: {action}"
+
+
+def recommend_scaling_batch(
+    states: Sequence[Sequence[float]] | np.ndarray,
+) -> list[str]:
+    """
+    Batch form of :func:`recommend_scaling` for (N, 5) states ordered as
+    (cpu_util, mem_util, request_rate, network_latency, user_demand).
+    """
+    actions, _ = get_rl_scaler().get_actions(states)
+    labels = [ACTIONS.get(int(a), "Maintain") for a in actions]
+    return [f"RL-based Recommendation: {label}" for label in labels]
@@ -0,0 +1,330 @@
+"""Local HTTP server answering scaling and anomaly queries with warm models."""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import numpy as np
+
+from cloudpilot.anomaly_detector import detect_anomalies, get_anomaly_model
+from cloudpilot.compiled_forest import CompiledForest
+from cloudpilot.config import get_settings
+from cloudpilot.instrumentation import start_metrics_server_from_settings, timed
+from cloudpilot.scaling import ACTIONS, get_rl_scaler
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-row requests into batched calls of ``fn``.
+
+    A worker thread takes the first queued request, then keeps collecting
+    until ``max_batch`` requests are queued or ``max_delay`` seconds have
+    passed, and calls ``fn`` once with every row and key. ``fn`` returns one
+    result per row; each caller's :meth:`submit` returns its own.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[np.ndarray, list[Any]], Sequence[Any]],
+        max_batch: int = 256,
+        max_delay: float = 0.002,
+        name: str = "batcher",
+    ) -> None:
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.name = name
+        self._queue: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._run, name=f"cloudpilot-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, row: Sequence[float], key: Any = None) -> Future[Any]:
+        future: Future[Any] = Future()
+        self._queue.put((row, key, future))
+        return future
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self) -> tuple[list[Any], bool]:
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            try:
+                self._answer(batch)
+            except Exception as e:
+                # Never let the worker die: later submits would wait forever.
+                logger.exception("Error answering a %s batch", self.name)
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _answer(self, batch: list[Any]) -> None:
+        if not batch:
+            return
+        try:
+            rows = np.asarray([row for row, _, _ in batch], dtype=np.float64)
+            with timed(f"serve_{self.name}_batch"):
+                results = self.fn(rows, [key for _, key, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"{self.name} returned {len(results)} results for {len(batch)} rows"
+                )
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+            else:
+                # Retry one by one so a bad row only fails its own caller.
+                for item in batch:
+                    self._run_one(*item)
+            return
+        for (_, _, future), result in zip(batch, results, strict=True):
+            future.set_result(result)
+
+    def _run_one(self, row: Sequence[float], key: Any, future: Future[Any]) -> None:
+        try:
+            x = np.asarray([row], dtype=np.float64)
+            result = self.fn(x, [key])[0]
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+
+def _scale_batch(rows: np.ndarray, keys: list[Any]) -> list[str]:
+    actions, _ = get_rl_scaler().get_actions(rows)
+    return [ACTIONS.get(int(a), "Maintain") for a in actions]
+
+
+_compiled: tuple[Any, CompiledForest] | None = None
+
+
+def _anomaly_model() -> Any:
+    """The anomaly model, with an ``IsolationForest`` swapped for its compiled form."""
+    global _compiled
+    model = get_anomaly_model()
+    if not hasattr(model, "estimators_"):
+        return model
+    if _compiled is None or _compiled[0] is not model:
+        _compiled = (model, CompiledForest.from_isolation_forest(model))
+    return _compiled[1]
+
+
+def _anomaly_batch(
+    rows: np.ndarray, keys: list[Any]
+) -> list[tuple[bool, float | None]]:
+    series = [key or "default" for key in keys]
+    flags, scores = detect_anomalies(rows, model=_anomaly_model(), series=series)
+    # JSON has no infinity: a warming-up streaming detector's +inf is null.
+    return [
+        (bool(f), float(s) if np.isfinite(s) else None)
+        for f, s in zip(flags, scores, strict=True)
+    ]
+
+
+class RecommendationServer(ThreadingHTTPServer):
+    """
+    ``POST /v1/scale`` with ``{"state": [cpu, mem, req, latency, demand]}``
+    answers ``{"action": ...}``; ``POST /v1/anomaly`` with ``{"features":
+    [cpu, mem, request_rate, latency], "series": "ns"}`` answers
+    ``{"anomaly": ..., "score": ...}``, where ``score`` is ``null`` while a
+    streaming detector is still warming up the series. Plural ``states`` / ``rows`` (and
+    ``series`` as a list) are already batches, so they skip the micro-batcher
+    and are scored in the request's own thread. A single row not answered
+    within ``request_timeout`` seconds gets a 503. ``GET /healthz``.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        max_batch: int = 256,
+        max_delay: float = 0.002,
+        request_timeout: float = 5.0,
+    ) -> None:
+        super().__init__(address, _Handler)
+        self.request_timeout = request_timeout
+        self.scale = MicroBatcher(_scale_batch, max_batch, max_delay, "scale")
+        self.anomaly = MicroBatcher(_anomaly_batch, max_batch, max_delay, "anomaly")
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.scale.close()
+        self.anomaly.close()
+
+
+def _rows(body: dict, one: str, many: str, width: int) -> tuple[np.ndarray, bool]:
+    """
+    Rows from ``body[one]`` (a single row) or ``body[many]`` (a list), as an
+    ``(n, width)`` float array; raises ``ValueError`` unless every value is
+    a finite number, so bad input never reaches a shared batch.
+    """
+    single = one in body
+    rows = [body[one]] if single else body.get(many)
+    if not isinstance(rows, list) or not rows:
+        raise ValueError(f"Expected {one!r} or a non-empty {many!r}")
+    for row in rows:
+        if (
+            not isinstance(row, list)
+            or len(row) != width
+            or not all(
+                isinstance(v, int | float) and not isinstance(v, bool) for v in row
+            )
+        ):
+            raise ValueError(f"Each row needs {width} numbers")
+    try:
+        x = np.asarray(rows, dtype=np.float64)
+    except OverflowError:
+        raise ValueError("Rows must be finite numbers") from None
+    if not np.isfinite(x).all():
+        raise ValueError("Rows must be finite numbers")
+    return x, single
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY,
+    # Nagle and delayed ACKs add ~40 ms to every keep-alive response.
+    disable_nagle_algorithm = True
+    server: RecommendationServer
+
+    def _reply(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path == "/healthz":
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"error": f"No route {self.path}"})
+
+    def do_POST(self) -> None:  # noqa: N802
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True
+            self._reply(400, {"error": "Invalid Content-Length"})
+            return
+        raw = self.rfile.read(length)
+        if self.path not in ("/v1/scale", "/v1/anomaly"):
+            self._reply(404, {"error": f"No route {self.path}"})
+            return
+        try:
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("Expected a JSON object")
+            if self.path == "/v1/scale":
+                payload = self._scale(body)
+            else:
+                payload = self._anomaly(body)
+        except (ValueError, TypeError) as e:
+            self._reply(400, {"error": str(e)})
+            return
+        except FutureTimeoutError:
+            logger.error("Timed out answering %s", self.path)
+            self._reply(503, {"error": "Timed out waiting for the model"})
+            return
+        except Exception as e:
+            logger.exception("Error answering %s", self.path)
+            self._reply(500, {"error": str(e)})
+            return
+        self._reply(200, payload)
+
+    def _scale(self, body: dict) -> dict:
+        rows, single = _rows(body, "state", "states", 5)
+        if single:
+            future = self.server.scale.submit(rows[0].tolist())
+            return {"action": future.result(self.server.request_timeout)}
+        return {"actions": _scale_batch(rows, [None] * len(rows))}
+
+    def _anomaly(self, body: dict) -> dict:
+        rows, single = _rows(body, "features", "rows", 4)
+        series = body.get("series")
+        if single:
+            future = self.server.anomaly.submit(rows[0].tolist(), series)
+            flag, score = future.result(self.server.request_timeout)
+            return {"anomaly": flag, "score": score}
+        keys = series if isinstance(series, list) else [series] * len(rows)
+        if len(keys) != len(rows):
+            raise ValueError("'series' needs one name per row")
+        results = _anomaly_batch(rows, keys)
+        return {
+            "anomalies": [flag for flag, _ in results],
+            "scores": [score for _, score in results],
+        }
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    max_batch: int | None = None,
+    max_delay: float | None = None,
+) -> None:
+    """Load both models, then answer requests until interrupted."""
+    settings = get_settings()
+    get_rl_scaler()
+    get_anomaly_model()
+    start_metrics_server_from_settings()
+    server = RecommendationServer(
+        (host, port),
+        max_batch=max_batch or settings.serve_max_batch,
+        max_delay=(
+            max_delay
+            if max_delay is not None
+            else settings.serve_batch_window_ms / 1000
+        ),
+        request_timeout=settings.serve_timeout_ms / 1000,
+    )
+    logger.info("Serving recommendations on http://%s:%s", host, port)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,146 @@
+"""Online robust z-score detector with constant state per monitored series."""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Hashable, Sequence
+
+import numpy as np
+
+# Scales a median absolute deviation to a normal standard deviation.
+_MAD_TO_SIGMA = 1.4826
+
+
+class StreamingDetector:
+    """
+    Rolling robust z-scores, updated with every sample in O(1) per series.
+
+    Each series keeps, per feature, a location ``center`` (a running median)
+    and a spread ``scale`` (a running median absolute deviation). The first
+    ``warmup`` samples seed them with a plain running mean and mean absolute
+    deviation; after that both follow bounded sign steps of rate ``alpha``,
+    so a single outlier moves them by at most ``alpha`` of the spread. A
+    sample's z-score is its largest feature deviation in robust sigmas.
+
+    Scores follow the ``decision_function`` convention of ``IsolationForest``:
+    ``threshold - z``, so negative means anomalous. Series are scored
+    against their state *before* the sample is absorbed, and report ``+inf``
+    (never anomalous) during warmup. State lives in flat arrays that grow by
+    doubling, so thousands of series cost a few numpy ops per batch.
+    """
+
+    def __init__(
+        self,
+        n_features: int = 4,
+        alpha: float = 0.02,
+        threshold: float = 3.5,
+        warmup: int = 30,
+        capacity: int = 64,
+    ) -> None:
+        if not 0.0 < alpha < 1.0:
+            raise ValueError(f"alpha must be in (0, 1), got {alpha}")
+        if warmup < 1:
+            raise ValueError(f"warmup must be at least 1, got {warmup}")
+        self.n_features = n_features
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self._lock = threading.Lock()
+        self._rows: dict[Hashable, int] = {}
+        self._center = np.zeros((capacity, n_features))
+        self._scale = np.zeros((capacity, n_features))
+        self._count = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _row_indices(self, series: Sequence[Hashable]) -> np.ndarray:
+        for key in series:
+            if key not in self._rows:
+                self._rows[key] = len(self._rows)
+        needed = len(self._rows)
+        if needed > self._count.size:
+            capacity = max(needed, 2 * self._count.size)
+            extra = capacity - self._count.size
+            self._center = np.vstack([self._center, np.zeros((extra, self.n_features))])
+            self._scale = np.vstack([self._scale, np.zeros((extra, self.n_features))])
+            self._count = np.concatenate([self._count, np.zeros(extra, np.int64)])
+        return np.fromiter((self._rows[k] for k in series), np.int64, len(series))
+
+    def _step(self, rows: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """Score and absorb one sample for each of ``rows`` (all distinct)."""
+        center = self._center[rows]
+        scale = self._scale[rows]
+        count = self._count[rows]
+        floor = 1e-3 * (np.abs(center) + 1.0)
+        spread = np.maximum(scale, floor)
+
+        deviation = np.abs(x - center)
+        z = (deviation / (_MAD_TO_SIGMA * spread)).max(axis=1)
+        warm = count >= self.warmup
+        scores = np.where(warm, self.threshold - z, np.inf)
+
+        n = (count + 1)[:, None].astype(np.float64)
+        seed_center = center + (x - center) / n
+        seed_scale = scale + (np.abs(x - seed_center) - scale) / n
+        step = self.alpha * spread
+        robust_center = center + step * np.sign(x - center)
+        robust_scale = spread * np.exp(self.alpha * np.sign(deviation - spread))
+        self._center[rows] = np.where(warm[:, None], robust_center, seed_center)
+        self._scale[rows] = np.where(warm[:, None], robust_scale, seed_scale)
+        self._count[rows] = count + 1
+        return scores
+
+    def update(self, features: np.ndarray, series: Sequence[Hashable]) -> np.ndarray:
+        """
+        Score rows of ``features`` against their series, then absorb them.
+
+        A series repeated within the batch is processed in row order.
+        """
+        x = np.asarray(features, dtype=np.float64)
+        if x.ndim != 2 or x.shape[1] != self.n_features:
+            raise ValueError(f"Expected shape (n, {self.n_features}), got {x.shape}")
+        if len(series) != x.shape[0]:
+            raise ValueError("series must name one series per feature row")
+        scores = np.empty(x.shape[0], dtype=np.float64)
+        with self._lock:
+            rows = self._row_indices(series)
+            # Group repeated series into passes so each pass has distinct rows.
+            passes = np.empty(rows.size, dtype=np.int64)
+            seen: dict[int, int] = {}
+            for i, r in enumerate(rows.tolist()):
+                passes[i] = seen.get(r, 0)
+                seen[r] = passes[i] + 1
+            for p in range(int(passes.max(initial=-1)) + 1):
+                sel = np.flatnonzero(passes == p)
+                scores[sel] = self._step(rows[sel], x[sel])
+        return scores
+
+    def forget(self, series: Hashable) -> None:
+        """Reset one series' state (its slot is reused for the same key)."""
+        with self._lock:
+            row = self._rows.get(series)
+            if row is not None:
+                self._count[row] = 0
+                self._center[row] = 0.0
+                self._scale[row] = 0.0
+
+
+_detector_lock = threading.Lock()
+_detector: StreamingDetector | None = None
+
+
+def get_streaming_detector() -> StreamingDetector:
+    """Shared detector, created on first use."""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = StreamingDetector()
+        return _detector
+
+
+def reset_streaming_detector_for_testing() -> None:
+    """Drop the shared detector and its state (tests only)."""
+    global _detector
+    with _detector_lock:
+        _detector = None
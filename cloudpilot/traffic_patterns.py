@@ -0,0 +1,277 @@
+"""Time-varying request-rate patterns and a vectorized arrival sampler."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+
+class RatePattern:
+    """
+    A request rate (req/s) as a function of seconds since the start.
+
+    Subclasses implement :meth:`__call__` on arrays of times. :meth:`bound`
+    must never be below the rate inside a cell; the default samples the
+    cell's edges and midpoint, which is exact for rates monotone within a
+    cell. Random patterns return a fixed realization from :meth:`realize`.
+    """
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def bound(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Upper bound of the rate over each cell ``[starts[i], ends[i])``."""
+        mids = (starts + ends) / 2
+        return np.maximum(np.maximum(self(starts), self(mids)), self(ends))
+
+    def realize(self, duration: float, rng: np.random.Generator) -> RatePattern:
+        return self
+
+
+@dataclass(frozen=True)
+class Constant(RatePattern):
+    rate: float
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        return np.full(np.shape(t), float(self.rate))
+
+
+@dataclass(frozen=True)
+class Diurnal(RatePattern):
+    """``mean * (1 + amplitude * cos(2π (t - peak_time) / period))``."""
+
+    mean: float
+    amplitude: float = 0.5
+    period: float = 86400.0
+    peak_time: float = 14 * 3600.0
+
+    def __post_init__(self) -> None:
+        if not 0 <= self.amplitude <= 1:
+            raise ValueError("Amplitude must be between 0 and 1")
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        phase = 2 * np.pi * (np.asarray(t) - self.peak_time) / self.period
+        return self.mean * (1 + self.amplitude * np.cos(phase))
+
+    def bound(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        # A peak inside the cell is at most a quarter cell from a sampled
+        # point; pad by the largest possible drop over that distance.
+        slack = 1 - np.cos(np.pi * (ends - starts) / self.period)
+        return super().bound(starts, ends) + self.mean * self.amplitude * slack
+
+
+@dataclass(frozen=True)
+class Ramp(RatePattern):
+    """Linear from ``start_rate`` to ``end_rate`` over ``duration``, then held."""
+
+    start_rate: float
+    end_rate: float
+    duration: float
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        frac = np.clip(np.asarray(t) / self.duration, 0.0, 1.0)
+        return self.start_rate + (self.end_rate - self.start_rate) * frac
+
+
+class _Knots(RatePattern):
+    """Rates defined by knots ``(times, rates)``; bounds include knots in a cell."""
+
+    times: np.ndarray
+    rates: np.ndarray
+
+    def bound(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        edges = super().bound(starts, ends)
+        lo = np.searchsorted(self.times, starts, "left")
+        hi = np.searchsorted(self.times, ends, "left")
+        segment = self.rates[lo[0] : hi[-1]]
+        if not segment.size:
+            return edges
+        inner = np.maximum.reduceat(np.append(segment, -np.inf), lo - lo[0])
+        return np.maximum(edges, np.where(hi > lo, inner, -np.inf))
+
+
+class Step(_Knots):
+    """``rates[i]`` from ``times[i]`` until the next time; ``rates[0]`` before."""
+
+    def __init__(
+        self, times: Sequence[float] | np.ndarray, rates: Sequence[float] | np.ndarray
+    ) -> None:
+        self.times = np.asarray(times, dtype=np.float64)
+        self.rates = np.asarray(rates, dtype=np.float64)
+        if self.times.shape != self.rates.shape or not self.times.size:
+            raise ValueError("Step needs one rate per time")
+        if np.any(np.diff(self.times) < 0):
+            raise ValueError("Step times must be sorted")
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        idx = np.searchsorted(self.times, t, "right") - 1
+        return self.rates[np.clip(idx, 0, None)]
+
+
+class Trace(_Knots):
+    """A recorded request-rate trace, linearly interpolated and held at the ends."""
+
+    def __init__(
+        self, times: Sequence[float] | np.ndarray, rates: Sequence[float] | np.ndarray
+    ) -> None:
+        self.times = np.asarray(times, dtype=np.float64)
+        self.rates = np.asarray(rates, dtype=np.float64)
+        if self.times.shape != self.rates.shape or not self.times.size:
+            raise ValueError("Trace needs one rate per time")
+        if np.any(np.diff(self.times) <= 0):
+            raise ValueError("Trace times must be strictly increasing")
+        if np.any(self.rates < 0):
+            raise ValueError("Trace rates must be non-negative")
+
+    @classmethod
+    def from_file(cls, path: str | Path, step: float = 60.0) -> Trace:
+        """
+        Load a ``.npy`` or CSV trace: two columns ``(seconds, rate)``, or a
+        single column of rates sampled every ``step`` seconds. Times are
+        shifted to start at zero.
+        """
+        path = str(path)
+        if path.endswith(".npy"):
+            data = np.asarray(np.load(path), dtype=np.float64)
+        else:
+            data = np.loadtxt(path, delimiter=",", ndmin=2)
+        if data.ndim == 1 or data.shape[1] == 1:
+            rates = data.reshape(-1)
+            return cls(np.arange(rates.size) * step, rates)
+        return cls(data[:, 0] - data[0, 0], data[:, 1])
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        return np.interp(t, self.times, self.rates)
+
+
+@dataclass(frozen=True)
+class MarkovModulated(RatePattern):
+    """
+    Markov-modulated Poisson process: ``rates[k]`` while in state ``k``.
+
+    States last exponentially distributed times with means ``mean_holding``
+    and then jump to a uniformly chosen other state, starting in state 0.
+    """
+
+    rates: tuple[float, ...]
+    mean_holding: tuple[float, ...]
+
+    def __post_init__(self) -> None:
+        if len(self.rates) < 2 or len(self.rates) != len(self.mean_holding):
+            raise ValueError("Need at least two states, each with a holding time")
+
+    def realize(self, duration: float, rng: np.random.Generator) -> Step:
+        n = len(self.rates)
+        holding = np.asarray(self.mean_holding, dtype=np.float64)
+        expected = duration / holding.mean()
+        states = [np.zeros(1, dtype=np.int64)]
+        times = [np.zeros(1)]
+        end = 0.0
+        while True:
+            last = int(states[-1][-1])
+            k = int(expected) + 16
+            jumps = rng.integers(1, n, size=k) if n > 2 else np.ones(k, np.int64)
+            seq = np.concatenate([[last], (last + np.cumsum(jumps)) % n])
+            starts = end + np.cumsum(rng.exponential(holding[seq[:-1]]))
+            states.append(seq[1:])
+            times.append(starts)
+            end = float(starts[-1])
+            if end >= duration:
+                break
+        all_states = np.concatenate(states)
+        all_times = np.concatenate(times)
+        keep = all_times < duration
+        rates = np.asarray(self.rates, dtype=np.float64)
+        return Step(all_times[keep], rates[all_states[keep]])
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        raise TypeError("Call realize() to fix a random MarkovModulated path")
+
+
+def pattern_from_name(name: str, intensity: float, duration: float) -> RatePattern:
+    """
+    Named patterns with mean rate about ``intensity`` over ``duration``:
+    ``normal``, ``diurnal`` (±50% daily cycle), ``ramp`` (0 to 2×), ``step``
+    (0.5× then 1.5× from the midpoint) and ``bursty`` (a 0.5×/3.5× two-state
+    MMPP). ``peak`` (1.5×) and ``offpeak`` (0.7×) scale the mean, and
+    ``trace:<path>`` replays a recorded rate as is.
+    """
+    lowered = name.lower()
+    if lowered.startswith("trace:"):
+        return Trace.from_file(name[len("trace:") :])
+    if lowered == "peak":
+        return Constant(intensity * 1.5)
+    if lowered == "offpeak":
+        return Constant(intensity * 0.7)
+    if lowered == "diurnal":
+        return Diurnal(intensity)
+    if lowered == "ramp":
+        return Ramp(0.0, 2 * intensity, duration)
+    if lowered == "step":
+        return Step([0.0, duration / 2], [0.5 * intensity, 1.5 * intensity])
+    if lowered == "bursty":
+        return MarkovModulated((0.5 * intensity, 3.5 * intensity), (50.0, 10.0))
+    return Constant(intensity)
+
+
+def _thinned(
+    pattern: RatePattern,
+    start: float,
+    stop: float,
+    rng: np.random.Generator,
+    resolution: float,
+) -> np.ndarray:
+    """Thinning of a piecewise-homogeneous process bounding ``pattern``."""
+    starts = np.arange(start, stop, resolution)
+    ends = np.minimum(starts + resolution, stop)
+    bound = np.maximum(pattern.bound(starts, ends), 0.0)
+    counts = rng.poisson(bound * (ends - starts))
+    times = np.repeat(starts, counts)
+    times += rng.random(times.size) * np.repeat(ends - starts, counts)
+    keep = rng.random(times.size) * np.repeat(bound, counts) < pattern(times)
+    times = times[keep]
+    times.sort()
+    return times
+
+
+def iter_pattern_arrivals(
+    pattern: RatePattern,
+    duration: float,
+    window: float = 3600.0,
+    seed: int | np.random.Generator | None = None,
+    resolution: float = 1.0,
+) -> Iterator[np.ndarray]:
+    """
+    Yield sorted arrival times of a non-homogeneous Poisson process with
+    rate ``pattern``, one ``window``-second slice at a time.
+
+    Candidates are drawn from a homogeneous process per ``resolution``-second
+    cell at the pattern's bound there and kept with probability
+    ``rate(t) / bound``, so the result is exact while cost stays close to
+    the number of arrivals.
+    """
+    if duration < 0:
+        raise ValueError("Duration must be non-negative")
+    if window <= 0 or resolution <= 0:
+        raise ValueError("Window and resolution must be positive")
+    rng = np.random.default_rng(seed)
+    realized = pattern.realize(duration, rng)
+    for start in np.arange(0.0, duration, window).tolist():
+        stop = min(start + window, duration)
+        yield _thinned(realized, start, stop, rng, resolution)
+
+
+def sample_arrivals(
+    pattern: RatePattern,
+    duration: float,
+    seed: int | np.random.Generator | None = None,
+    resolution: float = 1.0,
+) -> np.ndarray:
+    """All arrival times of :func:`iter_pattern_arrivals` as one array."""
+    chunks = list(
+        iter_pattern_arrivals(pattern, duration, max(duration, 1.0), seed, resolution)
+    )
+    return np.concatenate(chunks) if chunks else np.empty(0)
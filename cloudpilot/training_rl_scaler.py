@@ -1,46 +1,195 @@
+"""
+Train the RL scaling model with DQN on the simulated cluster.
+
+    python -m cloudpilot.training_rl_scaler --iterations 3000 --output model.pt
+"""
+
+import argparse
+import copy
 import logging
+import time
 
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
 
+from cloudpilot.cluster_env import STATE_SCALE, ClusterEnv, evaluate, threshold_policy
+from cloudpilot.replay_buffer import PrioritizedReplayBuffer, ReplayBuffer
+from cloudpilot.scaling import ACTIONS
+
 logger = logging.getLogger(__name__)
 
 
 class DQN(nn.Module):
+    input_scale: torch.Tensor
+
     def __init__(self, state_dim: int = 5, action_dim: int = 3) -> None:
         super().__init__()
+        # Inputs are divided by this before the first layer, so the saved
+        # model takes raw recommend_scaling states.
+        self.register_buffer("input_scale", torch.ones(state_dim))
         self.fc1 = nn.Linear(state_dim, 32)
         self.fc2 = nn.Linear(32, 32)
         self.fc3 = nn.Linear(32, action_dim)
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
+        x = x / self.input_scale
         x = torch.relu(self.fc1(x))
         x = torch.relu(self.fc2(x))
         return self.fc3(x)
 
 
-def train_dummy_model() -> None:
+def epsilon_at(
+    iteration: int, iterations: int, start: float, end: float, decay: float
+) -> float:
+    """Linear decay from ``start`` to ``end`` over the first ``decay`` fraction."""
+    frac = min(1.0, iteration / max(1.0, decay * iterations))
+    return start + (end - start) * frac
+
+
+def train_dqn(
+    iterations: int = 3000,
+    n_envs: int = 256,
+    pattern: str = "diurnal",
+    batch_size: int = 512,
+    gamma: float = 0.95,
+    lr: float = 1e-3,
+    buffer_size: int = 200_000,
+    target_update: int = 200,
+    eps_start: float = 1.0,
+    eps_end: float = 0.05,
+    eps_decay: float = 0.5,
+    prioritized: bool = True,
+    beta_start: float = 0.4,
+    seed: int | None = 0,
+) -> DQN:
+    """
+    Train a :class:`DQN` on ``n_envs`` parallel :class:`ClusterEnv` instances.
+
+    Each iteration steps every environment once with an epsilon-greedy
+    policy (epsilon decays linearly over the first ``eps_decay`` of
+    ``iterations``), stores the transitions, and takes one Adam step on a
+    Huber TD loss against a target network synced every ``target_update``
+    iterations. Episodes only end by time limit, so targets always bootstrap.
+
+    Batches come from a :class:`PrioritizedReplayBuffer` by TD error, with
+    importance weights whose exponent anneals from ``beta_start`` to 1, or
+    uniformly from a :class:`ReplayBuffer` when ``prioritized`` is false.
+    """
+    rng = np.random.default_rng(seed)
+    if seed is not None:
+        torch.manual_seed(seed)
+    env = ClusterEnv(n_envs=n_envs, pattern=pattern, seed=rng)
     model = DQN()
-    optimizer = optim.Adam(model.parameters(), lr=1e-3)
-    loss_fn = nn.MSELoss()
+    model.input_scale.copy_(torch.tensor(STATE_SCALE))
+    target = copy.deepcopy(model)
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    loss_fn = nn.SmoothL1Loss(reduction="none")
+    buffer_cls = PrioritizedReplayBuffer if prioritized else ReplayBuffer
+    buffer = buffer_cls(buffer_size)
+    n_actions = len(ACTIONS)
 
-    for epoch in range(100):
-        state_batch = torch.rand((32, 5))
-        target_batch = torch.rand((32, 3))
+    for it in range(iterations):
+        states = env.obs.copy()
+        with torch.no_grad():
+            greedy = model(torch.from_numpy(states)).argmax(dim=1).numpy()
+        eps = epsilon_at(it, iterations, eps_start, eps_end, eps_decay)
+        explore = rng.random(n_envs) < eps
+        actions = np.where(explore, rng.integers(0, n_actions, n_envs), greedy)
+        next_states, rewards, _ = env.step(actions)
+        buffer.add(states, actions, rewards, next_states)
+        if len(buffer) < batch_size:
+            continue
+
+        if isinstance(buffer, PrioritizedReplayBuffer):
+            beta = beta_start + (1.0 - beta_start) * it / iterations
+            idx, weights = buffer.sample_prioritized(batch_size, rng, beta)
+            batch = buffer.batch(idx)
+        else:
+            batch = buffer.sample(batch_size, rng)
+            weights = np.ones(batch_size, dtype=np.float32)
+        s, a, r, s2, done = (torch.from_numpy(x) for x in batch)
+        with torch.no_grad():
+            next_q = target(s2).max(dim=1).values
+            td_target = r + gamma * next_q * (~done)
+        q = model(s).gather(1, a.unsqueeze(1)).squeeze(1)
+        loss = (torch.from_numpy(weights) * loss_fn(q, td_target)).mean()
+        if isinstance(buffer, PrioritizedReplayBuffer):
+            buffer.update_priorities(idx, (q - td_target).detach().numpy())
         optimizer.zero_grad()
-        output = model(state_batch)
-        loss = loss_fn(output, target_batch)
         loss.backward()
         optimizer.step()
-        if epoch % 10 == 0:
-            logger.info("Epoch %s, Loss: %.4f", epoch, loss.item())
+        if it % target_update == 0:
+            target.load_state_dict(model.state_dict())
+        if it % 500 == 0:
+            logger.info("Iteration %s, epsilon %.2f, loss %.4f", it, eps, loss.item())
+    return model
+
+
+def dqn_policy(model: DQN):
+    """Greedy NumPy policy for :func:`~cloudpilot.cluster_env.evaluate`."""
+
+    def policy(obs: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return model(torch.from_numpy(obs)).argmax(dim=1).numpy()
+
+    return policy
+
+
+def save_model(model: DQN, path: str) -> None:
+    torch.jit.script(model.eval()).save(path)
+    logger.info("Saved scripted model to %s", path)
+
+
+def train_dummy_model() -> None:
+    """Train with the defaults and save ``rl_scaling_model.pt`` (kept for callers)."""
+    save_model(train_dqn(), "rl_scaling_model.pt")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Train the RL scaling model on a simulated cluster."
+    )
+    parser.add_argument("--iterations", type=int, default=3000)
+    parser.add_argument("--envs", type=int, default=256)
+    parser.add_argument(
+        "--pattern",
+        default="diurnal",
+        help="Demand pattern: diurnal, ramp, step, bursty, trace:<path>, ...",
+    )
+    parser.add_argument(
+        "--uniform-replay",
+        dest="prioritized",
+        action="store_false",
+        help="Sample replay uniformly instead of by TD error.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="rl_scaling_model.pt")
+    args = parser.parse_args(argv)
 
-    scripted_model = torch.jit.script(model)
-    scripted_model.save("rl_scaling_model.pt")
-    logger.info("Saved scripted model to rl_scaling_model.pt")
+    start = time.perf_counter()
+    model = train_dqn(
+        args.iterations,
+        args.envs,
+        args.pattern,
+        prioritized=args.prioritized,
+        seed=args.seed,
+    )
+    logger.info("Trained in %.1fs", time.perf_counter() - start)
+    for name, policy in (("dqn", dqn_policy(model)), ("threshold", threshold_policy)):
+        env = ClusterEnv(n_envs=256, pattern=args.pattern, seed=args.seed + 1)
+        stats = evaluate(policy, env, steps=720)
+        logger.info(
+            "%s: reward %.3f, SLO violations %.2f%%, mean replicas %.1f",
+            name,
+            stats["reward"],
+            100 * stats["slo_violation_rate"],
+            stats["mean_replicas"],
+        )
+    save_model(model, args.output)
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    train_dummy_model()
+    main()
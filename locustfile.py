@@ -1,16 +1,109 @@
+"""
+Open-loop Locust load that follows a precomputed arrival schedule.
+
+    locust -f locustfile.py --host http://my-service --headless --users 1 \\
+        --schedule-duration 300 --schedule-intensity 50 --schedule-pattern peak
+
+Every process computes the same seeded schedule with ``simulate_arrivals``.
+In a distributed run, start the master and each worker with the same
+``--schedule-*`` options plus ``--schedule-workers N``; worker ``i`` then
+sends every ``N``-th arrival starting at ``i``, and ``--users`` must be at
+least ``N`` so every worker runs a user.
+
+Each request is spawned at its due time, so slow responses never delay later
+arrivals. Response times are in Locust's usual aggregated stats; how late
+the generator itself started requests is logged once per process at the end.
+"""
+
+import logging
 import time
 
-from cloudpilot.load_tester import simulate_workload
-from locust import User, between, task
+import gevent
+from cloudpilot.load_generator import LatencyHistogram
+from cloudpilot.load_tester import scheduled_share
+from locust import HttpUser, constant, events, task
+from locust.exception import StopUser
+from locust.runners import MasterRunner, WorkerRunner
+
+logger = logging.getLogger(__name__)
+
+
+@events.init_command_line_parser.add_listener
+def _add_schedule_options(parser):
+    parser.add_argument("--schedule-duration", type=int, default=60)
+    parser.add_argument("--schedule-intensity", type=float, default=10.0)
+    parser.add_argument(
+        "--schedule-pattern",
+        default="normal",
+        help="normal, peak, offpeak, diurnal, ramp, step, bursty or trace:<path>.",
+    )
+    parser.add_argument("--schedule-seed", type=int, default=0)
+    parser.add_argument(
+        "--schedule-workers",
+        type=int,
+        default=1,
+        help="Worker processes sharing the schedule in a distributed run.",
+    )
+    parser.add_argument("--schedule-path", default="/")
+
+
+class _Schedule:
+    """This process's share of the arrival schedule, consumed by all its users."""
+
+    def __init__(self, environment):
+        opts = environment.parsed_options
+        index = None
+        if isinstance(environment.runner, WorkerRunner):
+            index = environment.runner.worker_index
+        arrivals, self.total = scheduled_share(opts, index)
+        self.arrivals = arrivals.tolist()
+        self.path = opts.schedule_path
+        self.next = 0
+        self.start = None
+        self.lag = LatencyHistogram()
+
+
+_schedule = None
+
+
+@events.test_start.add_listener
+def _on_test_start(environment, **kwargs):
+    global _schedule
+    if not isinstance(environment.runner, MasterRunner):
+        _schedule = _Schedule(environment)
+
+
+@events.test_stop.add_listener
+def _on_test_stop(environment, **kwargs):
+    schedule = _schedule
+    if schedule is None or not schedule.lag.count:
+        return
+    logger.info(
+        "Sent %s of %s scheduled requests (this share: %s); start lag p50=%.1fms "
+        "p99=%.1fms max=%.1fms",
+        schedule.lag.count,
+        schedule.total,
+        len(schedule.arrivals),
+        schedule.lag.percentile(50) * 1000,
+        schedule.lag.percentile(99) * 1000,
+        schedule.lag.max * 1000,
+    )
 
 
-class LoadTestUser(User):
-    wait_time = between(1, 3)
+class ScheduledUser(HttpUser):
+    wait_time = constant(0)
 
     @task
-    def generate_workload(self):
-        # Generate a 1-second workload with intensity 2 using the 'normal' pattern.
-        events = simulate_workload(duration=1, intensity=2, pattern="normal")
-        for event in events:
-            print(f"Simulated event at {event:.2f} sec")
-            time.sleep(0.1)
+    def follow_schedule(self):
+        schedule = _schedule
+        if schedule is None or schedule.next >= len(schedule.arrivals):
+            raise StopUser()
+        if schedule.start is None:
+            schedule.start = time.monotonic()
+        due = schedule.start + schedule.arrivals[schedule.next]
+        schedule.next += 1
+        delay = due - time.monotonic()
+        if delay > 0:
+            gevent.sleep(delay)
+        schedule.lag.record(max(0.0, time.monotonic() - due))
+        gevent.spawn(self.client.get, schedule.path, name=schedule.path)
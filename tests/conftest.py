@@ -3,9 +3,89 @@
 from __future__ import annotations
 
 import sys
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
 
 # Ensure repo root is on path when running tests without editable install.
 _ROOT = Path(__file__).resolve().parents[1]
 if str(_ROOT) not in sys.path:
     sys.path.insert(0, str(_ROOT))
+
+
+@pytest.fixture(autouse=True)
+def fresh_settings() -> Iterator[None]:
+    """Parse settings per test, after its ``monkeypatch.setenv`` calls."""
+    from cloudpilot.config import reset_settings_for_testing
+
+    reset_settings_for_testing()
+    yield
+    reset_settings_for_testing()
+
+
+@pytest.fixture()
+def fake_kube() -> Iterator[MagicMock]:
+    """Install a fake Kubernetes client provider; ``.core_v1()``/``.apps_v1()``."""
+    from cloudpilot.k8s_client import set_kube_clients_for_testing
+
+    provider = MagicMock()
+    set_kube_clients_for_testing(provider)
+    yield provider
+    set_kube_clients_for_testing(None)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    ``/status/<code>``, ``/sleep/<ms>``, ``/close``, ``/empty/<code>`` (no
+    body or length, connection kept open); anything else is 200. ``HEAD``
+    answers with the length of the ``GET`` body but no body.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self) -> None:  # noqa: N802
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+
+    def do_GET(self) -> None:  # noqa: N802
+        parts = self.path.strip("/").split("/")
+        status = 200
+        if parts[0] == "status":
+            status = int(parts[1])
+        elif parts[0] == "sleep":
+            time.sleep(int(parts[1]) / 1000)
+        elif parts[0] == "empty":
+            self.send_response(int(parts[1]))
+            self.end_headers()
+            return
+        body = b"ok"
+        self.send_response(status)
+        if parts[0] == "close":
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(body)
+            self.close_connection = True
+            return
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture()
+def http_stub() -> Iterator[str]:
+    """Base URL of a local HTTP server (see ``_StubHandler``)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
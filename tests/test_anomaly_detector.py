@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
 
+import numpy as np
 import pytest
 from cloudpilot.anomaly_detector import (
+    detect_anomalies,
     detect_anomaly,
     self_heal,
     train_dummy_isolation_forest,
@@ -23,24 +25,40 @@ def test_isolation_forest_training() -> None:
     assert prediction[0] in [-1, 1]
 
 
+def test_detect_anomalies_batch_matches_single() -> None:
+    model = train_dummy_isolation_forest()
+    rng = np.random.default_rng(0)
+    batch = np.vstack([rng.random((20, 4)) * 100, [[500.0, 500.0, 500.0, 500.0]]])
+    mask, scores = detect_anomalies(batch, model=model)
+    assert mask.dtype == bool and mask.shape == (21,)
+    assert scores.shape == (21,)
+    np.testing.assert_array_equal(mask, model.predict(batch) == -1)
+    assert mask[-1]
+    assert [detect_anomaly(row, model=model) for row in batch] == mask.tolist()
+
+
+def test_detect_anomalies_empty_and_bad_shape() -> None:
+    mask, scores = detect_anomalies(np.empty((0, 4)))
+    assert mask.size == 0 and scores.size == 0
+    with pytest.raises(ValueError):
+        detect_anomalies([50.0, 50.0, 70.0, 100.0])
+
+
 def test_self_heal_skipped_without_confirm(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.delenv("CLOUDPILOT_SELF_HEAL_CONFIRM", raising=False)
     result = self_heal("default")
     assert "skipped" in result.lower()
 
 
-def test_self_heal_with_confirm(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_self_heal_with_confirm(
+    monkeypatch: pytest.MonkeyPatch, fake_kube: MagicMock
+) -> None:
     monkeypatch.setenv("CLOUDPILOT_SELF_HEAL_CONFIRM", "1")
-    mock_api = MagicMock()
+    mock_api = fake_kube.core_v1.return_value
     mock_pod = MagicMock()
     mock_pod.status.phase = "Pending"
     mock_pod.metadata.name = "bad-pod"
     mock_api.list_namespaced_pod.return_value = MagicMock(items=[mock_pod])
-    with (
-        patch("cloudpilot.anomaly_detector.config.load_kube_config"),
-        patch("cloudpilot.anomaly_detector.client.CoreV1Api") as mock_cls,
-    ):
-        mock_cls.return_value = mock_api
-        result = self_heal("default")
+    result = self_heal("default")
     assert "Restarted pods" in result or "Error" in result
     mock_api.delete_namespaced_pod.assert_called_once()
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from benchmarks import run as bench
+
+
+def test_compare_flags_regressions_over_threshold() -> None:
+    baseline = {"results": {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}}}
+    current = {
+        "results": {
+            "a": {"median_s": 1.2},
+            "b": {"median_s": 1.5},
+            "new": {"median_s": 9.0},
+        }
+    }
+    rows = bench.compare(current, baseline, threshold=0.3)
+    assert [(name, bad) for name, *_, bad in rows] == [("a", False), ("b", True)]
+
+
+def test_main_writes_json_and_compares(tmp_path: Path) -> None:
+    output = tmp_path / "bench.json"
+    args = ["-k", "streaming_detector", "--min-time", "0.001", "--output", str(output)]
+    assert bench.main(args) == 0
+    report = json.loads(output.read_text())
+    assert report["schema"] == bench.SCHEMA_VERSION
+    (name,) = report["results"]
+    assert report["results"][name]["median_s"] > 0
+
+    slow = {"results": {name: {"median_s": 1e-12}}}
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(slow))
+    assert bench.main([*args, "--compare", str(baseline)]) == 1
+
+
+def test_stored_baseline_covers_every_benchmark() -> None:
+    baseline = json.loads(bench.BASELINE.read_text())
+    assert set(baseline["results"]) | set(baseline["skipped"]) == set(bench._REGISTRY)
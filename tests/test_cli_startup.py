@@ -0,0 +1,104 @@
+"""Startup-cost regression tests for the CLI, based on ``python -X importtime``."""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from cloudpilot.pricing_catalog import PriceCatalog
+
+CLI = Path(__file__).resolve().parents[1] / "cli.py"
+HEAVY = {"boto3", "kubernetes", "numpy", "prometheus_api_client", "sklearn", "torch"}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \|( *)(\S+)")
+
+
+def _profile(args: list[str], env: dict[str, str]) -> tuple[set[str], float]:
+    """Run the CLI and return (top-level packages imported, import time in ms)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(CLI), *args],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **env},
+        cwd=CLI.parent,
+        timeout=120,
+    )
+    lines = proc.stderr.splitlines()
+    # Interpreter startup (site and .pth hooks) is not the CLI's cost.
+    site = next(
+        (i for i, line in enumerate(lines) if line.rstrip().endswith("| site")), -1
+    )
+    modules: set[str] = set()
+    total_us = 0
+    for line in lines[site + 1 :]:
+        match = _LINE.match(line)
+        if match:
+            total_us += int(match.group(1))
+            modules.add(match.group(3).split(".")[0])
+    return modules, total_us / 1000
+
+
+@pytest.fixture(scope="module")
+def cli_env(tmp_path_factory: pytest.TempPathFactory) -> dict[str, str]:
+    catalog = tmp_path_factory.mktemp("pricing") / "prices.npz"
+    PriceCatalog.from_rows(
+        [
+            {
+                "instance_type": "m5.large",
+                "region": "us-east-1",
+                "operating_system": "Linux",
+                "tenancy": "Shared",
+                "arch": "x86_64",
+                "price": 0.096,
+                "vcpu": 2.0,
+                "memory_gib": 8.0,
+                "network_gbps": 10.0,
+            }
+        ]
+    ).save(catalog)
+    return {
+        "CLOUDPILOT_PRICE_CATALOG": str(catalog),
+        "KUBECONFIG": str(catalog.parent / "missing-kubeconfig"),
+    }
+
+
+# (argv, packages that must stay unimported, import-time budget in ms)
+CASES = [
+    (["--version"], HEAVY, 100),
+    (["--help"], HEAVY, 100),
+    (["cost", "--help"], HEAVY, 100),
+    (
+        ["scale", "--cpu", "80", "--mem", "70", "--req", "0.8", "--latency", "100"]
+        + ["--demand", "0.9"],
+        {"boto3", "kubernetes", "prometheus_api_client", "sklearn"},
+        8000,
+    ),
+    (
+        ["cost", "--instance-type", "m5.large"],
+        {"kubernetes", "prometheus_api_client", "sklearn", "torch"},
+        1500,
+    ),
+    (
+        ["tune", "--deployment", "web"],
+        {"boto3", "prometheus_api_client", "sklearn", "torch"},
+        2500,
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    ("args", "forbidden", "budget_ms"), CASES, ids=lambda v: str(v)[:40]
+)
+def test_cli_startup_budget(
+    args: list[str],
+    forbidden: set[str],
+    budget_ms: float,
+    cli_env: dict[str, str],
+) -> None:
+    modules, import_ms = _profile(args, cli_env)
+    assert not (modules & forbidden), f"unexpected imports: {modules & forbidden}"
+    assert import_ms < budget_ms, f"{args[0]} imports took {import_ms:.0f} ms"
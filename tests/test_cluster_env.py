@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from cloudpilot.cluster_env import ClusterEnv, evaluate, threshold_policy
+from cloudpilot.scaling import MAINTAIN
+
+
+def test_step_shapes_and_ranges():
+    env = ClusterEnv(n_envs=64, seed=0)
+    assert env.obs.shape == (64, 5) and env.obs.dtype == np.float32
+    next_obs, rewards, reset = env.step(np.full(64, MAINTAIN))
+    assert next_obs.shape == (64, 5)
+    assert rewards.shape == (64,) and np.all(rewards < 0)
+    assert not reset.any()
+    assert np.all((next_obs[:, :2] >= 0) & (next_obs[:, :2] <= 100))
+    assert np.all((next_obs[:, 4] >= 0) & (next_obs[:, 4] <= 1))
+
+
+def test_actions_move_replicas_within_bounds():
+    env = ClusterEnv(n_envs=8, min_replicas=2, max_replicas=4, seed=1)
+    for _ in range(5):
+        env.step(np.full(8, MAINTAIN + 1))
+    assert np.all(env.replicas == 4)
+    for _ in range(5):
+        env.step(np.full(8, MAINTAIN - 1))
+    assert np.all(env.replicas == 2)
+
+
+def test_overload_breaks_slo_and_costs_reward():
+    env = ClusterEnv(n_envs=256, max_replicas=10, seed=2)
+    env.mean_rate[:] = 900.0
+    env.replicas[:] = 1
+    next_obs, rewards, _ = env.step(np.full(256, MAINTAIN))
+    assert np.all(next_obs[:, 0] == 100.0)
+    assert np.all(next_obs[:, 3] > env.slo_ms)
+    assert np.all(rewards <= -env.slo_weight)
+
+
+def test_episodes_reset_automatically():
+    env = ClusterEnv(n_envs=4, episode_steps=3, seed=3)
+    resets = [env.step(np.full(4, MAINTAIN))[2] for _ in range(3)]
+    assert not resets[0].any() and resets[2].all()
+    assert np.all(env.steps == 0)
+
+
+def test_seeded_envs_are_reproducible_and_threshold_policy_runs():
+    a, b = ClusterEnv(n_envs=16, seed=4), ClusterEnv(n_envs=16, seed=4)
+    np.testing.assert_array_equal(a.obs, b.obs)
+    stats = evaluate(threshold_policy, ClusterEnv(n_envs=32, seed=5), steps=50)
+    assert set(stats) == {"reward", "slo_violation_rate", "mean_replicas"}
+    assert 1 <= stats["mean_replicas"] <= 20
+
+
+def test_bad_arguments():
+    with pytest.raises(ValueError):
+        ClusterEnv(n_envs=4, min_replicas=5, max_replicas=2)
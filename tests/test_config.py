@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import os
+import signal
+import time
+from pathlib import Path
+
+import pytest
+from cloudpilot.config import (
+    get_settings,
+    install_reload_signal,
+    load_settings,
+    reload_settings,
+)
+
+
+@pytest.fixture()
+def config_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cloudpilot.yaml"
+    path.write_text(
+        "monitor_max_workers: 32\n"
+        "heal_max_pods: 10\n"
+        "self_heal_confirm: true\n"
+        "scale_cache_quantum: [2, 2, 0.1, 5, 0.1]\n"
+        "namespaces:\n"
+        "  payments:\n"
+        "    self_heal_confirm: false\n"
+        "    heal_max_pods: 2\n"
+    )
+    monkeypatch.setenv("CLOUDPILOT_CONFIG", str(path))
+    return path
+
+
+def _touch_later(path: Path) -> None:
+    later = time.time() + 10
+    os.utime(path, (later, later))
+
+
+def test_file_values_and_env_precedence(
+    config_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_HEAL_MAX_PODS", "7")
+    settings = load_settings()
+    assert settings.monitor_max_workers == 32
+    assert settings.heal_max_pods == 7
+    assert settings.self_heal_confirm
+    assert settings.scale_cache_quantum == (2.0, 2.0, 0.1, 5.0, 0.1)
+
+
+def test_namespace_overrides(config_file: Path) -> None:
+    settings = load_settings()
+    payments = settings.for_namespace("payments")
+    assert not payments.self_heal_confirm
+    assert payments.heal_max_pods == 2
+    assert payments.monitor_max_workers == 32
+    assert settings.for_namespace("shop") is settings
+    assert settings.for_namespace(None) is settings
+
+
+def test_unknown_keys_are_rejected(config_file: Path) -> None:
+    config_file.write_text("namespaces:\n  shop:\n    heal_max_pod: 3\n")
+    with pytest.raises(ValueError, match="heal_max_pod"):
+        load_settings()
+
+
+def test_snapshot_ignores_env_until_reload(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CLOUDPILOT_TUNE_MAX_PARALLEL", "3")
+    first = get_settings()
+    monkeypatch.setenv("CLOUDPILOT_TUNE_MAX_PARALLEL", "4")
+    assert get_settings() is first
+    assert reload_settings().tune_max_parallel == 4
+    assert get_settings().tune_max_parallel == 4
+
+
+def test_file_change_reloads(
+    config_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_CONFIG_CHECK_INTERVAL", "1")
+    assert get_settings().heal_max_pods == 10
+    config_file.write_text("heal_max_pods: 4\n")
+    _touch_later(config_file)
+    assert get_settings().heal_max_pods == 10  # not checked again yet
+    monkeypatch.setattr(time, "monotonic", lambda: float("inf"))
+    assert get_settings().heal_max_pods == 4
+
+
+def test_invalid_reload_keeps_previous(
+    config_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    previous = get_settings()
+    config_file.write_text("heal_max_pods: zero\n")
+    _touch_later(config_file)
+    monkeypatch.setattr(time, "monotonic", lambda: float("inf"))
+    assert get_settings() is previous
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="needs SIGHUP")
+def test_sighup_requests_reload(monkeypatch: pytest.MonkeyPatch) -> None:
+    original = signal.getsignal(signal.SIGHUP)
+    try:
+        assert install_reload_signal()
+        monkeypatch.setenv("CLOUDPILOT_HEAL_DELETE_RATE", "1")
+        assert get_settings().heal_delete_rate == 1
+        monkeypatch.setenv("CLOUDPILOT_HEAL_DELETE_RATE", "9")
+        os.kill(os.getpid(), signal.SIGHUP)
+        assert get_settings().heal_delete_rate == 9
+    finally:
+        signal.signal(signal.SIGHUP, original)
+
+
+def test_metrics_port_zero_means_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CLOUDPILOT_METRICS_PORT", "0")
+    assert load_settings().metrics_port == 0
+    monkeypatch.setenv("CLOUDPILOT_METRICS_PORT", "70000")
+    with pytest.raises(ValueError, match="CLOUDPILOT_METRICS_PORT"):
+        load_settings()
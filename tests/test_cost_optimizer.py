@@ -1,8 +1,98 @@
 from __future__ import annotations
 
+import json
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-from cloudpilot.cost_optimizer import get_aws_cost_optimization
+import numpy as np
+import pytest
+from cloudpilot.config import reload_settings
+from cloudpilot.cost_optimizer import (
+    get_aws_cost_optimization,
+    recommend_fleet,
+    recommend_instances,
+    reset_pricing_cache_for_testing,
+)
+from cloudpilot.pricing_catalog import (
+    PriceCatalog,
+    get_price_catalog,
+    main,
+    reset_price_catalog_for_testing,
+)
+
+# (instance type, vCPU, memory, hourly USD, processor, network)
+SHAPES = [
+    ("m5.large", "2", "8 GiB", "0.096", "Intel Xeon 8175", "Up to 10 Gigabit"),
+    ("m5.xlarge", "4", "16 GiB", "0.192", "Intel Xeon 8175", "Up to 10 Gigabit"),
+    ("t3.medium", "2", "4 GiB", "0.0416", "Intel Skylake", "Up to 5 Gigabit"),
+    ("m6g.large", "2", "8 GiB", "0.077", "AWS Graviton2 Processor", "Up to 10 Gigabit"),
+    ("c5.large", "2", "4 GiB", "0.085", "Intel Xeon 8124M", "Up to 10 Gigabit"),
+]
+
+
+def make_offer(shapes=SHAPES, region="us-east-1") -> dict:
+    products: dict = {}
+    on_demand: dict = {}
+    for i, (itype, vcpu, mem, price, cpu, net) in enumerate(shapes):
+        sku = f"SKU{i}"
+        products[sku] = {
+            "sku": sku,
+            "productFamily": "Compute Instance",
+            "attributes": {
+                "instanceType": itype,
+                "location": "US East (N. Virginia)",
+                "regionCode": region,
+                "vcpu": vcpu,
+                "memory": mem,
+                "physicalProcessor": cpu,
+                "networkPerformance": net,
+                "operatingSystem": "Linux",
+                "tenancy": "Shared",
+                "preInstalledSw": "NA",
+                "capacitystatus": "Used",
+            },
+        }
+        on_demand[sku] = {
+            f"{sku}.JRTCKXETXF": {
+                "priceDimensions": {
+                    f"{sku}.JRTCKXETXF.6YS6EN2CT7": {
+                        "unit": "Hrs",
+                        "pricePerUnit": {"USD": price},
+                    }
+                }
+            }
+        }
+    # Rows that must be filtered out.
+    products["RESERVED"] = {
+        "productFamily": "Compute Instance",
+        "attributes": {**products["SKU0"]["attributes"], "capacitystatus": "Unused"},
+    }
+    on_demand["RESERVED"] = on_demand["SKU0"]
+    products["EBS"] = {"productFamily": "Storage", "attributes": {}}
+    return {"products": products, "terms": {"OnDemand": on_demand}}
+
+
+def price_list_entry(offer: dict, sku: str) -> str:
+    return json.dumps(
+        {
+            "product": offer["products"][sku],
+            "terms": {"OnDemand": offer["terms"]["OnDemand"][sku]},
+        }
+    )
+
+
+@pytest.fixture(autouse=True)
+def isolated_pricing(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    catalog_path = tmp_path / "prices.npz"
+    monkeypatch.setenv("CLOUDPILOT_PRICE_CATALOG", str(catalog_path))
+    reset_pricing_cache_for_testing()
+    reset_price_catalog_for_testing()
+    yield catalog_path
+    reset_pricing_cache_for_testing()
+    reset_price_catalog_for_testing()
 
 
 @patch("cloudpilot.cost_optimizer.boto3.client")
@@ -20,3 +110,142 @@ def test_get_aws_cost_optimization_api_error(mock_client: MagicMock) -> None:
     mock_client.return_value.get_products.side_effect = RuntimeError("network")
     result = get_aws_cost_optimization("m5.large")
     assert "Error retrieving pricing data" in result
+
+
+@patch("cloudpilot.cost_optimizer.boto3.client")
+def test_api_price_is_parsed_and_memoized(mock_client: MagicMock) -> None:
+    price_list = [price_list_entry(make_offer(), "SKU0")]
+    mock_client.return_value.get_products.return_value = {"PriceList": price_list}
+    for _ in range(3):
+        assert "$0.0960/hour" in get_aws_cost_optimization("m5.large")
+    mock_client.assert_called_once()
+    mock_client.return_value.get_products.assert_called_once()
+
+
+@patch("cloudpilot.cost_optimizer.boto3.client")
+def test_catalog_answers_without_api(
+    mock_client: MagicMock, isolated_pricing: Path
+) -> None:
+    PriceCatalog.from_offer(make_offer()).save(isolated_pricing)
+    result = get_aws_cost_optimization("t3.medium")
+    assert "$0.0416/hour" in result
+    mock_client.assert_not_called()
+
+
+def test_catalog_index_and_roundtrip(tmp_path: Path) -> None:
+    catalog = PriceCatalog.from_offer(make_offer())
+    assert len(catalog) == len(SHAPES)
+    entry = catalog.lookup("m6g.large")
+    assert entry is not None
+    assert entry.arch == "arm64"
+    assert entry.vcpu == 2 and entry.memory_gib == 8
+    assert entry.network_gbps == 10
+    assert catalog.lookup("m5.large", region="eu-west-1") is None
+    assert catalog.lookup("m5.large", operating_system="Windows") is None
+
+    path = tmp_path / "catalog.npz"
+    catalog.save(path)
+    loaded = PriceCatalog.load(path)
+    assert loaded.lookup("m6g.large") == entry
+    assert loaded.created_at == catalog.created_at
+
+
+def test_catalog_ttl(isolated_pricing: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    PriceCatalog.from_offer(make_offer()).save(isolated_pricing)
+    assert get_price_catalog() is not None
+    stale = PriceCatalog.from_offer(make_offer())
+    stale.created_at = time.time() - 3600
+    stale.save(isolated_pricing)
+    os.utime(isolated_pricing, (time.time() + 5, time.time() + 5))
+    monkeypatch.setenv("CLOUDPILOT_PRICE_CATALOG_TTL", "60")
+    reload_settings()
+    assert get_price_catalog() is None
+
+
+def test_import_cli_accepts_price_list_dump(tmp_path: Path) -> None:
+    offer = make_offer()
+    dump = {"PriceList": [price_list_entry(offer, sku) for sku in ("SKU1", "SKU2")]}
+    source = tmp_path / "dump.json"
+    source.write_text(json.dumps(dump))
+    output = tmp_path / "out.npz"
+    main([str(source), "--output", str(output)])
+    loaded = PriceCatalog.load(output)
+    assert len(loaded) == 2
+    assert loaded.price("m5.xlarge") == pytest.approx(0.192)
+
+
+def test_recommend_instances_ranks_cheaper_fits() -> None:
+    catalog = PriceCatalog.from_offer(make_offer())
+    # No utilization given: nothing cheaper keeps 4 vCPU / 16 GiB on x86.
+    assert recommend_instances("m5.xlarge", catalog=catalog) == []
+    # Half-loaded m5.xlarge fits on 2 vCPU x86 types with >= 10 Gbps.
+    picks = recommend_instances("m5.xlarge", 40, 40, catalog=catalog)
+    assert [p.instance_type for p in picks] == ["m5.large"]
+    # Light load on m5.large: c5.large fits; t3 lacks network, m6g is arm.
+    picks = recommend_instances("m5.large", 30, 30, catalog=catalog)
+    assert [p.instance_type for p in picks] == ["c5.large"]
+    assert picks[0].savings_pct == pytest.approx(100 * (0.096 - 0.085) / 0.096)
+
+
+def test_unknown_utilization_keeps_current_amount_without_headroom() -> None:
+    r5 = ("r5.large", "2", "16 GiB", "0.126", "Intel Xeon 8175", "Up to 10 Gigabit")
+    catalog = PriceCatalog.from_offer(make_offer([*SHAPES, r5]))
+    # Memory was not observed: r5.large matches m5.xlarge's 16 GiB exactly.
+    picks = recommend_instances("m5.xlarge", 40, None, catalog=catalog)
+    assert [p.instance_type for p in picks] == ["r5.large"]
+    # Observed 100% memory still gets headroom, which r5.large lacks.
+    assert recommend_instances("m5.xlarge", 40, 100, catalog=catalog) == []
+    picks = recommend_instances("m5.xlarge", None, 40, catalog=catalog)
+    assert picks == []
+
+
+def test_recommend_instances_defaults_keep_current_shape() -> None:
+    m5a = ("m5a.xlarge", "4", "16 GiB", "0.172", "AMD EPYC 7571", "Up to 10 Gigabit")
+    catalog = PriceCatalog.from_offer(make_offer([*SHAPES, m5a]))
+    # A same-size type still qualifies when no utilization was observed.
+    picks = recommend_instances("m5.xlarge", catalog=catalog)
+    assert [p.instance_type for p in picks] == ["m5a.xlarge"]
+
+
+def test_cost_summary_with_one_utilization(isolated_pricing: Path) -> None:
+    r5 = ("r5.large", "2", "16 GiB", "0.126", "Intel Xeon 8175", "Up to 10 Gigabit")
+    PriceCatalog.from_offer(make_offer([*SHAPES, r5])).save(isolated_pricing)
+    result = get_aws_cost_optimization("m5.xlarge", cpu_util=40)
+    assert "Cheaper fits: r5.large at $0.1260/hour" in result
+
+
+def test_recommend_fleet_matches_single_and_handles_unknown() -> None:
+    catalog = PriceCatalog.from_offer(make_offer())
+    fleet = [("m5.xlarge", 40, 40), ("unknown.type", 10, 10), ("m5.large", 30, 30)]
+    results = recommend_fleet(fleet, catalog=catalog, chunk_size=2)
+    assert results[1] == []
+    assert results[0] == recommend_instances("m5.xlarge", 40, 40, catalog=catalog)
+    assert results[2] == recommend_instances("m5.large", 30, 30, catalog=catalog)
+
+
+def test_recommend_fleet_is_fast_for_large_fleets() -> None:
+    rng = np.random.default_rng(0)
+    shapes = [
+        (
+            f"x{i}.large",
+            str(int(rng.integers(1, 96))),
+            f"{int(rng.integers(1, 768))} GiB",
+            f"{rng.uniform(0.01, 10):.4f}",
+            "Intel Xeon",
+            "25 Gigabit",
+        )
+        for i in range(800)
+    ]
+    catalog = PriceCatalog.from_offer(make_offer(shapes))
+    fleet = [(f"x{i % 800}.large", 30.0, 30.0) for i in range(10_000)]
+    started = time.perf_counter()
+    results = recommend_fleet(fleet, catalog=catalog)
+    assert time.perf_counter() - started < 1.0
+    assert len(results) == 10_000
+
+
+def test_cost_summary_lists_alternatives(isolated_pricing: Path) -> None:
+    PriceCatalog.from_offer(make_offer()).save(isolated_pricing)
+    result = get_aws_cost_optimization("m5.large", cpu_util=30, mem_util=30)
+    assert "Cheaper fits: c5.large at $0.0850/hour" in result
+    assert "No cheaper" in get_aws_cost_optimization("c5.large")
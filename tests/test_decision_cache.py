@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from unittest.mock import MagicMock
+
+import pytest
+from cloudpilot import instrumentation as inst
+from cloudpilot.anomaly_detector import detect_anomaly, train_dummy_isolation_forest
+from cloudpilot.config import reload_settings
+from cloudpilot.decision_cache import (
+    DecisionCache,
+    get_decision_cache,
+    reset_decision_caches_for_testing,
+)
+from cloudpilot.scaling import get_rl_scaler, recommend_scaling
+from cloudpilot.streaming_detector import StreamingDetector
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def enabled(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.setenv("CLOUDPILOT_DECISION_CACHE", "1")
+    reset_decision_caches_for_testing()
+    yield
+    reset_decision_caches_for_testing()
+
+
+def test_quantized_states_share_a_decision() -> None:
+    cache = DecisionCache(quantum=(1.0, 0.1, 0.0))
+    compute = MagicMock(side_effect=["a", "b", "c"])
+    model = object()
+    assert cache.get([50.2, 0.31, 7.0], model, compute) == "a"
+    assert cache.get([49.9, 0.29, 7.0], model, compute) == "a"
+    assert cache.get([50.2, 0.31, 7.001], model, compute) == "b"
+    assert cache.get([51.0, 0.31, 7.0], model, compute) == "c"
+    assert cache.stats() == {
+        "size": 3,
+        "hits": 1,
+        "misses": 3,
+        "evictions": 0,
+        "invalidations": 0,
+    }
+
+
+def test_lru_eviction_and_ttl() -> None:
+    clock = _Clock()
+    cache = DecisionCache(max_size=2, ttl=10.0, clock=clock)
+    model = object()
+    cache.get([1.0], model, lambda: 1)
+    cache.get([2.0], model, lambda: 2)
+    assert cache.get([1.0], model, lambda: -1) == 1  # 2 is now least recent
+    cache.get([3.0], model, lambda: 3)
+    assert cache.evictions == 1
+    assert cache.get([2.0], model, lambda: 22) == 22
+
+    clock.now = 10.0
+    assert cache.get([3.0], model, lambda: 33) == 33
+    assert len(cache) == 2
+
+
+def test_model_replacement_invalidates() -> None:
+    cache = DecisionCache()
+    old, new = object(), object()
+    cache.get([1.0], old, lambda: "old")
+    assert cache.get([1.0], old, lambda: "?") == "old"
+    assert cache.get([1.0], new, lambda: "new") == "new"
+    assert cache.invalidations == 1
+    assert len(cache) == 1
+
+
+def test_state_width_mismatch_skips_cache() -> None:
+    cache = DecisionCache(quantum=(1.0, 1.0))
+    compute = MagicMock(return_value="x")
+    assert cache.get([1.0, 2.0, 3.0], object(), compute) == "x"
+    assert compute.call_count == 1
+    assert len(cache) == 0
+
+
+def test_mismatched_quantum_disables_cache(
+    enabled: None, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_SCALE_CACHE_QUANTUM", "1,1")
+    assert get_decision_cache("scale") is None
+    assert "quantum has 2 steps" in caplog.text
+    assert recommend_scaling(80.0, 70.0, 0.8, 100.0, 0.9).startswith("RL-based")
+
+
+def test_settings_reload_rebuilds_cache(
+    enabled: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first = get_decision_cache("scale")
+    assert first is not None and first.max_size == 4096
+    assert get_decision_cache("scale") is first
+    monkeypatch.setenv("CLOUDPILOT_DECISION_CACHE_SIZE", "8")
+    reload_settings()
+    second = get_decision_cache("scale")
+    assert second is not None and second.max_size == 8
+
+
+def test_disabled_by_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("CLOUDPILOT_DECISION_CACHE", raising=False)
+    reset_decision_caches_for_testing()
+    assert get_decision_cache("scale") is None
+
+
+def test_recommend_scaling_uses_cache(
+    enabled: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    scaler = get_rl_scaler()
+    calls = MagicMock(wraps=scaler.get_action)
+    monkeypatch.setattr(scaler, "get_action", calls)
+    first = recommend_scaling(80.0, 70.0, 0.8, 100.0, 0.9)
+    assert recommend_scaling(80.2, 70.1, 0.801, 100.3, 0.9) == first
+    assert calls.call_count == 1
+    cache = get_decision_cache("scale")
+    assert cache is not None and cache.hits == 1
+
+
+def test_detect_anomaly_uses_cache(enabled: None) -> None:
+    inst.enable()
+    try:
+        model = train_dummy_isolation_forest()
+        verdict = detect_anomaly([50.0, 50.0, 70.0, 100.0], model=model)
+        assert detect_anomaly([50.3, 50.0, 70.0, 100.0], model=model) == verdict
+        assert inst.DECISION_CACHE.value("anomaly", "hit") == 1
+        detect_anomaly([50.0, 50.0, 70.0, 100.0], model=train_dummy_isolation_forest())
+        assert inst.DECISION_CACHE.value("anomaly", "invalidation") == 1
+    finally:
+        inst.reset_instrumentation_for_testing()
+
+
+def test_streaming_detector_bypasses_cache(enabled: None) -> None:
+    detector = StreamingDetector(warmup=1)
+    for _ in range(3):
+        detect_anomaly([50.0, 50.0, 70.0, 100.0], model=detector)
+    cache = get_decision_cache("anomaly")
+    assert cache is not None and cache.misses == 0
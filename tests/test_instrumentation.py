@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from unittest.mock import MagicMock
+
+import pytest
+from cloudpilot import instrumentation as inst
+from cloudpilot.anomaly_detector import detect_anomalies, train_dummy_isolation_forest
+from cloudpilot.k8s_client import note_api_error
+from cloudpilot.monitor import MultiNamespaceMonitor
+
+
+@pytest.fixture(autouse=True)
+def clean() -> Iterator[None]:
+    inst.reset_instrumentation_for_testing()
+    yield
+    inst.reset_instrumentation_for_testing()
+
+
+def test_disabled_records_nothing() -> None:
+    assert inst.timed("x") is inst.timed("y")
+    with inst.timed("x"):
+        pass
+    inst.record_cycle("loop", 5.0, 1.0)
+    inst.record_api_error("aws")
+    assert inst.STAGE_SECONDS.count("x") == 0
+    assert inst.CYCLE_OVERRUNS.value("loop") == 0
+    assert "cloudpilot_stage_duration_seconds_bucket" not in inst.render()
+
+
+def test_histogram_and_counter_rendering() -> None:
+    inst.enable()
+    inst.STAGE_SECONDS.observe(0.003, "prometheus_query")
+    inst.STAGE_SECONDS.observe(2.0, "prometheus_query")
+    inst.record_cycle("monitor", 12.0, 10.0)
+    inst.record_cycle("monitor", 1.0, 10.0)
+    inst.record_api_error('we"ird')
+    text = inst.render()
+    bucket = 'cloudpilot_stage_duration_seconds_bucket{stage="prometheus_query",le='
+    assert f'{bucket}"0.001"}} 0' in text
+    assert f'{bucket}"0.005"}} 1' in text
+    assert f'{bucket}"+Inf"}} 2' in text
+    stage = '{stage="prometheus_query"}'
+    assert f"cloudpilot_stage_duration_seconds_sum{stage} 2.003" in text
+    assert 'cloudpilot_cycle_overruns_total{loop="monitor"} 1.0' in text
+    assert 'cloudpilot_cycle_duration_seconds_count{loop="monitor"} 2' in text
+    assert 'cloudpilot_api_errors_total{api="we\\"ird"} 1.0' in text
+
+
+def test_stages_and_api_errors_are_recorded(fake_kube: MagicMock) -> None:
+    inst.enable()
+    detect_anomalies([[50.0, 50.0, 70.0, 100.0]], model=train_dummy_isolation_forest())
+    note_api_error(RuntimeError("boom"))
+    assert inst.STAGE_SECONDS.count("anomaly_inference") == 1
+    assert inst.API_ERRORS.value("kubernetes") == 1
+
+
+def test_monitor_run_records_cycles_and_overruns() -> None:
+    inst.enable()
+    stop = threading.Event()
+
+    def fetch(ns: str) -> list[float]:
+        time.sleep(0.03)
+        stop.set()
+        return [50.0, 50.0, 50.0, 50.0]
+
+    with MultiNamespaceMonitor(
+        ["a"],
+        check_interval=0.01,
+        fetch_timeout=1.0,
+        fetch=fetch,
+        heal=lambda ns: "ok",
+        model=train_dummy_isolation_forest(),
+    ) as monitor:
+        monitor.run(stop)
+    assert inst.CYCLE_SECONDS.count("monitor") == 1
+    assert inst.CYCLE_OVERRUNS.value("monitor") == 1
+
+
+def test_metrics_server_serves_exposition() -> None:
+    server = inst.start_metrics_server(0, "127.0.0.1")
+    assert inst.enabled()
+    assert inst.start_metrics_server(0, "127.0.0.1") is server
+    inst.record_api_error("prometheus")
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+        body = response.read().decode()
+        assert response.headers["Content-Type"].startswith("text/plain")
+    assert 'cloudpilot_api_errors_total{api="prometheus"} 1.0' in body
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(f"{base}/other", timeout=5)
+
+
+def test_server_from_settings_is_opt_in(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("CLOUDPILOT_METRICS_PORT", raising=False)
+    assert inst.start_metrics_server_from_settings() is None
+    assert not inst.enabled()
+
+
+def test_server_from_settings_binds_loopback_by_default(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    monkeypatch.setenv("CLOUDPILOT_METRICS_PORT", str(port))
+    monkeypatch.delenv("CLOUDPILOT_METRICS_ADDR", raising=False)
+    server = inst.start_metrics_server_from_settings()
+    assert server is not None
+    assert server.server_address == ("127.0.0.1", port)
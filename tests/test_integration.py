@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 from cloudpilot.cost_optimizer import get_aws_cost_optimization
 from cloudpilot.k8s_autotuner import tune_and_monitor
@@ -9,7 +10,7 @@ from cloudpilot.scaling import recommend_scaling
 
 
 @patch("cloudpilot.k8s_autotuner.self_heal")
-@patch("cloudpilot.k8s_autotuner.detect_anomaly")
+@patch("cloudpilot.k8s_autotuner.detect_anomalies")
 @patch("cloudpilot.k8s_autotuner.get_prometheus_metrics")
 @patch("cloudpilot.k8s_autotuner.tune_deployment")
 @patch("cloudpilot.cost_optimizer.boto3.client")
@@ -23,7 +24,7 @@ def test_full_workflow_scaling_cost_and_tuning(
     mock_boto_client.return_value.get_products.return_value = {}
     mock_tune.return_value = "ok"
     mock_metrics.return_value = [50.0, 50.0, 70.0, 100.0]
-    mock_detect.return_value = False
+    mock_detect.return_value = (np.array([False]), np.array([0.1]))
 
     scaling_output = recommend_scaling(80.0, 70.0, 0.8, 100.0, 0.9)
     assert isinstance(scaling_output, str)
@@ -2,16 +2,20 @@ from __future__ import annotations
 
 from unittest.mock import MagicMock, patch
 
-from cloudpilot.k8s_autotuner import tune_and_monitor, tune_deployment
+import numpy as np
+import pytest
+from cloudpilot.k8s_autotuner import (
+    build_cpu_patch,
+    format_tune_report,
+    tune_and_monitor,
+    tune_deployment,
+    tune_namespace,
+)
+from kubernetes import client
 
 
-@patch("cloudpilot.k8s_autotuner.client.AppsV1Api")
-@patch("cloudpilot.k8s_autotuner.config.load_kube_config")
-def test_tune_deployment_invalid(
-    mock_load_config: MagicMock, mock_api_cls: MagicMock
-) -> None:
-    mock_api = MagicMock()
-    mock_api_cls.return_value = mock_api
+def test_tune_deployment_invalid(fake_kube: MagicMock) -> None:
+    mock_api = fake_kube.apps_v1.return_value
     mock_api.read_namespaced_deployment.side_effect = Exception("not found")
     result = tune_deployment("nonexistent-deployment", namespace="default")
     assert isinstance(result, str)
@@ -19,7 +23,7 @@ def test_tune_deployment_invalid(
 
 
 @patch("cloudpilot.k8s_autotuner.self_heal")
-@patch("cloudpilot.k8s_autotuner.detect_anomaly")
+@patch("cloudpilot.k8s_autotuner.detect_anomalies")
 @patch("cloudpilot.k8s_autotuner.get_prometheus_metrics")
 @patch("cloudpilot.k8s_autotuner.tune_deployment")
 def test_tune_and_monitor_no_anomaly(
@@ -30,7 +34,143 @@ def test_tune_and_monitor_no_anomaly(
 ) -> None:
     mock_tune.return_value = "Deployment tuned successfully."
     mock_metrics.return_value = [50.0, 50.0, 70.0, 100.0]
-    mock_detect.return_value = False
-    result = tune_and_monitor("my-deployment", namespace="default")
+    mock_detect.return_value = (np.array([False]), np.array([0.1]))
+    result = tune_and_monitor("my-deployment", namespace="shop")
     assert "No anomalies detected" in result
+    mock_metrics.assert_called_once_with(namespace="shop")
+    assert mock_detect.call_args.kwargs["series"] == ["shop"]
     mock_heal.assert_not_called()
+
+
+def make_deployment(name: str, *containers: tuple[str, str | None, str | None]):
+    return client.V1Deployment(
+        metadata=client.V1ObjectMeta(name=name),
+        spec=client.V1DeploymentSpec(
+            selector=client.V1LabelSelector(match_labels={"app": name}),
+            template=client.V1PodTemplateSpec(
+                spec=client.V1PodSpec(
+                    containers=[
+                        client.V1Container(
+                            name=cname,
+                            resources=client.V1ResourceRequirements(
+                                limits={"cpu": limit} if limit else None,
+                                requests={"cpu": request} if request else None,
+                            ),
+                        )
+                        for cname, limit, request in containers
+                    ]
+                )
+            ),
+        ),
+    )
+
+
+def test_build_cpu_patch_only_touches_cpu_fields() -> None:
+    deployment = make_deployment(
+        "web",
+        ("app", "1000m", "1000m"),
+        ("sidecar", "200m", None),
+        ("bare", None, None),
+    )
+    patch, changes = build_cpu_patch(deployment)
+    assert patch == {
+        "spec": {
+            "template": {
+                "spec": {
+                    "containers": [
+                        {
+                            "name": "app",
+                            "resources": {
+                                "limits": {"cpu": "900m"},
+                                "requests": {"cpu": "900m"},
+                            },
+                        }
+                    ]
+                }
+            }
+        }
+    }
+    assert changes == ["app: 1000m -> 900m"]
+    assert build_cpu_patch(make_deployment("idle", ("app", "500m", None))) == (
+        None,
+        [],
+    )
+
+
+def test_tune_namespace_lists_once_and_patches_concurrently(
+    fake_kube: MagicMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv("CLOUDPILOT_K8S_DRY_RUN", raising=False)
+    mock_api = fake_kube.apps_v1.return_value
+    mock_api.list_namespaced_deployment.return_value = MagicMock(
+        items=[
+            make_deployment("a", ("app", "800m", None)),
+            make_deployment("b", ("app", "100m", None)),
+            make_deployment("c", ("app", "2000m", "1000m")),
+        ]
+    )
+
+    def fake_patch(name, namespace, body, **kwargs):
+        if name == "c":
+            raise RuntimeError("conflict")
+
+    mock_api.patch_namespaced_deployment.side_effect = fake_patch
+    results = tune_namespace("shop", label_selector="tier=web", max_parallel=2)
+
+    mock_api.list_namespaced_deployment.assert_called_once_with(
+        "shop", label_selector="tier=web"
+    )
+    mock_api.read_namespaced_deployment.assert_not_called()
+    assert [(r.deployment, r.status) for r in results] == [
+        ("a", "patched"),
+        ("b", "unchanged"),
+        ("c", "error"),
+    ]
+    assert results[2].error == "conflict"
+    assert mock_api.patch_namespaced_deployment.call_count == 2
+    report = format_tune_report(results)
+    assert "a: patched (app: 800m -> 720m)" in report
+    assert report.endswith("3 deployments: 1 error, 1 patched, 1 unchanged")
+
+
+def test_tune_namespace_dry_run(
+    fake_kube: MagicMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_K8S_DRY_RUN", "1")
+    mock_api = fake_kube.apps_v1.return_value
+    mock_api.list_namespaced_deployment.return_value = MagicMock(
+        items=[make_deployment("a", ("app", "800m", None))]
+    )
+    results = tune_namespace("shop")
+    assert results[0].status == "dry_run"
+    mock_api.patch_namespaced_deployment.assert_not_called()
+
+
+def test_patches_are_sent_as_strategic_merge(
+    fake_kube: MagicMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv("CLOUDPILOT_K8S_DRY_RUN", raising=False)
+    api_client = client.ApiClient(client.Configuration())
+    apps_v1 = client.AppsV1Api(api_client)
+    fake_kube.apps_v1.return_value = apps_v1
+    deployment = make_deployment("web", ("app", "800m", None))
+    sent: list[str] = []
+
+    def call_api(*args, **kwargs):
+        # Header params are positional or keyword depending on client version.
+        headers = kwargs.get("header_params") or next(
+            a for a in args if isinstance(a, dict) and "Content-Type" in a
+        )
+        sent.append(headers["Content-Type"])
+        raise RuntimeError("request captured")
+
+    monkeypatch.setattr(api_client, "call_api", call_api)
+    monkeypatch.setattr(
+        apps_v1,
+        "list_namespaced_deployment",
+        lambda *a, **k: MagicMock(items=[deployment]),
+    )
+    monkeypatch.setattr(apps_v1, "read_namespaced_deployment", lambda *a: deployment)
+    assert tune_namespace("shop")[0].error == "request captured"
+    assert tune_deployment("web", "shop").endswith("request captured")
+    assert sent == ["application/strategic-merge-patch+json"] * 2
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from cloudpilot import k8s_client
+from cloudpilot.config import reload_settings
+from cloudpilot.k8s_client import (
+    KubeClientProvider,
+    get_kube_clients,
+    note_api_error,
+    set_kube_clients_for_testing,
+)
+from kubernetes import client
+
+
+@patch("cloudpilot.k8s_client.config.load_kube_config")
+def test_provider_loads_config_once_and_shares_pool(
+    mock_load: MagicMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv("KUBERNETES_SERVICE_HOST", raising=False)
+    provider = KubeClientProvider(pool_size=7, ttl=3600)
+    core = provider.core_v1()
+    apps = provider.apps_v1()
+    assert provider.core_v1() is core
+    assert core.api_client is apps.api_client
+    assert core.api_client.configuration.connection_pool_maxsize == 7
+    mock_load.assert_called_once()
+
+
+@patch("cloudpilot.k8s_client.config.load_incluster_config")
+def test_provider_prefers_in_cluster_config(
+    mock_incluster: MagicMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("KUBERNETES_SERVICE_HOST", "10.0.0.1")
+    KubeClientProvider().core_v1()
+    mock_incluster.assert_called_once()
+
+
+@patch("cloudpilot.k8s_client.config.load_kube_config")
+def test_provider_reloads_after_ttl_and_invalidate(
+    mock_load: MagicMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv("KUBERNETES_SERVICE_HOST", raising=False)
+    provider = KubeClientProvider(ttl=3600)
+    first = provider.core_v1()
+    provider.invalidate()
+    second = provider.core_v1()
+    assert second is not first
+    assert mock_load.call_count == 2
+
+    expiring = KubeClientProvider(ttl=0)
+    expiring.core_v1()
+    expiring.core_v1()
+    assert mock_load.call_count == 4
+
+
+def test_note_api_error_invalidates_on_401(fake_kube: MagicMock) -> None:
+    note_api_error(client.ApiException(status=404))
+    fake_kube.invalidate.assert_not_called()
+    note_api_error(client.ApiException(status=401))
+    fake_kube.invalidate.assert_called_once()
+
+
+def test_get_kube_clients_is_shared() -> None:
+    set_kube_clients_for_testing(None)
+    try:
+        assert get_kube_clients() is get_kube_clients()
+        assert isinstance(k8s_client.get_kube_clients(), KubeClientProvider)
+    finally:
+        set_kube_clients_for_testing(None)
+
+
+@patch("cloudpilot.k8s_client.config.load_kube_config")
+def test_provider_follows_reloaded_pool_size(
+    mock_load: MagicMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv("KUBERNETES_SERVICE_HOST", raising=False)
+    monkeypatch.setenv("CLOUDPILOT_K8S_POOL_SIZE", "4")
+    provider = KubeClientProvider()
+    assert provider.core_v1().api_client.configuration.connection_pool_maxsize == 4
+    monkeypatch.setenv("CLOUDPILOT_K8S_POOL_SIZE", "12")
+    reload_settings()
+    assert provider.core_v1().api_client.configuration.connection_pool_maxsize == 12
+    assert mock_load.call_count == 2
@@ -0,0 +1,102 @@
+import asyncio
+
+import numpy as np
+import pytest
+from cloudpilot.load_generator import LatencyHistogram, generate_load, run_load
+
+
+def test_histogram_percentiles_within_precision():
+    hist = LatencyHistogram()
+    values = np.random.default_rng(0).lognormal(-4, 1, 10_000)
+    for v in values:
+        hist.record(float(v))
+    assert hist.count == values.size
+    for q in (50, 99, 99.9):
+        exact = np.percentile(values, q, method="inverted_cdf")
+        assert hist.percentile(q) == pytest.approx(exact, rel=2e-3)
+    assert hist.percentile(100) == pytest.approx(values.max())
+    assert hist.mean == pytest.approx(values.mean())
+
+
+def test_histogram_merge_and_clamp():
+    a, b = LatencyHistogram(highest=10.0), LatencyHistogram(highest=10.0)
+    a.record(0.001)
+    b.record(100.0)
+    a.merge(b)
+    assert a.count == 2
+    assert a.percentile(100) <= 100.0
+    with pytest.raises(ValueError):
+        a.merge(LatencyHistogram())
+
+
+def test_generate_load_hits_target(http_stub):
+    report = generate_load(http_stub, duration=1, intensity=50, seed=1)
+    assert report.scheduled > 0
+    assert report.completed == report.scheduled
+    assert report.error_rate == 0
+    assert report.latency.count == report.completed
+    assert 0 < report.percentiles()["p50"] < 1
+
+
+def test_slow_target_does_not_lower_offered_rate(http_stub):
+    # 20 requests due over one second, 100 ms each, one connection: a
+    # closed-loop client would see 100 ms latencies and send them over 2 s.
+    arrivals = np.arange(20) * 0.05
+    report = asyncio.run(
+        run_load(f"{http_stub}/sleep/100", arrivals, duration=1.0, connections=1)
+    )
+    assert report.scheduled == 20
+    assert report.offered_rate == pytest.approx(20)
+    assert report.completed == 20
+    # The last request waits behind the others, measured from its due time.
+    assert report.latency.max > 0.8
+    assert report.latency.percentile(50) > 0.3
+
+
+def test_errors_are_counted(http_stub):
+    arrivals = np.zeros(5)
+    report = asyncio.run(run_load(f"{http_stub}/status/503", arrivals))
+    assert report.errors == {"HTTP 503": 5}
+    assert report.error_rate == 1.0
+    report = asyncio.run(run_load(f"{http_stub}/close", arrivals, connections=2))
+    assert report.completed == 5 and not report.errors
+
+
+@pytest.mark.parametrize(
+    ("path", "method"), [("/empty/204", "GET"), ("/empty/304", "GET"), ("/", "HEAD")]
+)
+def test_bodiless_responses_keep_the_connection(http_stub, path, method):
+    report = asyncio.run(
+        run_load(
+            f"{http_stub}{path}",
+            np.arange(5) * 0.01,
+            method=method,
+            connections=1,
+            timeout=2.0,
+        )
+    )
+    assert report.completed == 5 and not report.errors
+    assert report.latency.max < 1.0
+
+
+def test_timeouts_are_in_the_tail(http_stub):
+    arrivals = np.array([0.0, 0.01, 0.02, 0.03])
+    report = asyncio.run(
+        run_load(f"{http_stub}/sleep/500", arrivals, connections=4, timeout=0.2)
+    )
+    assert report.errors == {"timeout": 4}
+    assert report.completed == 0
+    assert report.latency.count == 4
+    assert report.percentiles()["p99"] >= 0.2
+
+
+def test_unreachable_target_and_dropped_requests(http_stub):
+    report = asyncio.run(run_load("http://127.0.0.1:9/", np.zeros(3)))
+    assert report.completed == 0
+    assert report.error_count == 3
+    report = asyncio.run(
+        run_load(f"{http_stub}/sleep/200", np.zeros(4), max_in_flight=1)
+    )
+    assert report.errors == {"dropped": 3}
+    with pytest.raises(ValueError):
+        asyncio.run(run_load("ftp://example.com", np.zeros(1)))
@@ -1,5 +1,15 @@
+from types import SimpleNamespace
+
+import numpy as np
 import pytest
-from cloudpilot.load_tester import simulate_workload, stress_test
+from cloudpilot.load_tester import (
+    iter_arrivals,
+    partition_arrivals,
+    scheduled_share,
+    simulate_arrivals,
+    simulate_workload,
+    stress_test,
+)
 
 
 def test_simulate_workload_peak():
@@ -11,10 +21,13 @@ def test_simulate_workload_peak():
     assert len(events) > 0
 
 
-def test_stress_test():
-    result = stress_test("dummy-deployment", namespace="default", duration=1)
+def test_stress_test(http_stub):
+    result = stress_test(
+        "dummy-deployment", namespace="default", duration=1, url=http_stub
+    )
     assert isinstance(result, str)
     assert "completed" in result.lower()
+    assert "0.00% errors" in result
 
 
 def test_simulate_workload_negative_duration():
@@ -25,3 +38,68 @@ def test_simulate_workload_negative_duration():
 def test_simulate_workload_negative_intensity():
     with pytest.raises(ValueError):
         simulate_workload(5, -2, pattern="normal")
+
+
+def test_simulate_arrivals_sorted_float64_array():
+    events = simulate_arrivals(20, 50, seed=1)
+    assert isinstance(events, np.ndarray)
+    assert events.dtype == np.float64
+    assert np.all(np.diff(events) >= 0)
+    assert events.min() >= 0 and events.max() < 20
+    # 1000 expected events; Poisson std is ~32.
+    assert 800 < events.size < 1200
+
+
+def test_simulate_arrivals_seed_is_reproducible():
+    np.testing.assert_array_equal(
+        simulate_arrivals(5, 10, seed=7), simulate_arrivals(5, 10, seed=7)
+    )
+
+
+def test_iter_arrivals_windows_are_bounded_and_ordered():
+    chunks = list(iter_arrivals(25, 20, window=10, seed=3))
+    assert len(chunks) == 3
+    for i, chunk in enumerate(chunks):
+        assert chunk.size == 0 or (chunk.min() >= i * 10 and chunk.max() < (i + 1) * 10)
+    joined = np.concatenate(chunks)
+    assert np.all(np.diff(joined) >= 0)
+
+
+def test_iter_arrivals_rejects_non_positive_window():
+    with pytest.raises(ValueError):
+        next(iter_arrivals(5, 2, window=0))
+
+
+def test_partition_arrivals_is_disjoint_and_complete():
+    events = simulate_arrivals(10, 30, seed=2)
+    shares = [partition_arrivals(events, i, 3) for i in range(3)]
+    np.testing.assert_array_equal(np.sort(np.concatenate(shares)), events)
+    assert max(s.size for s in shares) - min(s.size for s in shares) <= 1
+    np.testing.assert_array_equal(shares[1], partition_arrivals(events, 1, 3))
+    with pytest.raises(ValueError):
+        partition_arrivals(events, 3, 3)
+
+
+def test_scheduled_share_splits_the_schedule_across_workers():
+    # What locust hands the locustfile: parsed options plus a worker index.
+    environment = SimpleNamespace(
+        parsed_options=SimpleNamespace(
+            schedule_duration=20,
+            schedule_intensity=25.0,
+            schedule_pattern="bursty",
+            schedule_seed=4,
+            schedule_workers=3,
+        ),
+    )
+    opts = environment.parsed_options
+    full, total = scheduled_share(opts)
+    assert total == full.size > 0
+    shares = [scheduled_share(opts, i) for i in range(3)]
+    assert all(size == total for _, size in shares)
+    arrivals = [share for share, _ in shares]
+    combined = np.concatenate(arrivals)
+    assert combined.size == total
+    assert np.unique(combined).size == total
+    np.testing.assert_array_equal(np.sort(combined), full)
+    with pytest.raises(ValueError, match="--schedule-workers is 3"):
+        scheduled_share(opts, 3)
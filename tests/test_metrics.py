@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from cloudpilot import anomaly_detector
+from cloudpilot.anomaly_detector import train_dummy_isolation_forest
+from cloudpilot.config import reload_settings
+from cloudpilot.metrics import (
+    DEFAULT_FEATURES,
+    MetricQueries,
+    PrometheusCollector,
+    get_metrics_collector,
+    lease_metrics_collector,
+    reset_metrics_collector_for_testing,
+)
+from cloudpilot.monitor import MultiNamespaceMonitor
+
+# Canned per-namespace values keyed by a substring of each default query.
+SERIES = {
+    "container_cpu_usage_seconds_total": {"shop": 42.0, "payments": 90.0},
+    "container_memory_usage_bytes": {"shop": 512.0, "payments": 1024.0},
+    "http_requests_total": {"shop": 120.0},
+    "http_request_duration_seconds_bucket": {"shop": 35.0, "payments": "NaN"},
+}
+
+
+class _StubPrometheus(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    queries: list[str] = []
+    peers: set[tuple[str, int]] = set()
+    failing: str | None = None  # queries containing this answer 500
+    hanging: str | None = None  # queries containing this wait for ``release``
+    release = threading.Event()
+
+    def do_GET(self) -> None:  # noqa: N802
+        query = parse_qs(urlparse(self.path).query)["query"][0]
+        type(self).queries.append(query)
+        type(self).peers.add(self.client_address)
+        if self.hanging is not None and self.hanging in query:
+            self.release.wait(10)
+        if self.failing is not None and self.failing in query:
+            body = b'{"status": "error", "error": "boom"}'
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        result = []
+        for needle, values in SERIES.items():
+            if needle in query:
+                grouped = "by (namespace" in query
+                for ns, value in values.items():
+                    metric = {"namespace": ns} if grouped else {}
+                    result.append({"metric": metric, "value": [0, str(value)]})
+                    if not grouped:
+                        break
+        body = json.dumps(
+            {"status": "success", "data": {"resultType": "vector", "result": result}}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture()
+def prometheus_url() -> Iterator[str]:
+    _StubPrometheus.queries = []
+    _StubPrometheus.peers = set()
+    _StubPrometheus.failing = None
+    _StubPrometheus.hanging = None
+    _StubPrometheus.release = threading.Event()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPrometheus)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    _StubPrometheus.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_collect_groups_by_namespace(prometheus_url: str) -> None:
+    with PrometheusCollector(prometheus_url) as collector:
+        result = collector.collect(["shop", "payments"])
+    assert result[("shop",)] == [42.0, 512.0, 120.0, 35.0]
+    # Missing request rate and NaN latency fall back to defaults.
+    assert result[("payments",)] == [90.0, 1024.0, DEFAULT_FEATURES[2], 100.0]
+    assert len(_StubPrometheus.queries) == 4
+    assert all('namespace=~"shop|payments"' in q for q in _StubPrometheus.queries)
+
+
+def test_collect_namespaces_fills_missing(prometheus_url: str) -> None:
+    with PrometheusCollector(prometheus_url) as collector:
+        result = collector.collect_namespaces(["shop", "empty"])
+    assert result["shop"][0] == 42.0
+    assert result["empty"] == list(DEFAULT_FEATURES)
+
+
+def test_collector_reuses_pooled_connections(prometheus_url: str) -> None:
+    with PrometheusCollector(prometheus_url) as collector:
+        for _ in range(5):
+            collector.collect(["shop"])
+    assert len(_StubPrometheus.queries) == 20
+    assert len(_StubPrometheus.peers) <= 4
+
+
+def test_failed_query_uses_default(prometheus_url: str) -> None:
+    _StubPrometheus.failing = "http_requests_total"
+    with PrometheusCollector(prometheus_url) as collector:
+        result = collector.collect(["shop"])
+    assert any("http_requests_total" in q for q in _StubPrometheus.queries)
+    assert result[("shop",)] == [42.0, 512.0, DEFAULT_FEATURES[2], 35.0]
+
+
+def test_render_without_grouping() -> None:
+    rendered = dict(MetricQueries().render((), ""))
+    assert rendered["cpu_util"].startswith("avg by () (")
+    assert "sum by (le)" in rendered["network_latency"]
+
+
+def test_get_prometheus_metrics_uses_shared_collector(
+    prometheus_url: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_PROMETHEUS_URL", prometheus_url)
+    reset_metrics_collector_for_testing()
+    try:
+        assert anomaly_detector.get_prometheus_metrics() == [42.0, 512.0, 120.0, 35.0]
+        assert anomaly_detector.get_prometheus_metrics("payments")[0] == 90.0
+    finally:
+        reset_metrics_collector_for_testing()
+
+
+def test_monitor_and_heal_queries_its_own_namespace(
+    prometheus_url: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class _Stop(Exception):
+        pass
+
+    def stop(_: float) -> None:
+        raise _Stop
+
+    scored: list = []
+    monkeypatch.setenv("CLOUDPILOT_PROMETHEUS_URL", prometheus_url)
+    monkeypatch.setattr(
+        anomaly_detector,
+        "detect_anomalies",
+        lambda features, series: scored.append((features, series)) or ([False], []),
+    )
+    monkeypatch.setattr(anomaly_detector.time, "sleep", stop)
+    reset_metrics_collector_for_testing()
+    try:
+        with pytest.raises(_Stop):
+            anomaly_detector.monitor_and_heal(check_interval=1, namespace="payments")
+    finally:
+        reset_metrics_collector_for_testing()
+    assert _StubPrometheus.queries
+    assert all('namespace=~"payments"' in q for q in _StubPrometheus.queries)
+    assert scored == [([[90.0, 1024.0, DEFAULT_FEATURES[2], 100.0]], ["payments"])]
+
+
+def test_hanging_namespace_does_not_block_fallback_fetches(
+    prometheus_url: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_PROMETHEUS_URL", prometheus_url)
+    _StubPrometheus.hanging = "slow"  # the grouped query and slow's own
+    reset_metrics_collector_for_testing()
+    monitor = MultiNamespaceMonitor(
+        ["slow", "shop", "payments"],
+        fetch_timeout=2.0,
+        heal=lambda ns: "",
+        model=train_dummy_isolation_forest(),
+    )
+    try:
+        started = time.monotonic()
+        statuses = monitor.run_cycle()
+        assert time.monotonic() - started < 3.0
+        assert statuses["shop"].features == [42.0, 512.0, 120.0, 35.0]
+        assert statuses["payments"].features is not None
+        assert statuses["slow"].error == "metrics fetch still in flight"
+    finally:
+        _StubPrometheus.release.set()
+        monitor.close()
+        reset_metrics_collector_for_testing()
+
+
+def test_shared_collector_follows_reloaded_url(
+    prometheus_url: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_PROMETHEUS_URL", "http://127.0.0.1:1")
+    reset_metrics_collector_for_testing()
+    try:
+        first = get_metrics_collector()
+        assert get_metrics_collector() is first
+        monkeypatch.setenv("CLOUDPILOT_PROMETHEUS_URL", prometheus_url)
+        reload_settings()
+        assert get_metrics_collector().url == prometheus_url
+        assert first.closed  # the replaced collector was closed
+        assert anomaly_detector.get_prometheus_metrics()[0] == 42.0
+    finally:
+        reset_metrics_collector_for_testing()
+
+
+def test_reload_between_lease_and_collect_keeps_collector_open(
+    prometheus_url: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_PROMETHEUS_URL", prometheus_url)
+    reset_metrics_collector_for_testing()
+    leased, reloaded = threading.Event(), threading.Event()
+    results: list = []
+
+    def caller() -> None:
+        with lease_metrics_collector() as collector:
+            leased.set()
+            assert reloaded.wait(5)
+            results.append((collector, collector.collect()))
+
+    def reloader() -> None:
+        assert leased.wait(5)
+        monkeypatch.setenv("CLOUDPILOT_PROMETHEUS_URL", prometheus_url + "/")
+        reload_settings()
+        get_metrics_collector()  # retires the leased collector
+        reloaded.set()
+
+    try:
+        threads = [threading.Thread(target=caller), threading.Thread(target=reloader)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        collector, grouped = results[0]
+        assert grouped[("shop",)][0] == 42.0
+        assert collector.closed  # closed once the lease ended
+        assert get_metrics_collector() is not collector
+    finally:
+        reset_metrics_collector_for_testing()
+
+
+def test_retired_collector_closes_after_in_flight_calls(prometheus_url: str) -> None:
+    collector = PrometheusCollector(prometheus_url)
+    started, release = threading.Event(), threading.Event()
+    query = collector._query
+
+    def slow_query(q: str) -> list:
+        started.set()
+        release.wait(5)
+        return query(q)
+
+    collector._query = slow_query  # type: ignore[method-assign]
+    results: list = []
+    caller = threading.Thread(target=lambda: results.append(collector.collect()))
+    caller.start()
+    assert started.wait(5)
+    collector.retire()
+    assert not collector.closed
+    release.set()
+    caller.join(5)
+    assert results[0][("shop",)][0] == 42.0
+    assert collector.closed
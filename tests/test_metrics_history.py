@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+from cloudpilot.anomaly_detector import train_dummy_isolation_forest
+from cloudpilot.metrics import DEFAULT_FEATURES, PrometheusCollector
+from cloudpilot.metrics_history import MetricsHistory
+from cloudpilot.monitor import MultiNamespaceMonitor
+
+
+def test_append_wraps_and_windows_are_views(tmp_path: Path) -> None:
+    history = MetricsHistory(tmp_path / "h", capacity=4, max_series=8)
+    for t in range(6):
+        history.append({"a": [t, t + 1, t + 2, t + 3], "b": [10.0 * t] * 4}, t)
+    times, values = history.window("a")
+    assert times.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert values.dtype == np.float32 and values.shape == (4, 4)
+    assert values[0].tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert values.T[-1].tolist() == [5.0, 6.0, 7.0, 8.0]
+    assert np.shares_memory(values, history._values)
+    assert values[0].flags.c_contiguous
+    assert history.window("b", 2)[1][0].tolist() == [40.0, 50.0]
+    assert history.window("b", 0)[0].size == 0
+    with pytest.raises(KeyError):
+        history.window("missing")
+
+
+def test_reopen_keeps_data_and_shape(tmp_path: Path) -> None:
+    history = MetricsHistory(tmp_path / "h", capacity=3)
+    history.append({"shop": [1.0, 2.0, 3.0, 4.0]}, 100.0)
+    history.flush()
+    reopened = MetricsHistory(tmp_path / "h", capacity=99)
+    assert reopened.capacity == 3
+    assert reopened.series() == ["shop"]
+    times, values = reopened.window("shop")
+    assert times.tolist() == [100.0]
+    assert values[:, 0].tolist() == [1.0, 2.0, 3.0, 4.0]
+    with pytest.raises(ValueError):
+        MetricsHistory(tmp_path / "h", features=("cpu",))
+
+
+def test_read_only_history_cannot_be_written(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        MetricsHistory(tmp_path / "h", read_only=True)
+    MetricsHistory(tmp_path / "h", capacity=3).append({"shop": [1.0] * 4}, 1.0)
+    reader = MetricsHistory(tmp_path / "h", read_only=True)
+    assert reader.window("shop")[0].tolist() == [1.0]
+    assert not reader.window("shop")[1].flags.writeable
+    with pytest.raises(PermissionError):
+        reader.append({"shop": [2.0] * 4}, 2.0)
+
+
+def test_extend_and_full_store(tmp_path: Path) -> None:
+    history = MetricsHistory(tmp_path / "h", capacity=5, max_series=1)
+    history.append({"a": [0.0] * 4}, 0.0)
+    rows = np.arange(28, dtype=np.float64).reshape(7, 4)
+    history.extend("a", np.arange(1, 8, dtype=np.float64), rows)
+    times, values = history.window("a")
+    assert times.tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    np.testing.assert_array_equal(values.T, rows[2:])
+    with pytest.raises(ValueError, match="full"):
+        history.append({"b": [0.0] * 4})
+
+
+class _RangePrometheus:
+    """Canned ``query_range`` matrices keyed by a substring of each query."""
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.calls: list[dict[str, Any]] = []
+
+    def custom_query_range(self, query: str, **kwargs: Any) -> list[dict]:
+        self.calls.append(kwargs)
+        t = self.start
+        if "container_cpu_usage_seconds_total" in query:
+            return [
+                {
+                    "metric": {"namespace": "shop"},
+                    "values": [[t, "10"], [t + 60, "11"]],
+                },
+                {"metric": {"namespace": "api"}, "values": [[t + 120, "30"]]},
+            ]
+        if "http_request_duration_seconds_bucket" in query:
+            return [{"metric": {"namespace": "shop"}, "values": [[t + 60, "NaN"]]}]
+        return []
+
+
+def test_collect_range_and_backfill(tmp_path: Path) -> None:
+    end = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    history = MetricsHistory(tmp_path / "h", capacity=3)
+    start = end.timestamp() - 120
+    stub = _RangePrometheus(start)
+    with PrometheusCollector("http://127.0.0.1:9") as collector:
+        collector._prom = stub  # type: ignore[assignment]
+        written = history.backfill(collector, ["shop", "api", "idle"], end=end)
+        assert written == 3
+        assert stub.calls[0]["step"] == "60"
+        # Series with data are not backfilled again.
+        assert history.backfill(collector, ["shop"], end=end) == 0
+
+    times, values = history.window("shop")
+    assert times.tolist() == [start, start + 60]
+    assert values[0].tolist() == [10.0, 11.0]
+    assert values[3].tolist() == [DEFAULT_FEATURES[3]] * 2
+    assert history.window("api")[1][0].tolist() == [30.0]
+    assert history.count("idle") == 0
+
+
+def test_monitor_records_history(tmp_path: Path) -> None:
+    history = MetricsHistory(tmp_path / "h", capacity=10)
+    metrics = {"a": [50.0, 50.0, 50.0, 50.0], "b": [60.0, 60.0, 60.0, 60.0]}
+    with MultiNamespaceMonitor(
+        list(metrics),
+        fetch=metrics.__getitem__,
+        heal=lambda ns: "ok",
+        model=train_dummy_isolation_forest(),
+        history=history,
+    ) as monitor:
+        monitor.run_cycle()
+        monitor.run_cycle()
+    assert history.count("a") == 2
+    assert history.window("b")[1][:, -1].tolist() == metrics["b"]
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+from cloudpilot import model_store
+from cloudpilot.anomaly_detector import (
+    detect_anomalies,
+    get_isolation_forest_model,
+    reset_isolation_forest_model_for_testing,
+)
+from cloudpilot.compiled_forest import CompiledForest
+from cloudpilot.model_store import (
+    ISOLATION_FOREST,
+    ModelStore,
+    get_latest_model,
+    train_isolation_forest,
+)
+
+
+@pytest.fixture()
+def store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[ModelStore]:
+    monkeypatch.setenv("CLOUDPILOT_MODEL_STORE", str(tmp_path / "models"))
+    reset_isolation_forest_model_for_testing()
+    yield ModelStore(tmp_path / "models")
+    reset_isolation_forest_model_for_testing()
+
+
+def history(seed: int, n: int = 200) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.normal([50.0, 50.0, 70.0, 100.0], [2.0, 2.0, 3.0, 5.0], (n, 4))
+
+
+def test_save_load_and_promote(store: ModelStore) -> None:
+    assert store.latest_version(ISOLATION_FOREST) is None
+    first = store.save(ISOLATION_FOREST, train_isolation_forest(history(0)))
+    second = store.save(
+        ISOLATION_FOREST,
+        train_isolation_forest(history(1), random_state=1),
+        {"n_samples": 200},
+    )
+    assert (first, second) == ("000001", "000002")
+    assert store.versions(ISOLATION_FOREST) == [first, second]
+    assert store.latest_version(ISOLATION_FOREST) == second
+    assert store.metadata(ISOLATION_FOREST, second)["n_samples"] == 200
+
+    loaded = store.load(ISOLATION_FOREST)
+    x = history(2, 20)
+    expected = train_isolation_forest(history(1), random_state=1).decision_function(x)
+    np.testing.assert_allclose(loaded.decision_function(x), expected)
+
+    store.promote(ISOLATION_FOREST, first)
+    assert store.latest_version(ISOLATION_FOREST) == first
+    with pytest.raises(LookupError):
+        store.promote(ISOLATION_FOREST, "000009")
+    assert not [p for p in store.root.rglob(".*")]
+
+
+def test_load_memory_maps_arrays(store: ModelStore) -> None:
+    store.save(ISOLATION_FOREST, {"weights": np.arange(1000.0)})
+    loaded = store.load(ISOLATION_FOREST)
+    assert isinstance(loaded["weights"], np.memmap)
+    eager = store.load(ISOLATION_FOREST, mmap=False)
+    assert not isinstance(eager["weights"], np.memmap)
+
+
+def test_forests_are_served_from_shared_compiled_arrays(store: ModelStore) -> None:
+    model = train_isolation_forest(history(0), random_state=0)
+    version = store.save(ISOLATION_FOREST, model)
+    compiled = store.load_compiled(ISOLATION_FOREST, version)
+    assert isinstance(compiled, CompiledForest)
+    for array in (compiled.left, compiled.threshold, compiled.value):
+        assert isinstance(array, np.memmap) and not array.flags.writeable
+    x = history(5, 50)
+    np.testing.assert_allclose(
+        compiled.decision_function(x), model.decision_function(x), atol=1e-12
+    )
+    eager = store.load_compiled(ISOLATION_FOREST, version, mmap=False)
+    assert eager is not None and not isinstance(eager.left, np.memmap)
+    store.save("other", {"weights": np.arange(3.0)})
+    assert store.load_compiled("other") is None
+
+
+def test_latest_model_hot_swaps(
+    store: ModelStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    assert get_latest_model() is None
+    store.save(ISOLATION_FOREST, train_isolation_forest(history(0), random_state=0))
+    # Within the check interval the store is not re-read.
+    assert get_latest_model() is None
+
+    monkeypatch.setenv("CLOUDPILOT_MODEL_CHECK_INTERVAL", "1")
+    monkeypatch.setattr(model_store.time, "monotonic", lambda: 1e9)
+    first = get_latest_model()
+    assert isinstance(first, CompiledForest)
+    assert get_isolation_forest_model() is first
+
+    store.save(ISOLATION_FOREST, train_isolation_forest(history(1), random_state=1))
+    monkeypatch.setattr(model_store.time, "monotonic", lambda: 2e9)
+    second = get_isolation_forest_model()
+    assert second is not first
+    mask, _ = detect_anomalies(history(3, 5))
+    assert mask.shape == (5,)
+
+
+def test_falls_back_to_dummy_model_without_store(store: ModelStore) -> None:
+    model = get_isolation_forest_model()
+    assert model is get_isolation_forest_model()
+    assert get_latest_model() is None
+
+
+def test_cli_trains_from_csv(store: ModelStore, tmp_path: Path) -> None:
+    csv = tmp_path / "features.csv"
+    np.savetxt(csv, history(4), delimiter=",")
+    model_store.main(["--store", str(store.root), "train", str(csv), "--seed", "0"])
+    version = store.latest_version(ISOLATION_FOREST)
+    assert version == "000001"
+    assert store.metadata(ISOLATION_FOREST, version)["n_samples"] == 200
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from cloudpilot.anomaly_detector import train_dummy_isolation_forest
+from cloudpilot.config import reload_settings
+from cloudpilot.monitor import MultiNamespaceMonitor
+
+NORMAL = [50.0, 50.0, 50.0, 50.0]
+ANOMALOUS = [500.0, 500.0, 500.0, 500.0]
+
+
+@pytest.fixture(scope="module")
+def model():
+    return train_dummy_isolation_forest()
+
+
+def test_run_cycle_scores_all_namespaces_and_heals_anomalous(model) -> None:
+    healed: list[str] = []
+    metrics = {"a": NORMAL, "b": ANOMALOUS, "c": NORMAL}
+    with MultiNamespaceMonitor(
+        list(metrics),
+        fetch=metrics.__getitem__,
+        heal=lambda ns: healed.append(ns) or "ok",
+        model=model,
+    ) as monitor:
+        statuses = monitor.run_cycle()
+        monitor.close(wait_for_pending=True)
+    assert [s.anomaly for s in statuses.values()] == [False, True, False]
+    assert statuses["b"].heal_dispatched
+    assert healed == ["b"]
+
+
+def test_slow_fetch_does_not_stall_other_namespaces(model) -> None:
+    release = threading.Event()
+
+    def fetch(ns: str) -> list[float]:
+        if ns == "slow":
+            release.wait(5)
+        return NORMAL
+
+    with MultiNamespaceMonitor(
+        ["slow", "fast"], fetch=fetch, fetch_timeout=0.2, model=model
+    ) as monitor:
+        started = time.monotonic()
+        statuses = monitor.run_cycle()
+        assert time.monotonic() - started < 2
+        assert statuses["slow"].error == "metrics fetch still in flight"
+        assert statuses["fast"].features == NORMAL
+        release.set()
+        time.sleep(0.05)
+        statuses = monitor.run_cycle()
+    assert statuses["slow"].features == NORMAL
+
+
+def test_fetch_error_is_isolated(model) -> None:
+    def fetch(ns: str) -> list[float]:
+        if ns == "broken":
+            raise RuntimeError("prometheus down")
+        return NORMAL
+
+    with MultiNamespaceMonitor(["broken", "ok"], fetch=fetch, model=model) as monitor:
+        statuses = monitor.run_cycle()
+    assert "prometheus down" in (statuses["broken"].error or "")
+    assert statuses["ok"].error is None
+
+
+def test_detection_error_skips_the_cycle(model) -> None:
+    broken = MagicMock()
+    broken.decision_function.side_effect = ValueError("X has 3 features")
+    heal = MagicMock()
+    with MultiNamespaceMonitor(
+        ["a", "b"], fetch=lambda ns: ANOMALOUS, heal=heal, model=broken
+    ) as monitor:
+        statuses = monitor.run_cycle()
+        broken.decision_function.side_effect = None
+        broken.decision_function.return_value = np.array([1.0, 1.0])
+        assert monitor.run_cycle()["a"].error is None
+    assert all("X has 3 features" in (s.error or "") for s in statuses.values())
+    assert not any(s.heal_dispatched for s in statuses.values())
+    heal.assert_not_called()
+
+
+def test_heal_not_redispatched_while_running(model) -> None:
+    release = threading.Event()
+    calls: list[str] = []
+
+    def heal(ns: str) -> str:
+        calls.append(ns)
+        release.wait(5)
+        return "ok"
+
+    with MultiNamespaceMonitor(
+        ["x"], fetch=lambda ns: ANOMALOUS, heal=heal, model=model
+    ) as monitor:
+        assert monitor.run_cycle()["x"].heal_dispatched
+        assert not monitor.run_cycle()["x"].heal_dispatched
+        release.set()
+    assert calls == ["x"]
+
+
+def test_requires_namespaces() -> None:
+    with pytest.raises(ValueError):
+        MultiNamespaceMonitor([])
+
+
+def test_batch_fetch_uses_one_call_per_cycle(model) -> None:
+    calls: list[list[str]] = []
+
+    def fetch_batch(namespaces):
+        calls.append(list(namespaces))
+        return {"a": NORMAL, "b": ANOMALOUS}
+
+    with MultiNamespaceMonitor(
+        ["a", "b", "c"],
+        fetch_batch=fetch_batch,
+        heal=lambda ns: "ok",
+        model=model,
+    ) as monitor:
+        statuses = monitor.run_cycle()
+    assert calls == [["a", "b", "c"]]
+    assert statuses["b"].anomaly
+    assert statuses["c"].error == "no metrics returned"
+
+
+def test_interval_and_pools_follow_reloaded_settings(
+    model, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_MONITOR_INTERVAL", "30")
+    monkeypatch.setenv("CLOUDPILOT_MONITOR_MAX_WORKERS", "1")
+    with MultiNamespaceMonitor(
+        ["a", "b", "c"], fetch=lambda ns: NORMAL, heal=lambda ns: "ok", model=model
+    ) as monitor:
+        assert monitor.check_interval == monitor.fetch_timeout == 30
+        assert monitor._fetch_pool._max_workers == 1
+        monkeypatch.setenv("CLOUDPILOT_MONITOR_INTERVAL", "5")
+        monkeypatch.setenv("CLOUDPILOT_MONITOR_MAX_WORKERS", "8")
+        reload_settings()
+        statuses = monitor.run_cycle()
+        assert monitor.check_interval == 5
+        assert monitor._fetch_pool._max_workers == 3
+    assert all(status.error is None for status in statuses.values())
+
+
+def test_slow_batch_falls_back_to_per_namespace_fetches(model) -> None:
+    release = threading.Event()
+
+    def fetch_batch(namespaces):
+        release.wait(5)
+        return {ns: NORMAL for ns in namespaces}
+
+    def fetch(ns: str):
+        if ns == "slow":
+            release.wait(5)
+        return ANOMALOUS if ns == "b" else NORMAL
+
+    with MultiNamespaceMonitor(
+        ["a", "b", "slow"],
+        fetch=fetch,
+        fetch_batch=fetch_batch,
+        fetch_timeout=0.4,
+        heal=lambda ns: "ok",
+        model=model,
+    ) as monitor:
+        started = time.monotonic()
+        statuses = monitor.run_cycle()
+        elapsed = time.monotonic() - started
+        release.set()
+    assert elapsed < 1.0
+    assert statuses["a"].features == NORMAL and statuses["a"].error is None
+    assert statuses["b"].anomaly
+    assert statuses["slow"].error == "metrics fetch still in flight"
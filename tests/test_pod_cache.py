@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+from cloudpilot import pod_cache
+from cloudpilot.anomaly_detector import self_heal
+from cloudpilot.pod_cache import PodPhaseCache
+from kubernetes.client import ApiException
+
+
+def make_pod(name: str, phase: str) -> MagicMock:
+    pod = MagicMock()
+    pod.metadata.name = name
+    pod.status.phase = phase
+    return pod
+
+
+def pod_list(pods: list[MagicMock], resource_version: str = "100") -> MagicMock:
+    return MagicMock(items=pods, metadata=MagicMock(resource_version=resource_version))
+
+
+class FakeWatch:
+    """Replays scripted event batches, one per ``stream`` call."""
+
+    batches: list[list[dict[str, Any]] | Exception] = []
+    calls: list[dict[str, Any]] = []
+
+    def __init__(self) -> None:
+        self.resource_version: str | None = None
+
+    def stream(self, func: Any, *args: Any, **kwargs: Any) -> Iterator[dict[str, Any]]:
+        FakeWatch.calls.append(kwargs)
+        batch = FakeWatch.batches.pop(0)
+        if isinstance(batch, Exception):
+            raise batch
+        for event in batch:
+            self.resource_version = event.pop("rv", self.resource_version)
+            yield event
+
+    def stop(self) -> None:
+        pass
+
+
+@pytest.fixture()
+def fake_watch() -> Iterator[type[FakeWatch]]:
+    FakeWatch.batches = []
+    FakeWatch.calls = []
+    with patch.object(pod_cache.watch, "Watch", FakeWatch):
+        yield FakeWatch
+
+
+def test_cache_lists_then_applies_watch_events(fake_watch: type[FakeWatch]) -> None:
+    core = MagicMock()
+    core.list_namespaced_pod.return_value = pod_list(
+        [make_pod("a", "Running"), make_pod("b", "Pending")]
+    )
+    fake_watch.batches = [
+        [
+            {"type": "MODIFIED", "object": make_pod("a", "Failed"), "rv": "101"},
+            {"type": "DELETED", "object": make_pod("b", "Pending"), "rv": "102"},
+            {"type": "ADDED", "object": make_pod("c", "Running"), "rv": "103"},
+            {"type": "BOOKMARK", "object": None, "rv": "150"},
+        ],
+        [],
+    ]
+    cache = PodPhaseCache("shop", core_v1=core)
+    cache.sync_once()
+    assert cache.synced
+    assert cache.phases() == {"a": "Failed", "c": "Running"}
+    assert cache.failing_pods() == ["a"]
+    assert fake_watch.calls[0]["resource_version"] == "100"
+
+    # The next watch resumes from the bookmark without relisting.
+    cache.sync_once()
+    assert fake_watch.calls[1]["resource_version"] == "150"
+    core.list_namespaced_pod.assert_called_once_with("shop")
+
+
+def test_cache_relists_after_410(fake_watch: type[FakeWatch]) -> None:
+    core = MagicMock()
+    core.list_namespaced_pod.side_effect = [
+        pod_list([make_pod("a", "Running")], "100"),
+        pod_list([make_pod("a", "Pending")], "500"),
+        pod_list([make_pod("a", "Running")], "700"),
+    ]
+    fake_watch.batches = [
+        [{"type": "ERROR", "raw_object": {"code": 410, "message": "too old"}}],
+        ApiException(status=410),
+        [],
+    ]
+    cache = PodPhaseCache("shop", core_v1=core)
+    cache.sync_once()  # ERROR event -> relist next time
+    cache.sync_once()  # relist, then the watch itself reports 410
+    assert not cache.synced
+    assert cache.failing_pods() == ["a"]
+    cache.sync_once()
+    assert core.list_namespaced_pod.call_count == 3
+    assert cache.failing_pods() == []
+    assert fake_watch.calls[-1]["resource_version"] == "700"
+
+
+def test_cache_propagates_other_errors(fake_watch: type[FakeWatch]) -> None:
+    core = MagicMock()
+    core.list_namespaced_pod.return_value = pod_list([])
+    fake_watch.batches = [ApiException(status=500)]
+    with pytest.raises(ApiException):
+        PodPhaseCache("shop", core_v1=core).sync_once()
+
+
+def test_failed_watch_unsyncs_until_relist(fake_watch: type[FakeWatch]) -> None:
+    core = MagicMock()
+    core.list_namespaced_pod.side_effect = [
+        pod_list([make_pod("a", "Running")], "100"),
+        pod_list([make_pod("a", "Failed")], "300"),
+    ]
+    fake_watch.batches = [
+        [{"type": "ADDED", "object": make_pod("b", "Running"), "rv": "101"}],
+        ConnectionError("reset"),
+        [],
+    ]
+    cache = PodPhaseCache("shop", core_v1=core)
+    cache.sync_once()
+    assert cache.synced
+    with pytest.raises(ConnectionError):
+        cache.sync_once()
+    assert not cache.synced
+    cache.sync_once()
+    assert cache.synced
+    assert cache.phases() == {"a": "Failed"}
+    assert fake_watch.calls[-1]["resource_version"] == "300"
+
+
+def test_self_heal_uses_cache_and_caps_deletes(
+    monkeypatch: pytest.MonkeyPatch, fake_kube: MagicMock
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_SELF_HEAL_CONFIRM", "1")
+    monkeypatch.setenv("CLOUDPILOT_HEAL_MAX_PODS", "3")
+    monkeypatch.setenv("CLOUDPILOT_HEAL_DELETE_RATE", "1000")
+    cache = PodPhaseCache("shop", core_v1=MagicMock())
+    cache._phases = {f"p{i}": "Failed" for i in range(5)} | {"ok": "Running"}
+    cache._synced.set()
+    mock_api = fake_kube.core_v1.return_value
+
+    result = self_heal("shop", pod_cache=cache)
+
+    mock_api.list_namespaced_pod.assert_not_called()
+    deleted = sorted(
+        c.kwargs["name"] for c in mock_api.delete_namespaced_pod.call_args_list
+    )
+    assert deleted == ["p0", "p1", "p2"]
+    assert "Restarted pods: p0, p1, p2" in result
+    assert "2 more failing pods" in result
+    assert cache.failing_pods() == ["p3", "p4"]
+
+
+def test_self_heal_reports_failed_deletes(
+    monkeypatch: pytest.MonkeyPatch, fake_kube: MagicMock
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_SELF_HEAL_CONFIRM", "1")
+    mock_api = fake_kube.core_v1.return_value
+    mock_api.list_namespaced_pod.return_value = pod_list(
+        [make_pod("a", "Failed"), make_pod("b", "Failed")]
+    )
+    mock_api.delete_namespaced_pod.side_effect = [None, ApiException(status=403)]
+
+    result = self_heal("shop")
+
+    assert mock_api.delete_namespaced_pod.call_count == 2
+    assert "Restarted pods:" in result
+    assert "Error during self-healing:" in result
+
+
+def test_start_pod_cache_is_shared() -> None:
+    with patch.object(PodPhaseCache, "start", lambda self: self):
+        try:
+            first = pod_cache.start_pod_cache("shop")
+            assert pod_cache.start_pod_cache("shop") is first
+            assert pod_cache.get_pod_cache("shop") is first
+            assert pod_cache.get_pod_cache("other") is None
+        finally:
+            pod_cache.stop_pod_caches()
+    assert pod_cache.get_pod_cache("shop") is None
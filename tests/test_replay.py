@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from cloudpilot.anomaly_detector import detect_anomalies, train_dummy_isolation_forest
+from cloudpilot.metrics_history import MetricsHistory
+from cloudpilot.replay import main, replay, replay_history
+from cloudpilot.streaming_detector import StreamingDetector
+
+NORMAL = [50.0, 50.0, 50.0, 50.0]
+ANOMALOUS = [500.0, 500.0, 500.0, 500.0]
+
+
+class ThresholdScaler:
+    """Scale Up above 80% CPU, Scale Down below 20%, else Maintain."""
+
+    def get_actions(self, states: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        cpu = np.asarray(states)[:, 0]
+        actions = np.where(cpu > 80, 2, np.where(cpu < 20, 0, 1)).astype(np.int64)
+        return actions, np.zeros((len(actions), 3), dtype=np.float32)
+
+
+@pytest.fixture(scope="module")
+def model():
+    return train_dummy_isolation_forest()
+
+
+def recorded(steps: int = 60) -> np.ndarray:
+    x = np.tile(np.asarray(NORMAL), (2, steps, 1))
+    x[0, 10] = ANOMALOUS
+    x[1, 20, 0] = 90.0
+    x[1, 21, 0] = 10.0
+    return x
+
+
+def test_replay_reports_heals_scales_and_tunes(model) -> None:
+    x = recorded()
+    times = 1000.0 + 60.0 * np.arange(x.shape[1])
+    result = replay(
+        x,
+        times,
+        ["shop", "api"],
+        model=model,
+        scaler=ThresholdScaler(),
+        cpu_limits=["1000m", "400m"],
+        mem_limit_mb=1024,
+        tune_every=5,
+        max_workers=4,
+        chunk_size=16,
+    )
+    assert result.anomalies.shape == (2, 60)
+    expected_mask, _ = detect_anomalies(x.reshape(-1, 4), model=model)
+    np.testing.assert_array_equal(result.anomalies.ravel(), expected_mask)
+
+    heals = [e for e in result.events if e.kind == "heal"]
+    assert ("shop", 1600.0) in {(e.series, e.timestamp) for e in heals}
+    scales = [
+        (e.series, e.timestamp, e.detail) for e in result.events if e.kind == "scale"
+    ]
+    assert ("api", 2200.0, "Scale Up") in scales
+    assert ("api", 2260.0, "Scale Down") in scales
+
+    tunes = [e for e in result.events if e.kind == "tune"]
+    assert [e.detail for e in tunes][:2] == ["1000m -> 900m", "900m -> 810m"]
+    assert all(e.series == "shop" for e in tunes)
+    assert tunes[1].timestamp == times[5]
+    assert result.cpu_millicores is not None
+    assert result.cpu_millicores[0, -1] == 477
+    assert result.cpu_millicores[1].tolist() == [400] * 60
+    assert [e.timestamp for e in result.events] == sorted(
+        e.timestamp for e in result.events
+    )
+
+
+def test_heal_cooldown(model) -> None:
+    x = np.tile(np.asarray(NORMAL), (1, 10, 1))
+    x[0, 2:6] = ANOMALOUS
+    result = replay(
+        x, np.arange(10.0), ["shop"], model=model, mem_limit_mb=1024, heal_cooldown=2
+    )
+    assert [e.timestamp for e in result.events if e.kind == "heal"] == [2.0, 5.0]
+
+
+def test_streaming_replay_matches_live_feed() -> None:
+    rng = np.random.default_rng(0)
+    x = rng.normal(50.0, 2.0, (3, 50, 4))
+    x[1, 45] = 200.0
+    result = replay(
+        x,
+        np.arange(50.0),
+        ["a", "b", "c"],
+        model=StreamingDetector(warmup=10),
+        mem_limit_mb=1024,
+    )
+    live = StreamingDetector(warmup=10)
+    expected = np.stack(
+        [live.update(x[:, t], ["a", "b", "c"]) for t in range(50)], axis=1
+    )
+    np.testing.assert_allclose(result.scores, expected)
+    assert result.anomalies[1, 45]
+
+
+def test_default_demand_is_next_rate_over_full_capacity(model) -> None:
+    states: list[np.ndarray] = []
+
+    class Recording(ThresholdScaler):
+        def get_actions(self, batch: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+            states.append(np.asarray(batch))
+            return super().get_actions(batch)
+
+    x = np.tile(np.asarray(NORMAL), (1, 3, 1))
+    x[0, :, 2] = [100.0, 500.0, 3000.0]
+    replay(
+        x, np.arange(3.0), ["shop"], model=model, scaler=Recording(), mem_limit_mb=1024
+    )
+    assert states[0][:, 4].tolist() == [0.25, 1.0, 1.0]
+    replay(
+        x,
+        np.arange(3.0),
+        ["shop"],
+        model=model,
+        scaler=Recording(),
+        full_capacity=1e4,
+        mem_limit_mb=1024,
+    )
+    assert states[1][:, 4].tolist() == [0.05, 0.3, 0.3]
+
+
+def test_states_use_cluster_env_units(model) -> None:
+    states: list[np.ndarray] = []
+
+    class Recording(ThresholdScaler):
+        def get_actions(self, batch: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+            states.append(np.asarray(batch))
+            return super().get_actions(batch)
+
+    # cpu %, mem MB, req/s, latency ms
+    x = np.asarray([[[50.0, 256.0, 1500.0, 80.0], [120.0, 1024.0, 20.0, 90.0]]])
+    replay(
+        x, np.arange(2.0), ["shop"], model=model, scaler=Recording(), mem_limit_mb=512
+    )
+    np.testing.assert_allclose(states[0][:, 2], [1.5, 0.02])
+    np.testing.assert_allclose(states[0][:, 1], [50.0, 100.0])
+    np.testing.assert_allclose(states[0][:, [0, 3]], x[0][:, [0, 3]])
+    # Recorded memory is never replaced by an estimate: a limit is required.
+    with pytest.raises(ValueError, match="mem_limit_mb is required"):
+        replay(x, np.arange(2.0), ["shop"], model=model, scaler=Recording())
+    with pytest.raises(ValueError, match="mem_limit_mb must be positive"):
+        replay(x, np.arange(2.0), ["shop"], model=model, mem_limit_mb=0)
+
+
+def test_replay_history_pads_short_series(tmp_path: Path, model) -> None:
+    history = MetricsHistory(tmp_path / "h", capacity=8)
+    for t in range(6):
+        rows = {"long": NORMAL} if t < 3 else {"long": NORMAL, "short": ANOMALOUS}
+        history.append(rows, float(t))
+    result = replay_history(
+        history, model=model, scaler=ThresholdScaler(), mem_limit_mb=1024
+    )
+    assert result.series == ["long", "short"]
+    assert result.valid.sum(axis=1).tolist() == [6, 3]
+    assert result.anomalies[1].tolist() == [False] * 3 + [True] * 3
+    assert np.isnan(result.scores[1, :3]).all()
+
+    history.flush()
+    main([str(tmp_path / "h"), "--last", "4", "--mem-limit-mb", "1024"])
+
+
+def test_main_requires_history(tmp_path: Path) -> None:
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "missing"), "--mem-limit-mb", "1024"])
+
+
+def test_rejects_bad_shapes(model) -> None:
+    with pytest.raises(ValueError):
+        replay(np.zeros((2, 4)), np.arange(2.0), ["a"], model=model)
+    with pytest.raises(ValueError):
+        replay(np.zeros((2, 3, 4)), np.arange(3.0), ["a"], model=model)
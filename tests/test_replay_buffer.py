@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from cloudpilot.replay_buffer import PrioritizedReplayBuffer, ReplayBuffer, SumTree
+
+
+def _transitions(n, start=0):
+    states = np.arange(start, start + n, dtype=np.float32)[:, None].repeat(5, 1)
+    return states, np.arange(n) % 3, np.arange(start, start + n, dtype=np.float32)
+
+
+def test_replay_buffer_wraps():
+    buffer = ReplayBuffer(capacity=5)
+    for start, n in ((0, 3), (3, 4)):
+        states, actions, rewards = _transitions(n, start)
+        idx = buffer.add(states, actions, rewards, states + 1, rewards == 6)
+    assert idx.tolist() == [3, 4, 0, 1]
+    assert len(buffer) == 5 and buffer.pos == 2
+    assert sorted(buffer.rewards.tolist()) == [2, 3, 4, 5, 6]
+    s, a, r, s2, done = buffer.sample(16, np.random.default_rng(0))
+    assert s.shape == (16, 5) and a.dtype == np.int64
+    np.testing.assert_array_equal(s[:, 0], r)
+    np.testing.assert_array_equal(s2[:, 0], r + 1)
+    np.testing.assert_array_equal(done, r == 6)
+    with pytest.raises(ValueError):
+        buffer.add(*_transitions(6)[:3], _transitions(6)[0])
+
+
+def test_sum_tree_updates_and_finds():
+    tree = SumTree(5)
+    tree.update(np.arange(5), np.array([1.0, 0.0, 2.0, 3.0, 4.0]))
+    assert tree.total == 10.0
+    found = tree.find(np.array([0.0, 0.99, 1.0, 2.5, 3.0, 5.99, 6.0, 9.99]))
+    assert found.tolist() == [0, 0, 2, 2, 3, 3, 4, 4]
+    tree.update(np.array([4]), np.array([0.5]))
+    assert tree.total == 6.5
+    # Values at or past the total never land on empty leaves.
+    assert tree.find(np.array([6.5, 100.0])).tolist() == [4, 4]
+
+
+def test_prioritized_sampling_follows_priorities():
+    rng = np.random.default_rng(1)
+    buffer = PrioritizedReplayBuffer(capacity=1000, alpha=1.0, eps=0.0)
+    states, actions, rewards = _transitions(1000)
+    idx = buffer.add(states, actions, rewards, states)
+    td = np.where(idx < 100, 9.0, 1.0)
+    buffer.update_priorities(idx, td)
+    counts = np.zeros(1000)
+    for _ in range(200):
+        sampled, weights = buffer.sample_prioritized(64, rng, beta=1.0)
+        counts[sampled] += 1
+        assert weights.max() == pytest.approx(1.0)
+        # Higher-priority transitions get smaller importance weights.
+        assert np.all(weights[sampled < 100] <= weights[sampled >= 100].min())
+    # The first 100 hold half of the total priority (900 of 1800).
+    assert counts[:100].sum() / counts.sum() == pytest.approx(0.5, abs=0.03)
+
+
+def test_new_transitions_get_max_priority():
+    buffer = PrioritizedReplayBuffer(capacity=8)
+    states, actions, rewards = _transitions(4)
+    idx = buffer.add(states, actions, rewards, states)
+    buffer.update_priorities(idx, np.array([0.0, 0.0, 0.0, 50.0]))
+    new = buffer.add(*_transitions(2, 4), _transitions(2, 4)[0])
+    np.testing.assert_allclose(buffer.tree[new], buffer.max_priority)
+    assert buffer.max_priority == pytest.approx((50.0 + buffer.eps) ** buffer.alpha)
@@ -1,4 +1,12 @@
-from cloudpilot.scaling import recommend_scaling
+import numpy as np
+import pytest
+from cloudpilot.scaling import (
+    ACTIONS,
+    RLScaler,
+    get_rl_scaler,
+    recommend_scaling,
+    recommend_scaling_batch,
+)
 
 
 def test_recommend_scaling():
@@ -8,3 +16,41 @@ def test_recommend_scaling():
     # Check for one of the valid action strings.
     valid_actions = ["Scale Down", "Maintain", "Scale Up"]
     assert any(action in recommendation for action in valid_actions)
+
+
+def test_get_actions_matches_get_action():
+    scaler = get_rl_scaler()
+    rng = np.random.default_rng(0)
+    states = rng.random((16, 5)) * [100, 100, 1, 200, 1]
+    actions, q_values = scaler.get_actions(states)
+    assert actions.shape == (16,) and actions.dtype == np.int64
+    assert q_values.shape == (16, 3)
+    assert [ACTIONS[int(a)] for a in actions] == [scaler.get_action(s) for s in states]
+
+
+def test_get_actions_without_model_maintains():
+    scaler = RLScaler(model_path="/nonexistent/model.pt")
+    scaler.model = None
+    actions, q_values = scaler.get_actions([[80.0, 70.0, 0.8, 100.0, 0.9]] * 3)
+    assert actions.tolist() == [1, 1, 1]
+    assert not q_values.any()
+
+
+def test_get_actions_rejects_1d():
+    with pytest.raises(ValueError):
+        get_rl_scaler().get_actions([80.0, 70.0, 0.8, 100.0, 0.9])
+
+
+@pytest.mark.parametrize("width", [4, 6])
+def test_wrong_state_width_is_rejected(width):
+    scaler = get_rl_scaler()
+    with pytest.raises(ValueError, match=r"\(N, 5\) state array"):
+        scaler.get_actions(np.ones((3, width)))
+    with pytest.raises(ValueError, match="Expected 5 state values"):
+        scaler.get_action([1.0] * width)
+
+
+def test_recommend_scaling_batch():
+    states = [[80.0, 70.0, 0.8, 100.0, 0.9], [10.0, 10.0, 0.1, 20.0, 0.1]]
+    batch = recommend_scaling_batch(states)
+    assert batch == [recommend_scaling(*s) for s in states]
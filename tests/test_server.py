@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+from cloudpilot.anomaly_detector import get_anomaly_model, train_dummy_isolation_forest
+from cloudpilot.compiled_forest import CompiledForest
+from cloudpilot.config import reload_settings
+from cloudpilot.scaling import ACTIONS
+from cloudpilot.server import MicroBatcher, RecommendationServer
+from cloudpilot.streaming_detector import reset_streaming_detector_for_testing
+
+
+@pytest.fixture()
+def server_url() -> Iterator[str]:
+    server = RecommendationServer(("127.0.0.1", 0), max_batch=64, max_delay=0.005)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _post(url: str, payload: object) -> tuple[int, dict]:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode())
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_micro_batcher_coalesces_concurrent_requests() -> None:
+    sizes: list[int] = []
+
+    def fn(rows: np.ndarray, keys: list) -> list:
+        sizes.append(len(rows))
+        return [f"{key}:{row.sum():g}" for row, key in zip(rows, keys, strict=True)]
+
+    batcher = MicroBatcher(fn, max_batch=8, max_delay=0.05)
+    futures = [batcher.submit([float(i), 1.0], key=i) for i in range(20)]
+    results = [future.result(timeout=5) for future in futures]
+    batcher.close()
+    assert results == [f"{i}:{i + 1}" for i in range(20)]
+    assert sizes == [8, 8, 4]
+
+
+def test_micro_batcher_fails_the_whole_batch() -> None:
+    def fn(rows: np.ndarray, keys: list) -> list:
+        raise RuntimeError("model down")
+
+    batcher = MicroBatcher(fn, max_delay=0.0)
+    future = batcher.submit([1.0])
+    with pytest.raises(RuntimeError, match="model down"):
+        future.result(timeout=5)
+    batcher.close()
+
+
+def test_micro_batcher_isolates_a_failing_row() -> None:
+    sizes: list[int] = []
+
+    def fn(rows: np.ndarray, keys: list) -> list:
+        sizes.append(len(rows))
+        if (rows < 0).any():
+            raise ValueError("negative")
+        return [float(row.sum()) for row in rows]
+
+    batcher = MicroBatcher(fn, max_batch=8, max_delay=0.2)
+    good, bad = batcher.submit([1.0, 2.0]), batcher.submit([-1.0, 0.0])
+    assert good.result(timeout=5) == 3.0
+    with pytest.raises(ValueError, match="negative"):
+        bad.result(timeout=5)
+    batcher.close()
+    assert sizes[0] == 2  # both shared one batch before the retry
+
+
+def test_micro_batcher_survives_a_wrong_result_count() -> None:
+    calls: list[int] = []
+
+    def fn(rows: np.ndarray, keys: list) -> list:
+        calls.append(len(rows))
+        return [0.0] * (len(rows) + (len(calls) == 1))
+
+    batcher = MicroBatcher(fn, max_delay=0.0)
+    with pytest.raises(ValueError, match="2 results for 1 rows"):
+        batcher.submit([1.0]).result(timeout=5)
+    assert batcher.submit([2.0]).result(timeout=5) == 0.0
+    batcher.close()
+
+
+def test_stuck_batch_answers_503() -> None:
+    release = threading.Event()
+
+    def fn(rows: np.ndarray, keys: list) -> list:
+        release.wait(5)
+        return ["Maintain"] * len(rows)
+
+    server = RecommendationServer(("127.0.0.1", 0), request_timeout=0.1)
+    server.scale.close()
+    server.scale = MicroBatcher(fn, max_delay=0.0, name="scale")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/v1/scale"
+        status, body = _post(url, {"state": [80, 70, 0.8, 100, 0.9]})
+        assert status == 503
+        assert "error" in body
+    finally:
+        release.set()
+        server.shutdown()
+        server.server_close()
+
+
+def test_compiled_forest_matches_sklearn() -> None:
+    model = train_dummy_isolation_forest()
+    x = np.random.default_rng(0).uniform(0, 300, (200, 4))
+    np.testing.assert_allclose(
+        CompiledForest.from_isolation_forest(model).decision_function(x),
+        model.decision_function(x),
+        atol=1e-12,
+    )
+
+
+def test_compiled_forest_rejects_wrong_width(tmp_path: Path) -> None:
+    compiled = CompiledForest.from_isolation_forest(train_dummy_isolation_forest())
+    with pytest.raises(ValueError, match="X has 3 features"):
+        compiled.decision_function(np.zeros((2, 3)))
+    compiled.save(tmp_path)
+    assert CompiledForest.load(tmp_path).n_features == 4
+    scalars = json.loads((tmp_path / "forest.json").read_text())
+    del scalars["n_features"]
+    (tmp_path / "forest.json").write_text(json.dumps(scalars))
+    with pytest.raises(TypeError, match="n_features"):
+        CompiledForest.load(tmp_path)
+
+
+def test_anomaly_scores_match_decision_function(server_url: str) -> None:
+    model = get_anomaly_model()
+    tree = model.estimators_[0].tree_
+    split = tree.feature >= 0
+    rows = np.random.default_rng(1).uniform(0, 100, (int(split.sum()), 4))
+    # Values exactly at a split, where float32 and float64 comparisons differ.
+    rows[np.arange(len(rows)), tree.feature[split]] = tree.threshold[split]
+    status, body = _post(f"{server_url}/v1/anomaly", {"rows": rows.tolist()})
+    assert status == 200
+    np.testing.assert_allclose(
+        body["scores"], model.decision_function(rows), rtol=0, atol=1e-12
+    )
+
+
+def test_scale_endpoint(server_url: str) -> None:
+    status, body = _post(f"{server_url}/v1/scale", {"state": [80, 70, 0.8, 100, 0.9]})
+    assert status == 200
+    assert body["action"] in ACTIONS.values()
+
+    states = [[80, 70, 0.8, 100, 0.9], [10, 20, 0.1, 20, 0.1]]
+    status, body = _post(f"{server_url}/v1/scale", {"states": states})
+    assert status == 200
+    assert len(body["actions"]) == 2
+
+
+def test_concurrent_scale_requests_are_answered(server_url: str) -> None:
+    results: list[int] = []
+
+    def call() -> None:
+        results.append(_post(f"{server_url}/v1/scale", {"state": [50] * 5})[0])
+
+    threads = [threading.Thread(target=call) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [200] * 16
+
+
+def test_anomaly_endpoint(server_url: str) -> None:
+    status, body = _post(
+        f"{server_url}/v1/anomaly", {"features": [50, 50, 70, 100], "series": "ns"}
+    )
+    assert status == 200
+    assert isinstance(body["anomaly"], bool)
+    assert isinstance(body["score"], float)
+
+    rows = [[50, 50, 70, 100], [500, 500, 7000, 10000]]
+    status, body = _post(f"{server_url}/v1/anomaly", {"rows": rows})
+    assert status == 200
+    assert body["anomalies"][1] is True
+    assert len(body["scores"]) == 2
+
+
+@pytest.mark.parametrize(
+    ("path", "payload", "status"),
+    [
+        ("/v1/scale", {"state": [1, 2]}, 400),
+        ("/v1/scale", {"states": []}, 400),
+        ("/v1/scale", [1, 2, 3], 400),
+        ("/v1/scale", {"state": ["x", 1, 1, 1, 1]}, 400),
+        ("/v1/scale", {"state": [True, 1, 1, 1, 1]}, 400),
+        ("/v1/anomaly", {"features": [1, 2, 3, 1e400]}, 400),
+        ("/v1/anomaly", {"features": [1, 2, 3, 10**400]}, 400),
+        ("/v1/anomaly", {"rows": [[1, 2, 3, 4]], "series": ["a", "b"]}, 400),
+        ("/v1/nope", {}, 404),
+    ],
+)
+def test_bad_requests(server_url: str, path: str, payload: object, status: int) -> None:
+    code, body = _post(f"{server_url}{path}", payload)
+    assert code == status
+    assert "error" in body
+
+
+def test_malformed_request_does_not_fail_its_batch(server_url: str) -> None:
+    results: dict[str, int] = {}
+
+    def call(name: str, state: list) -> None:
+        results[name] = _post(f"{server_url}/v1/scale", {"state": state})[0]
+
+    threads = [
+        threading.Thread(target=call, args=("good", [80, 70, 0.8, 100, 0.9])),
+        threading.Thread(target=call, args=("bad", ["x", 70, 0.8, 100, 0.9])),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {"good": 200, "bad": 400}
+
+
+def test_invalid_content_length(server_url: str) -> None:
+    host, port = server_url.removeprefix("http://").split(":")
+    with socket.create_connection((host, int(port)), timeout=5) as sock:
+        sock.sendall(
+            b"POST /v1/scale HTTP/1.1\r\nHost: x\r\nContent-Length: abc\r\n\r\n"
+        )
+        assert sock.recv(4096).startswith(b"HTTP/1.1 400")
+
+
+def test_streaming_warmup_scores_are_null(
+    monkeypatch: pytest.MonkeyPatch, server_url: str
+) -> None:
+    monkeypatch.setenv("CLOUDPILOT_ANOMALY_DETECTOR", "streaming")
+    reload_settings()
+    reset_streaming_detector_for_testing()
+    try:
+        status, body = _post(
+            f"{server_url}/v1/anomaly", {"features": [50, 50, 70, 100], "series": "w"}
+        )
+        assert status == 200
+        assert body == {"anomaly": False, "score": None}
+        status, body = _post(f"{server_url}/v1/anomaly", {"rows": [[1, 2, 3, 4]]})
+        assert status == 200 and body["scores"] == [None]
+    finally:
+        reset_streaming_detector_for_testing()
+
+
+def test_healthz(server_url: str) -> None:
+    with urllib.request.urlopen(f"{server_url}/healthz", timeout=5) as response:
+        assert json.loads(response.read()) == {"status": "ok"}
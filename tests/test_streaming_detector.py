@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import numpy as np
+import pytest
+from cloudpilot.anomaly_detector import detect_anomalies, detect_anomaly
+from cloudpilot.streaming_detector import (
+    StreamingDetector,
+    reset_streaming_detector_for_testing,
+)
+
+
+@pytest.fixture()
+def streaming(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.setenv("CLOUDPILOT_ANOMALY_DETECTOR", "streaming")
+    reset_streaming_detector_for_testing()
+    yield
+    reset_streaming_detector_for_testing()
+
+
+def normal_rows(rng: np.random.Generator, n: int) -> np.ndarray:
+    return rng.normal([50.0, 50.0, 70.0, 100.0], [2.0, 2.0, 3.0, 5.0], (n, 4))
+
+
+def test_warmup_then_flags_outlier() -> None:
+    det = StreamingDetector(warmup=10)
+    rng = np.random.default_rng(0)
+    scores = [det.update(row[None], ["svc"])[0] for row in normal_rows(rng, 200)]
+    assert np.isinf(scores[:10]).all()
+    assert np.mean(np.asarray(scores[10:]) < 0) < 0.05
+    spike = np.array([[50.0, 50.0, 70.0, 400.0]])
+    assert det.update(spike, ["svc"])[0] < 0
+    # One spike barely moves the robust state.
+    assert det.update(normal_rows(rng, 1), ["svc"])[0] > 0
+
+
+def test_series_are_independent_and_batch_matches_sequential() -> None:
+    rng = np.random.default_rng(1)
+    low = normal_rows(rng, 30)
+    high = normal_rows(rng, 30) * 10
+
+    batched = StreamingDetector(warmup=10)
+    sequential = StreamingDetector(warmup=10)
+    batch_scores = []
+    seq_scores = []
+    for a, b in zip(low, high, strict=True):
+        batch_scores.append(batched.update(np.stack([a, b]), ["low", "high"]))
+        seq_scores.append(
+            [
+                sequential.update(a[None], ["low"])[0],
+                sequential.update(b[None], ["high"])[0],
+            ]
+        )
+    np.testing.assert_allclose(batch_scores, seq_scores)
+    assert len(batched) == 2
+    assert np.isfinite(batch_scores[-1]).all()
+
+
+def test_repeated_series_in_one_batch_is_ordered() -> None:
+    rows = normal_rows(np.random.default_rng(2), 20)
+    one_batch = StreamingDetector(warmup=5).update(rows, ["svc"] * 20)
+    one_by_one = StreamingDetector(warmup=5)
+    expected = [one_by_one.update(r[None], ["svc"])[0] for r in rows]
+    np.testing.assert_allclose(one_batch, expected)
+
+
+def test_grows_to_thousands_of_series() -> None:
+    det = StreamingDetector(capacity=4, warmup=10)
+    rng = np.random.default_rng(3)
+    ids = [f"ns-{i}" for i in range(5000)]
+    for _ in range(12):
+        scores = det.update(normal_rows(rng, len(ids)), ids)
+    assert len(det) == 5000
+    assert scores.shape == (5000,)
+    assert np.mean(scores < 0) < 0.05
+
+
+def test_forget_restarts_warmup() -> None:
+    det = StreamingDetector(warmup=3)
+    rows = normal_rows(np.random.default_rng(4), 5)
+    det.update(rows, ["svc"] * 5)
+    det.forget("svc")
+    assert np.isinf(det.update(rows[:1], ["svc"])[0])
+
+
+def test_validation() -> None:
+    with pytest.raises(ValueError):
+        StreamingDetector(alpha=0.0)
+    det = StreamingDetector()
+    with pytest.raises(ValueError):
+        det.update(np.zeros((2, 3)), ["a", "b"])
+    with pytest.raises(ValueError):
+        det.update(np.zeros((2, 4)), ["a"])
+
+
+@pytest.mark.usefixtures("streaming")
+def test_detect_anomaly_uses_streaming_setting() -> None:
+    rng = np.random.default_rng(5)
+    for row in normal_rows(rng, 30):
+        assert detect_anomaly(row.tolist(), series="web") is False
+    assert detect_anomaly([50.0, 50.0, 70.0, 400.0], series="web") is True
+    # A fresh series is still warming up.
+    assert detect_anomaly([50.0, 50.0, 70.0, 400.0], series="api") is False
+
+    mask, scores = detect_anomalies(
+        [[50.0, 50.0, 70.0, 100.0], [50.0, 50.0, 70.0, 100.0]], series=["web", "db"]
+    )
+    assert mask.tolist() == [False, False]
+    assert np.isinf(scores[1])
+
+
+def test_detect_anomalies_accepts_array_series() -> None:
+    det = StreamingDetector(warmup=1)
+    rows = np.full((3, 4), 50.0)
+    _, scores = detect_anomalies(rows, model=det, series=np.array(["a", "b", "a"]))
+    assert scores.shape == (3,)
+    assert len(det) == 2
+    with pytest.raises(ValueError, match="Expected 3 series names, got 2"):
+        detect_anomalies(rows, model=det, series=np.array(["a", "b"]))
+
+
+def test_unknown_detector_setting_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CLOUDPILOT_ANOMALY_DETECTOR", "magic")
+    with pytest.raises(ValueError, match="CLOUDPILOT_ANOMALY_DETECTOR"):
+        detect_anomaly([50.0, 50.0, 70.0, 100.0])
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from cloudpilot.load_tester import iter_arrivals, simulate_arrivals
+from cloudpilot.traffic_patterns import (
+    Diurnal,
+    MarkovModulated,
+    Ramp,
+    Step,
+    Trace,
+    iter_pattern_arrivals,
+    sample_arrivals,
+)
+
+
+def _rate_in(events, start, stop):
+    return ((events >= start) & (events < stop)).sum() / (stop - start)
+
+
+def test_diurnal_follows_its_rate():
+    pattern = Diurnal(200.0, amplitude=0.5, period=1000.0, peak_time=250.0)
+    events = sample_arrivals(pattern, 1000, seed=0)
+    assert np.all(np.diff(events) >= 0)
+    assert events.size == pytest.approx(200_000, rel=0.01)
+    assert _rate_in(events, 225, 275) == pytest.approx(300, rel=0.05)
+    assert _rate_in(events, 725, 775) == pytest.approx(100, rel=0.08)
+
+
+def test_ramp_and_step():
+    ramp = sample_arrivals(Ramp(0.0, 100.0, 100.0), 200, seed=1)
+    assert _rate_in(ramp, 0, 10) < 10
+    assert _rate_in(ramp, 150, 200) == pytest.approx(100, rel=0.1)
+    step = sample_arrivals(Step([0, 50, 50.5], [10, 1000, 10]), 100, seed=2)
+    # A half-second burst inside one sampler cell is not clipped by the bound.
+    assert _rate_in(step, 50, 50.5) == pytest.approx(1000, rel=0.15)
+    assert _rate_in(step, 0, 50) == pytest.approx(10, rel=0.2)
+
+
+def test_markov_modulated_realization():
+    mmpp = MarkovModulated((10.0, 100.0), (20.0, 5.0))
+    path = mmpp.realize(10_000, np.random.default_rng(3))
+    assert isinstance(path, Step)
+    assert set(path.rates) == {10.0, 100.0}
+    assert np.all(path.rates[1:] != path.rates[:-1])
+    # Time-average rate is (10 * 20 + 100 * 5) / 25 = 28.
+    events = sample_arrivals(mmpp, 10_000, seed=3)
+    assert events.size / 10_000 == pytest.approx(28, rel=0.15)
+    with pytest.raises(TypeError):
+        mmpp(np.zeros(1))
+
+
+def test_trace_from_file(tmp_path):
+    csv = tmp_path / "trace.csv"
+    csv.write_text("1000,10\n1060,70\n")
+    trace = Trace.from_file(csv)
+    np.testing.assert_allclose(trace(np.array([0.0, 30.0, 90.0])), [10, 40, 70])
+    npy = tmp_path / "rates.npy"
+    np.save(npy, np.array([5.0, 15.0]))
+    np.testing.assert_allclose(Trace.from_file(npy, step=10).times, [0, 10])
+    events = simulate_arrivals(120, 0, pattern=f"trace:{csv}", seed=0)
+    assert _rate_in(events, 60, 120) == pytest.approx(70, rel=0.1)
+
+
+@pytest.mark.parametrize(
+    ("name", "scale"),
+    [
+        ("normal", 1.0),
+        ("peak", 1.5),
+        ("offpeak", 0.7),
+        ("diurnal", 1.0),
+        ("ramp", 1.0),
+        ("step", 1.0),
+        ("bursty", 1.0),
+    ],
+)
+def test_named_patterns_keep_mean_intensity(name: str, scale: float):
+    events = simulate_arrivals(86_400, 5, pattern=name, seed=4)
+    assert events.size / 86_400 == pytest.approx(5 * scale, rel=0.05)
+
+
+def test_ramp_and_step_names_rise_over_time():
+    for name in ("ramp", "step"):
+        events = simulate_arrivals(2000, 50, pattern=name, seed=4)
+        assert _rate_in(events, 0, 500) < _rate_in(events, 1500, 2000)
+
+
+def test_windows_match_single_sample():
+    pattern = Diurnal(20.0, period=300.0)
+    joined = np.concatenate(list(iter_pattern_arrivals(pattern, 300, 70, seed=5)))
+    assert np.all(np.diff(joined) >= 0)
+    assert joined.max() < 300
+    chunks = list(iter_arrivals(300, 20, pattern=pattern, window=100, seed=5))
+    assert len(chunks) == 3
+
+
+def test_constant_names_keep_their_streams():
+    np.testing.assert_array_equal(
+        simulate_arrivals(5, 10, pattern="peak", seed=7),
+        simulate_arrivals(5, 15, seed=7),
+    )
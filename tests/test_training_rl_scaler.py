@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from cloudpilot.cluster_env import ClusterEnv, evaluate  # noqa: E402
+from cloudpilot.scaling import RLScaler  # noqa: E402
+from cloudpilot.training_rl_scaler import (  # noqa: E402
+    dqn_policy,
+    epsilon_at,
+    save_model,
+    train_dqn,
+)
+
+
+def test_epsilon_schedule():
+    assert epsilon_at(0, 100, 1.0, 0.1, 0.5) == 1.0
+    assert epsilon_at(25, 100, 1.0, 0.1, 0.5) == pytest.approx(0.55)
+    assert epsilon_at(80, 100, 1.0, 0.1, 0.5) == pytest.approx(0.1)
+
+
+def test_trained_model_saves_and_beats_always_maintain(tmp_path):
+    model = train_dqn(iterations=600, n_envs=64, batch_size=128, seed=0)
+    path = tmp_path / "model.pt"
+    save_model(model, str(path))
+    scaler = RLScaler(model_path=str(path))
+    actions, _ = scaler.get_actions([[95.0, 80.0, 1.5, 400.0, 0.9]])
+    assert actions.shape == (1,)
+
+    def maintain(obs):
+        return np.ones(obs.shape[0], dtype=np.int64)
+
+    trained = evaluate(dqn_policy(model), ClusterEnv(n_envs=64, seed=9), steps=200)
+    baseline = evaluate(maintain, ClusterEnv(n_envs=64, seed=9), steps=200)
+    assert trained["reward"] > baseline["reward"]
+
+
+def test_uniform_replay_trains():
+    model = train_dqn(iterations=50, n_envs=16, batch_size=32, prioritized=False)
+    assert isinstance(model(torch.zeros((1, 5))), torch.Tensor)